@@ -0,0 +1,316 @@
+"""Pages/s, wall time and peak memory of the crawl, offline.
+
+The tournament and card crawls run against a local replay server answering
+from a fixture archive. The archive is the one given with --archive, recorded
+by running the extract assets with HTTP_RECORD_ARCHIVE set, or a synthetic one
+shaped like the real sites otherwise (tournaments with a standings page, one
+decklist page per player and a pairings page per round, the same tournaments in
+the Limitless JSON API, and sets of cards with their card pages and evolves
+from searches).
+
+Each crawl runs in its own process, from an empty working directory so that
+nothing is served from the html cache, and the server delays every response
+by --latency plus up to --jitter seconds and fails --error-rate of them. The
+http client is the ScraperResource of the assets, tuned with
+--max-connections-per-host, --no-compression and --uvloop.
+
+Usage: python benchmarks/crawler.py [--archive data/fixtures.sqlite]
+  [--source html] [--latency 0.02] [--jitter 0.01] [--error-rate 0.0]
+  [--parse-workers 0] [--max-connections-per-host 32] [--no-compression]
+  [--uvloop]
+  [--tournaments 40] [--players 32] [--sets 4] [--cards 60]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from yarl import URL
+
+from pkmn_tcgp_metagame.assets import constants, extract
+from pkmn_tcgp_metagame.scraper.replay import FixtureArchive, ReplayServer
+from pkmn_tcgp_metagame.scraper.scraper_resource import ScraperResource
+
+
+def tournament_pages(nb_tournaments: int, nb_players: int):
+  per_page = 20
+  nb_list_pages = max(1, -(-nb_tournaments // per_page))
+  nb_rounds = max(1, nb_players.bit_length())
+
+  for page in range(1, nb_list_pages + 1):
+    rows = "".join(
+      f'<tr data-name="Tournament {t}" data-date="2025-01-01T10:00:00.000Z" '
+      f'data-organizer="organizer" data-format="STANDARD" '
+      f'data-players="{nb_players}">'
+      f'<td><a href="/tournament/t{t}/standings">Tournament {t}</a></td></tr>'
+      for t in range((page - 1) * per_page, min(page * per_page, nb_tournaments))
+    )
+    yield (
+      extract.construct_tournament_list_url(page),
+      f'<ul class="pagination" data-current="{page}" data-max="{nb_list_pages}">'
+      f'</ul><table class="completed-tournaments"><tr><th></th></tr>{rows}</table>',
+    )
+
+  for t in range(nb_tournaments):
+    tournament_id = f"t{t}"
+    rows = "".join(
+      f'<tr data-name="Player {p}" data-placing="{p + 1}" data-country="FR"><td>'
+      f'<a href="/tournament/{tournament_id}/player/p{p}">Player {p}</a>'
+      f'<a href="{extract.construct_decklist_url(tournament_id, f"p{p}")}">'
+      f"decklist</a></td></tr>"
+      for p in range(nb_players)
+    )
+    yield (
+      extract.construct_standings_url(tournament_id),
+      f'<table class="striped"><tr><th></th></tr>{rows}</table>',
+    )
+
+    for p in range(nb_players):
+      cards = "".join(
+        f'<a href="https://pocket.limitlesstcg.com/cards/A1/{(p + c) % 200 + 1}">'
+        f"{1 + c % 2} Card {c}</a>"
+        for c in range(12)
+      )
+      yield (
+        extract.construct_decklist_url(tournament_id, f"p{p}"),
+        f'<div class="decklist">{cards}</div>',
+      )
+
+    round_urls = [
+      f"/tournament/{tournament_id}/pairings?round={r}" for r in range(1, nb_rounds)
+    ]
+    nav = "".join(f'<a href="{url}">{r}</a>' for r, url in enumerate(round_urls, 1))
+    for url in [*round_urls, extract.construct_pairings_url(tournament_id)]:
+      trs = "".join(
+        f'<tr data-completed="1"><td class="p1" data-id="p{p}" data-count="2">'
+        f'</td><td class="p2" data-id="p{p + 1}" data-count="1"></td></tr>'
+        for p in range(0, nb_players - 1, 2)
+      )
+      yield (
+        url,
+        f'<div class="mini-nav">{nav}<a href="#">{nb_rounds}</a></div>'
+        f'<div class="pairings"><table data-tournament="{tournament_id}">{trs}'
+        f"</table></div>",
+      )
+
+
+def api_tournament_pages(nb_tournaments: int, nb_players: int):
+  page_size = constants.LIMITLESS_API_PAGE_SIZE
+  # The list ends with empty pages, the crawl reads a window of pages past the
+  # last tournament
+  nb_pages = nb_tournaments // page_size + 1 + constants.TOURNAMENT_PAGES_WINDOW
+  for page in range(1, nb_pages + 1):
+    yield (
+      extract.construct_api_tournament_list_url(page),
+      [
+        {
+          "id": f"t{t}",
+          "game": "POCKET",
+          "format": "STANDARD",
+          "name": f"Tournament {t}",
+          "date": "2025-01-01T10:00:00.000Z",
+          "players": nb_players,
+          "organizerId": 1,
+        }
+        for t in range((page - 1) * page_size, min(page * page_size, nb_tournaments))
+      ],
+    )
+
+  nb_rounds = max(1, nb_players.bit_length())
+  for t in range(nb_tournaments):
+    yield (
+      extract.construct_api_standings_url(f"t{t}"),
+      [
+        {
+          "player": f"p{p}",
+          "name": f"Player {p}",
+          "country": "FR",
+          "placing": p + 1,
+          "decklist": {
+            "pokemon": [
+              {"count": 1 + c % 2, "set": "A1", "number": (p + c) % 200 + 1}
+              for c in range(12)
+            ]
+          },
+        }
+        for p in range(nb_players)
+      ],
+    )
+    yield (
+      extract.construct_api_pairings_url(f"t{t}"),
+      [
+        {"round": r, "player1": f"p{p}", "player2": f"p{p + 1}", "winner": f"p{p}"}
+        for r in range(1, nb_rounds + 1)
+        for p in range(0, nb_players - 1, 2)
+      ],
+    )
+
+
+def card_pages(nb_sets: int, nb_cards: int):
+  codes = [f"A{s + 1}" for s in range(nb_sets)]
+  rows = "".join(
+    f'<tr><td><a href="/cards/{code}"><img alt="{code}">Set {code}</a></td>'
+    f"<td><a>2025-01-01</a></td></tr>"
+    for code in codes
+  )
+  yield "/cards", f'<table class="sets-table"><tr></tr><tr></tr>{rows}</table>'
+
+  for code in codes:
+    links = "".join(f'<a href="/cards/{code}/{n}">card</a>' for n in range(1, nb_cards))
+    yield f"/cards/{code}", f'<div class="card-search-grid">{links}</div>'
+
+    for n in range(1, nb_cards):
+      # Every third card evolves from the previous one
+      stage = "Basic" if n % 3 else "Stage 1"
+      evolves_from = (
+        f'<a href="/cards?q=name:Pokemon{n - 1}">Pokemon{n - 1}</a>'
+        if n % 3 == 0
+        else ""
+      )
+      yield (
+        f"/cards/{code}/{n}",
+        f'<table class="card-prints-versions"><tr><th></th></tr>'
+        f'<tr class="current"><td><span class="prints-table-card-number">#{n}'
+        f'</span></td></tr></table><span class="card-text-name">Pokemon{n}</span>'
+        f'<p class="card-text-type">Pokémon\n - {stage}</p>'
+        f'<p class="card-text-title"><span>Pokemon{n}</span><span>- Grass - 70 HP'
+        f"</span></p>{evolves_from}",
+      )
+      if n % 3 == 0:
+        yield (
+          f"/cards?q=name:Pokemon{n - 1}",
+          f'<div class="card-search-grid"><a href="/cards/{code}/{n - 1}">card</a>'
+          f"</div>",
+        )
+
+
+def write_synthetic_archive(path: str, args: argparse.Namespace):
+  archive = FixtureArchive(path)
+  for base_url, pages in [
+    (
+      constants.BASE_URL_TOURNAMENTS,
+      tournament_pages(args.tournaments, args.players),
+    ),
+    (constants.BASE_URL_CARDS, card_pages(args.sets, args.cards)),
+  ]:
+    for url, html in pages:
+      archive.put(URL(base_url).join(URL(url)), f"<html><body>{html}</body></html>")
+
+  for url, value in api_tournament_pages(args.tournaments, args.players):
+    archive.put(URL(constants.BASE_URL_TOURNAMENTS).join(URL(url)), json.dumps(value))
+  archive.close()
+
+
+async def crawl_tournaments(log: logging.Logger, scraper: ScraperResource, source: str):
+  _, metadata = await extract.extract_all_tournaments(log, scraper, False, source)
+  return metadata
+
+
+async def crawl_cards(log: logging.Logger, scraper: ScraperResource, source: str):
+  result = await extract.extract_all_cards(log, scraper, incremental=False)
+  return result.metadata
+
+
+crawls = {"tournaments": crawl_tournaments, "cards": crawl_cards}
+
+
+# Run a crawl in a fresh process and working directory, against the replay
+# server. Return its wall time, number of requests, retries and peak RSS in MB.
+def run_crawl(
+  name: str, replay_url: str, args: argparse.Namespace, scraper_options: dict
+):
+  constants.HTTP_REPLAY_URL = replay_url
+  constants.PARSE_WORKERS = args.parse_workers
+  constants.METRICS_TEXTFILE_DIR = ""
+  os.chdir(tempfile.mkdtemp())
+  logging.basicConfig(level=logging.CRITICAL)
+  scraper = ScraperResource(**scraper_options)
+  scraper.install_event_loop_policy()
+
+  start = time.perf_counter()
+  metadata = asyncio.run(crawls[name](logging.getLogger(name), scraper, args.source))
+  wall_time = time.perf_counter() - start
+
+  return (
+    wall_time,
+    metadata["Number of requests"].value,
+    metadata["Number of retries"].value,
+    resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+  )
+
+
+async def run(archive_path: str, args: argparse.Namespace):
+  # Resources do not pickle, each crawl process builds its own
+  scraper_options = {
+    "max_connections_per_host": args.max_connections_per_host,
+    "compression": args.compression,
+    "use_uvloop": args.uvloop,
+  }
+  archive = FixtureArchive(archive_path)
+  server = ReplayServer(archive, args.latency, args.jitter, args.error_rate, seed=0)
+  replay_url = await server.start()
+  print(f"{len(archive)} pages replayed from {archive_path}")
+  print(
+    f"{'crawl':<14}{'requests':>10}{'retries':>9}{'wall (s)':>10}{'pages/s':>10}"
+    f"{'RSS (MB)':>10}"
+  )
+
+  try:
+    for name in crawls:
+      with ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context("spawn")
+      ) as executor:
+        wall_time, nb_requests, nb_retries, peak_rss = await asyncio.wrap_future(
+          executor.submit(run_crawl, name, replay_url, args, scraper_options)
+        )
+      print(
+        f"{name:<14}{nb_requests:>10}{nb_retries:>9}{wall_time:>10.2f}"
+        f"{nb_requests / wall_time:>10.0f}{peak_rss:>10.1f}"
+      )
+    if server.stats["missing"]:
+      print(f"{server.stats['missing']} requests were missing from the archive")
+  finally:
+    await server.stop()
+    archive.close()
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--archive")
+  parser.add_argument(
+    "--source", choices=list(extract.tournament_sources), default="html"
+  )
+  parser.add_argument("--latency", type=float, default=0.02)
+  parser.add_argument("--jitter", type=float, default=0.01)
+  parser.add_argument("--error-rate", type=float, default=0.0)
+  parser.add_argument("--parse-workers", type=int, default=0)
+  parser.add_argument(
+    "--max-connections-per-host", type=int, default=constants.HTTP_HOST_CONCURRENCY_MAX
+  )
+  parser.add_argument("--no-compression", dest="compression", action="store_false")
+  parser.add_argument("--uvloop", action="store_true")
+  parser.add_argument("--tournaments", type=int, default=40)
+  parser.add_argument("--players", type=int, default=32)
+  parser.add_argument("--sets", type=int, default=4)
+  parser.add_argument("--cards", type=int, default=60)
+  args = parser.parse_args()
+
+  if args.archive is not None:
+    asyncio.run(run(args.archive, args))
+    return
+
+  with tempfile.TemporaryDirectory() as directory:
+    archive_path = os.path.join(directory, "fixtures.sqlite")
+    write_synthetic_archive(archive_path, args)
+    asyncio.run(run(archive_path, args))
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,123 @@
+"""Parity and throughput of the html parser backends over the html cache.
+
+Every cached page is parsed with html.parser and a full document, which is the
+reference, then with every other parser backend with and without partial
+parsing. The records returned by the extractors must be the same for each
+configuration. The same parity is checked over committed fixture pages by
+tests/test_parser_backends.py.
+
+Usage: python benchmarks/parser_backends.py [--limit 2000] [--parsers html.parser lxml]
+"""
+
+import argparse
+import asyncio
+import re
+import time
+from collections import defaultdict
+from typing import Optional
+
+from yarl import URL
+
+from pkmn_tcgp_metagame.assets import constants, extract
+from pkmn_tcgp_metagame.scraper.html_cache import open_html_cache
+
+# Page type of a url path, with the extractor run on pages of that type
+page_types = [
+  (re.compile(r"^/tournament/[^/]*/standings\?players$"), "standings"),
+  (re.compile(r"^/tournament/[^/]*/player/[^/]*/decklist$"), "decklist"),
+  (re.compile(r"^/tournament/[^/]*/pairings"), "pairings"),
+  (re.compile(r"^/cards/[^/?]*$"), "card-search"),
+  (re.compile(r"^/cards\?q=name:"), "card-search"),
+  (re.compile(r"^/jeux/mobile/pocket/cartodex/extensions/"), "translation-set"),
+]
+
+
+def card_search_urls(soup):
+  grid = soup.find("div", class_="card-search-grid")
+  return [a.attrs["href"] for a in grid.find_all("a") if "href" in a.attrs]
+
+
+extractors = {
+  "standings": extract.extract_player_rows,
+  "decklist": extract.extract_decklist,
+  "pairings": extract.extract_matches_from_pairings,
+  "card-search": card_search_urls,
+  "translation-set": lambda soup: extract.extract_translations(soup, ""),
+}
+
+
+def page_type_of(url: Optional[str]):
+  if url is None:
+    return None
+  path = URL(url).path_qs
+  for regex, page_type in page_types:
+    if regex.search(path):
+      return page_type
+  return None
+
+
+def extract_records(html: str, page_type: str, parser: str, partial: bool):
+  constants.HTML_PARSER = parser
+  try:
+    return extractors[page_type](extract.make_soup(html, page_type, partial))
+  except Exception as e:
+    return f"error: {e}"
+
+
+async def load_pages(limit: int):
+  cache = open_html_cache()
+  pages = defaultdict(list)
+  nb_pages = 0
+  for info in cache.entries():
+    page_type = page_type_of(info.url)
+    if page_type is None:
+      continue
+    entry = await cache.get(info.key)
+    if entry is None:
+      continue
+    pages[page_type].append((info.url, entry.html))
+    nb_pages += 1
+    if nb_pages >= limit:
+      break
+  cache.close()
+  return pages
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--limit", type=int, default=2000)
+  parser.add_argument("--parsers", nargs="+", default=["html.parser", "lxml"])
+  args = parser.parse_args()
+
+  pages = asyncio.run(load_pages(args.limit))
+  configurations = [(p, partial) for p in args.parsers for partial in (False, True)]
+
+  print(
+    f"{'page type':<16}{'parser':<14}{'partial':<9}{'pages/s':>10}{'mismatches':>12}"
+  )
+  for page_type, typed_pages in sorted(pages.items()):
+    reference = [
+      extract_records(html, page_type, "html.parser", False) for _, html in typed_pages
+    ]
+
+    for parser_name, partial in configurations:
+      start = time.perf_counter()
+      records = [
+        extract_records(html, page_type, parser_name, partial)
+        for _, html in typed_pages
+      ]
+      elapsed = time.perf_counter() - start
+
+      mismatches = [
+        typed_pages[i][0] for i in range(len(records)) if records[i] != reference[i]
+      ]
+      print(
+        f"{page_type:<16}{parser_name:<14}{str(partial):<9}"
+        f"{len(typed_pages) / elapsed:>10.1f}{len(mismatches):>12}"
+      )
+      for url in mismatches[:5]:
+        print(f"  mismatch: {url}")
+
+
+if __name__ == "__main__":
+  main()
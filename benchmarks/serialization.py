@@ -0,0 +1,157 @@
+"""Size and speed of the output file serializers.
+
+The corpus is the tournament files of data/output/tournaments when there are
+some, or synthetic tournaments shaped like the real ones otherwise (a standings
+of players with 20 card decklists, and one match per pair of players per
+round). Each tournament is written and read back with:
+
+  - json with asdict and indent=2, the previous format
+  - json compact, without the asdict copy
+  - orjson compact, when it is installed
+
+Usage: python benchmarks/serialization.py [--synthetic 500] [--players 64]
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from dataclasses import asdict
+
+from pkmn_tcgp_metagame.assets import constants, serialization
+from pkmn_tcgp_metagame.assets.records import (
+  DeckListItem,
+  Match,
+  MatchResult,
+  Player,
+  Tournament,
+  decode_record,
+)
+
+
+def synthetic_tournament(index: int, nb_players: int):
+  players = [
+    Player(
+      f"player{i}",
+      f"Player {i}",
+      str(i + 1),
+      "FR",
+      [
+        DeckListItem(
+          f"https://pocket.limitlesstcg.com/cards/A1/{random.randint(1, 286)}",
+          random.randint(1, 2),
+        )
+        for _ in range(20)
+      ],
+    )
+    for i in range(nb_players)
+  ]
+
+  matches = []
+  for _ in range(max(1, nb_players.bit_length())):
+    order = random.sample(range(nb_players), nb_players)
+    for i in range(0, nb_players - 1, 2):
+      matches.append(
+        Match(
+          [
+            MatchResult(f"player{order[i]}", random.randint(0, 2)),
+            MatchResult(f"player{order[i + 1]}", random.randint(0, 2)),
+          ]
+        )
+      )
+
+  return Tournament(
+    f"tournament{index}",
+    f"Tournament {index}",
+    "2025-01-01T00:00:00.000Z",
+    "organizer",
+    "STANDARD",
+    str(nb_players),
+    players,
+    matches,
+  )
+
+
+def load_corpus(nb_synthetic: int, nb_players: int):
+  directory = constants.TOURNAMENTS_OUTPUT_DIR
+  if os.path.isdir(directory) and os.listdir(directory):
+    corpus = []
+    for name in os.listdir(directory):
+      with open(os.path.join(directory, name)) as f:
+        corpus.append(decode_record(Tournament, json.load(f)))
+    return "tournament files", corpus
+
+  random.seed(0)
+  return "synthetic tournaments", [
+    synthetic_tournament(i, nb_players) for i in range(nb_synthetic)
+  ]
+
+
+def write_json_indented(path: str, tournament: Tournament):
+  with open(path, "w") as f:
+    json.dump(asdict(tournament), f, indent=2)
+
+
+def read_json(path: str):
+  with open(path) as f:
+    return json.load(f)
+
+
+def run(name: str, corpus: list, write, read, directory: str):
+  paths = [os.path.join(directory, f"{name}_{i}.json") for i in range(len(corpus))]
+
+  start = time.perf_counter()
+  for path, tournament in zip(paths, corpus):
+    write(path, tournament)
+  write_time = time.perf_counter() - start
+
+  size = sum(os.path.getsize(path) for path in paths)
+
+  start = time.perf_counter()
+  for path in paths:
+    read(path)
+  read_time = time.perf_counter() - start
+
+  print(
+    f"{name:<16}{size / 1024 / 1024:>10.1f}{len(corpus) / write_time:>12.0f}"
+    f"{len(corpus) / read_time:>12.0f}"
+  )
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--synthetic", type=int, default=500)
+  parser.add_argument("--players", type=int, default=64)
+  args = parser.parse_args()
+
+  corpus_name, corpus = load_corpus(args.synthetic, args.players)
+  print(f"{len(corpus)} {corpus_name}")
+  print(f"{'serializer':<16}{'size (MB)':>10}{'writes/s':>12}{'reads/s':>12}")
+
+  with tempfile.TemporaryDirectory() as directory:
+    run("json indent=2", corpus, write_json_indented, read_json, directory)
+
+    constants.OUTPUT_SERIALIZER = "json"
+    run(
+      "json compact",
+      corpus,
+      serialization.write_output_file,
+      serialization.read_output_file,
+      directory,
+    )
+
+    if serialization.orjson is not None:
+      constants.OUTPUT_SERIALIZER = "orjson"
+      run(
+        "orjson compact",
+        corpus,
+        serialization.write_output_file,
+        serialization.read_output_file,
+        directory,
+      )
+
+
+if __name__ == "__main__":
+  main()
@@ -1,3 +1,5 @@
+import os
+
 BASE_URL_CARDS = "https://pocket.limitlesstcg.com"
 BASE_URL_TOURNAMENTS = "https://play.limitlesstcg.com"
 BASE_URL_TRANSLATIONS = "https://www.pokekalos.fr"
@@ -7,3 +9,80 @@ JSON_OUTPUT = "data/output"
 
 TOURNAMENTS_OUTPUT_DIR = f"{JSON_OUTPUT}/tournaments"
 SETS_OUTPUT_DIR = f"{JSON_OUTPUT}/sets"
+TRANSLATIONS_OUTPUT_DIR = f"{JSON_OUTPUT}/translations"
+TOURNAMENTS_WITHOUT_DECKLIST_FILE = f"{JSON_OUTPUT}/tournaments_without_decklist.txt"
+
+# Number of completed tournaments pages fetched together in incremental mode
+TOURNAMENT_PAGES_WINDOW = 4
+
+# Source of the tournaments, "html" to scrape the tournament pages or
+# "limitless-api" to read the Limitless JSON API. The api key is optional.
+TOURNAMENT_SOURCE = os.environ.get("TOURNAMENT_SOURCE", "html")
+LIMITLESS_API_KEY = os.environ.get("LIMITLESS_API_KEY", "")
+LIMITLESS_API_PAGE_SIZE = 50
+
+# Backend of the html cache, "sqlite" for the packed store or "directory" for
+# one html file per page under BEAUTIFULSOUP_CACHE
+HTML_CACHE_BACKEND = os.environ.get("HTML_CACHE_BACKEND", "sqlite")
+HTML_CACHE_DATABASE = "data/cache.sqlite"
+HTML_CACHE_ZSTD_LEVEL = 9
+
+# Budget of the html cache enforced by the html_cache_gc asset, and resolution of
+# the last access times it evicts the least recently used pages by
+HTML_CACHE_MAX_SIZE_MB = int(os.environ.get("HTML_CACHE_MAX_SIZE_MB", "2048"))
+HTML_CACHE_ACCESS_RESOLUTION = 60 * 60
+
+# Http client, the concurrency of each host adapts between the min and max
+# depending on how often the host throttles us
+HTTP_MAX_CONNECTIONS = 64
+HTTP_HOST_CONCURRENCY_INITIAL = 8
+HTTP_HOST_CONCURRENCY_MIN = 1
+HTTP_HOST_CONCURRENCY_MAX = 32
+HTTP_MAX_RETRIES = 4
+HTTP_BACKOFF_BASE = 0.5
+HTTP_BACKOFF_MAX = 30.0
+
+# Number of worker processes parsing pages, 0 to parse them in a thread of the
+# asset process
+PARSE_WORKERS = int(os.environ.get("PARSE_WORKERS", "0"))
+
+# Parser backend used by beautiful soup, "html.parser" or "lxml", and whether
+# pages are only partially built into soups for the elements the extractors read
+HTML_PARSER = os.environ.get("HTML_PARSER", "html.parser")
+HTML_PARTIAL_PARSING = os.environ.get("HTML_PARTIAL_PARSING", "true") == "true"
+
+# Serializer of the tournament and set output files, "orjson" when it is
+# installed or "json". Both write compact json.
+OUTPUT_SERIALIZER = os.environ.get("OUTPUT_SERIALIZER", "orjson")
+
+# Bounds of the tournament crawl, the number of tournaments extracted at once
+# and the number of decklist and pairings pages held between download and parse
+TOURNAMENTS_IN_FLIGHT = int(os.environ.get("TOURNAMENTS_IN_FLIGHT", "8"))
+PAGES_IN_FLIGHT = int(os.environ.get("PAGES_IN_FLIGHT", "64"))
+
+# Bounds of the raw loads, the number of rows copied to postgres at once and the
+# number of batches held between the file parsing and the writer thread
+LOAD_BATCH_SIZE = int(os.environ.get("LOAD_BATCH_SIZE", "10000"))
+LOAD_BATCHES_IN_FLIGHT = int(os.environ.get("LOAD_BATCHES_IN_FLIGHT", "4"))
+
+# Whether the reloaded raw tables are set logged once loaded into their unlogged
+# staging table, or left unlogged
+RAW_TABLES_LOGGED = os.environ.get("RAW_TABLES_LOGGED", "true") == "true"
+
+# Number of worker processes decoding the tournament files into rows for the raw
+# loads, 0 to decode them in the asset process
+LOAD_WORKERS = int(os.environ.get("LOAD_WORKERS", "0"))
+
+# Journal of the stages completed for each tournament, so that an interrupted
+# crawl resumes where it stopped
+CRAWL_STATE_DATABASE = "data/crawl_state.sqlite"
+
+# Directory of the Prometheus textfile collector where the extract assets write
+# their crawler metrics, empty to disable
+METRICS_TEXTFILE_DIR = os.environ.get("METRICS_TEXTFILE_DIR", "data/metrics")
+
+# Fixture archive where the pages read by the crawl are recorded, and url of the
+# replay server answering every request instead of the live sites. Both are
+# disabled when empty.
+HTTP_RECORD_ARCHIVE = os.environ.get("HTTP_RECORD_ARCHIVE", "")
+HTTP_REPLAY_URL = os.environ.get("HTTP_REPLAY_URL", "")
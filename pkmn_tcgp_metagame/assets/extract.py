@@ -3,74 +3,42 @@ import csv
 import json
 import os
 import re
-from dataclasses import asdict, dataclass
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional, Union
 
-import aiofile
 import aiohttp
 import dagster
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from dagster import DagsterLogManager
+from pydantic import Field
 
 from pkmn_tcgp_metagame.assets import constants
-
-
-@dataclass
-class DeckListItem:
-  url: str
-  count: int
-
-
-@dataclass
-class Player:
-  id: str
-  name: str
-  placing: str
-  country: str
-  decklist: list[DeckListItem]
-
-
-@dataclass
-class MatchResult:
-  player_id: str
-  score: int
-
-
-@dataclass
-class Match:
-  match_results: list[MatchResult]
-
-
-@dataclass
-class Tournament:
-  id: str
-  name: str
-  date: str
-  organizer: str
-  format: str
-  nb_players: str
-  players: list[Player]
-  matches: list[Match]
-
-
-@dataclass
-class Card:
-  url: str
-  number: int
-  name: str
-  type: str
-  subtype: str
-  stage: str
-  evolves_from: list[str]
-  is_promo: bool
-
-
-@dataclass
-class Set:
-  name: str
-  code: str
-  release_date: str
-  url: str
-  cards: list[Card]
+from pkmn_tcgp_metagame.assets.records import (
+  Card,
+  DeckListItem,
+  Match,
+  MatchResult,
+  Player,
+  Set,
+  Tournament,
+  decode_record,
+)
+from pkmn_tcgp_metagame.assets.serialization import read_output_file, write_output_file
+from pkmn_tcgp_metagame.scraper.cache_policy import cache_policy
+from pkmn_tcgp_metagame.scraper.crawl_state import CrawlState
+from pkmn_tcgp_metagame.scraper.html_cache import (
+  CacheEntry,
+  get_html_cache,
+  html_content_hash,
+)
+from pkmn_tcgp_metagame.scraper.metrics import write_prometheus_textfile
+from pkmn_tcgp_metagame.scraper.scraper_resource import ScraperResource
+from pkmn_tcgp_metagame.scraper.scraper_session import (
+  ScraperSession,
+  ScraperStats,
+  timed_call,
+)
 
 
 # Create directory for a full file path if it does not already exists
@@ -131,84 +99,239 @@ regex_decklist_url = re.compile(
 )
 
 
-# Extract a beautiful soup object from a url
-async def async_soup_from_url(
+@dataclass
+class FetchedPage:
+  url: str
+  cache_key: str
+  html: str
+  content_hash: str
+  # False when the body is the one last marked as processed for this url
+  changed: bool
+
+
+# Fetch the html of a url, from the cache when its cache policy allows it.
+# Expired pages are revalidated with the server using the stored ETag /
+# Last-Modified, and reused as is on a 304.
+# Concurrent requests for the same url share a single download and cache write.
+async def async_html_from_url(
   log: DagsterLogManager,
-  session: aiohttp.ClientSession,
+  session: ScraperSession,
   sem: asyncio.Semaphore,
   url: str,
-  use_cache: bool = True,
-):
+) -> Optional[FetchedPage]:
   if url is None:
     return None
 
+  return await session.single_flight(
+    ("html", session.cache_key(url)),
+    lambda: fetch_html_from_url(log, session, sem, url),
+  )
+
+
+async def fetch_html_from_url(
+  log: DagsterLogManager,
+  session: ScraperSession,
+  sem: asyncio.Semaphore,
+  url: str,
+) -> Optional[FetchedPage]:
   try:
-    # Construct cache filename
-    cache_filename = constants.BEAUTIFULSOUP_CACHE + url
-    cache_filename = "".join(x for x in cache_filename if (x == "/" or x.isalnum()))
-    cache_filename = f"{cache_filename}.html"
-
-    html = ""
-
-    if (
-      use_cache
-      and os.path.isfile(cache_filename)
-      and os.path.getsize(cache_filename) > 0
-    ):
-      log.debug(f"url {url} is in cache")
-      try:
-        async with sem:
-          async with aiofile.async_open(cache_filename, "r") as file:
-            html = await file.read()
-      except (OSError, IOError) as e:
-        log.warning(f"Failed to read cache file {cache_filename}: {e}")
-        html = ""
+    cache = get_html_cache()
+    cache_key = session.cache_key(url)
 
-    if not html:
-      log.debug(f"url {url} is not in cache, requesting from source")
-      try:
-        async with session.get(url) as resp:
-          resp.raise_for_status()
-          html = await resp.text()
-      except aiohttp.ClientError as e:
-        log.error(f"HTTP request failed for {url}: {e}")
-        return None
-      except asyncio.TimeoutError:
-        log.error(f"HTTP request timed out for {url}")
-        return None
-      except Exception as e:
-        log.error(f"Unexpected error during HTTP request for {url}: {e}")
-        return None
+    entry = None
+    try:
+      async with sem:
+        entry = await cache.get(cache_key, str(session.absolute_url(url)))
+    except (OSError, IOError) as e:
+      log.warning(f"Failed to read cache entry {cache_key}: {e}")
 
-      try:
-        create_directory_for_file(cache_filename)
-        async with sem:
-          async with aiofile.async_open(cache_filename, "w") as file:
-            await file.write(html)
-      except (OSError, IOError) as e:
-        log.warning(f"Failed to write cache file {cache_filename}: {e}")
+    if entry is not None and not entry.html:
+      entry = None
+
+    metrics = session.stats.metrics
+    policy = cache_policy(url)
+    if entry is not None and policy.is_fresh(entry):
+      log.debug(f"url {url} is in cache")
+      metrics.observe_cache("hit")
+      html = entry.html
+    elif entry is not None and policy.serves_stale:
+      log.debug(f"url {url} is expired in cache, refreshing it in the background")
+      metrics.observe_cache("stale")
+      html = entry.html
+      session.run_in_background(
+        ("refresh", cache_key),
+        lambda: download_html(log, session, sem, url, entry),
+      )
+    else:
+      metrics.observe_cache("miss" if entry is None else "revalidated")
+      html = await download_html(log, session, sem, url, entry)
 
     if not html:
       log.error(f"No HTML content available for {url}")
       return None
+    session.record(url, html)
+
+    content_hash = html_content_hash(html)
+    return FetchedPage(
+      url,
+      cache_key,
+      html,
+      content_hash,
+      entry is None or entry.processed_hash != content_hash,
+    )
+
+  except Exception as e:
+    log.error(f"Unexpected error in async_html_from_url for {url}: {e}")
+    return None
 
-    try:
-      return BeautifulSoup(html, "html.parser")
-    except Exception as e:
-      log.error(f"Failed to parse HTML for {url}: {e}")
-      return None
 
+# Download a page and store it in the cache, revalidating the cached entry when
+# there is one. Return None if the page could not be downloaded.
+async def download_html(
+  log: DagsterLogManager,
+  session: ScraperSession,
+  sem: asyncio.Semaphore,
+  url: str,
+  entry: Optional[CacheEntry],
+) -> Optional[str]:
+  cache_key = session.cache_key(url)
+
+  headers = {}
+  if entry is not None:
+    if entry.etag:
+      headers["If-None-Match"] = entry.etag
+    if entry.last_modified:
+      headers["If-Modified-Since"] = entry.last_modified
+
+  log.debug(f"url {url} is not in cache, requesting from source")
+  try:
+    resp = await session.fetch(url, headers)
+    if resp.status == 304 and entry is not None:
+      log.debug(f"url {url} was not modified")
+      html = entry.html
+      not_modified = True
+    else:
+      html = resp.text
+      not_modified = False
+    etag = resp.headers.get("ETag")
+    last_modified = resp.headers.get("Last-Modified")
+  except aiohttp.ClientError as e:
+    log.error(f"HTTP request failed for {url}: {e}")
+    return None
+  except asyncio.TimeoutError:
+    log.error(f"HTTP request timed out for {url}")
+    return None
   except Exception as e:
-    log.error(f"Unexpected error in async_soup_from_url for {url}: {e}")
+    log.error(f"Unexpected error during HTTP request for {url}: {e}")
     return None
 
+  try:
+    async with sem:
+      if not_modified:
+        await get_html_cache().touch(cache_key, etag, last_modified)
+      else:
+        await get_html_cache().put(
+          cache_key, str(session.absolute_url(url)), html, etag, last_modified
+        )
+  except (OSError, IOError) as e:
+    log.warning(f"Failed to write cache entry {cache_key}: {e}")
+
+  return html
+
+
+# Remember that a page was fully processed, so that the next run can skip
+# parsing it if the server sends back the same body
+async def mark_page_processed(
+  log: DagsterLogManager, sem: asyncio.Semaphore, page: FetchedPage
+):
+  try:
+    async with sem:
+      await get_html_cache().mark_processed(page.cache_key, page.content_hash)
+  except (OSError, IOError) as e:
+    log.warning(f"Failed to write cache entry {page.cache_key}: {e}")
+
+
+# Elements read by the extractors of each page type. With partial parsing only
+# these elements are built into the soup, the rest of the page is skipped.
+page_strainers = {
+  "pagination": SoupStrainer("ul", class_="pagination"),
+  "tournament-list": SoupStrainer(class_=["pagination", "completed-tournaments"]),
+  "standings": SoupStrainer(class_="striped"),
+  "decklist": SoupStrainer("div", class_="decklist"),
+  "pairings": SoupStrainer(class_=["pairings", "live-bracket"]),
+  "pairings-nav": SoupStrainer(class_="mini-nav"),
+  "card-search": SoupStrainer("div", class_="card-search-grid"),
+  "translation-set": SoupStrainer("div", id="liste_cartes"),
+}
+
+
+# Build a beautiful soup object with the configured parser backend
+def make_soup(
+  html: str, page_type: Optional[str] = None, partial: Optional[bool] = None
+):
+  if partial is None:
+    partial = constants.HTML_PARTIAL_PARSING
+
+  parse_only = page_strainers[page_type] if partial and page_type else None
+  return BeautifulSoup(html, constants.HTML_PARSER, parse_only=parse_only)
+
+
+# Build the soup of a fetched page, the parse time is recorded under page_type
+def soup_from_page(
+  log: DagsterLogManager,
+  session: ScraperSession,
+  page: Optional[FetchedPage],
+  page_type: Optional[str] = None,
+):
+  if page is None:
+    return None
+
+  try:
+    soup, seconds = timed_call(make_soup, page.html, page_type)
+    session.stats.metrics.observe_parse(page_type or "full-page", seconds)
+    return soup
+  except Exception as e:
+    log.error(f"Failed to parse HTML for {page.url}: {e}")
+    return None
+
+
+# Extract a beautiful soup object from a url
+async def async_soup_from_url(
+  log: DagsterLogManager,
+  session: ScraperSession,
+  sem: asyncio.Semaphore,
+  url: str,
+  page_type: Optional[str] = None,
+):
+  page = await async_html_from_url(log, session, sem, url)
+  return soup_from_page(log, session, page, page_type)
+
 
 regex_card_name_url = re.compile(r"/cards\?q=name:")
 
 
+# Return the urls of the cards listed on an evolves from search page
+async def extract_evolves_from(
+  log: DagsterLogManager,
+  session: ScraperSession,
+  sem: asyncio.Semaphore,
+  url: str,
+) -> Optional[list[str]]:
+  soup = await async_soup_from_url(log, session, sem, url, page_type="card-search")
+  if soup is None:
+    return None
+
+  search_grid = soup.find("div", class_="card-search-grid")
+  if search_grid is None:
+    log.warning(f"Card search grid not found in evolves from page: {url}")
+    return []
+
+  return [a.attrs["href"] for a in search_grid.find_all("a") if "href" in a.attrs]
+
+
 async def extract_card(
   log: DagsterLogManager,
-  session: aiohttp.ClientSession,
+  session: ScraperSession,
   sem: asyncio.Semaphore,
   url: str,
 ):
@@ -295,24 +418,17 @@ async def extract_card(
           evolves_from = []
         else:
           evolves_from_url = evolves_from_link.attrs["href"]
-          soup_evolves_from = await async_soup_from_url(
-            log, session, sem, evolves_from_url
+          # The same search is shared by every print of a card, it is only
+          # fetched and parsed once per run
+          evolves_from = await session.memoized(
+            ("evolves-from", evolves_from_url),
+            lambda: extract_evolves_from(log, session, sem, evolves_from_url),
           )
-          if soup_evolves_from is None:
+          if evolves_from is None:
             log.warning(f"Failed to fetch evolves from page for URL: {url}")
             evolves_from = []
           else:
-            search_grid = soup_evolves_from.find("div", class_="card-search-grid")
-            if search_grid is None:
-              log.warning(
-                f"Card search grid not found in evolves from page for URL: {url}"
-              )
-              evolves_from = []
-            else:
-              previous_stages_a = search_grid.find_all("a")
-              evolves_from = [
-                a.attrs["href"] for a in previous_stages_a if "href" in a.attrs
-              ]
+            evolves_from = list(evolves_from)
 
     elif card_type == "Trainer":
       type_parts = text[0].split("- ")
@@ -465,20 +581,27 @@ def extract_matches_from_table_pairings(pairings: BeautifulSoup):
     raise ValueError(f"Error extracting matches from table pairings: {e}")
 
 
+# Fetch a set page and extract the cards it lists, skipping the card urls in
+# known_urls. Return the set page along with the new cards.
 async def extract_set(
   log: DagsterLogManager,
-  session: aiohttp.ClientSession,
+  session: ScraperSession,
   sem: asyncio.Semaphore,
   url: str,
+  known_urls: frozenset[str] = frozenset(),
 ):
-  if url is None:
-    return None
-
   try:
     log.info(f"extracting set {url}")
-    soup = await async_soup_from_url(log, session, sem, url)
+    page = await async_html_from_url(log, session, sem, url)
+    if page is None:
+      raise ValueError(f"Failed to fetch HTML for set URL: {url}")
+    if known_urls and not page.changed:
+      log.info(f"skipping set {url} because it is unchanged since last run")
+      return page, []
+
+    soup = soup_from_page(log, session, page, "card-search")
     if soup is None:
-      raise ValueError(f"Failed to fetch or parse HTML for set URL: {url}")
+      raise ValueError(f"Failed to parse HTML for set URL: {url}")
 
     search_grid = soup.find("div", class_="card-search-grid")
     if search_grid is None:
@@ -487,32 +610,89 @@ async def extract_set(
     cards_a = search_grid.find_all("a")
     if not cards_a:
       log.warning(f"No card links found for set URL: {url}")
-      return []
+      return page, []
 
     cards_urls = [a.attrs["href"] for a in cards_a if "href" in a.attrs]
     if not cards_urls:
       log.warning(f"No valid card URLs found for set URL: {url}")
-      return []
+      return page, []
 
-    return await asyncio.gather(
+    cards_urls = [card_url for card_url in cards_urls if card_url not in known_urls]
+    if known_urls:
+      log.info(f"found {len(cards_urls)} new cards in set {url}")
+
+    cards = await asyncio.gather(
       *[extract_card(log, session, sem, card_url) for card_url in cards_urls]
     )
+    return page, cards
   except Exception as e:
     log.error(f"Error extracting set from URL {url}: {e}")
     raise
 
 
-async def extract_all_cards(log: DagsterLogManager):
-  # Limit number of concurent http calls
-  connector = aiohttp.TCPConnector(limit=20)
+# Return the cards already stored in a set file, or None if there is no file
+def read_set_cards(log: DagsterLogManager, path: str) -> Optional[list[Card]]:
+  if not os.path.isfile(path):
+    return None
 
+  try:
+    return decode_record(Set, read_output_file(path)).cards
+  except (OSError, ValueError) as e:
+    log.warning(f"Failed to read set file {path}, it will be extracted again: {e}")
+    return None
+
+
+# Write the file of a set, or merge the new cards into the existing file when
+# incremental is set. Return the number of cards added to the file.
+async def refresh_set(
+  log: DagsterLogManager,
+  session: ScraperSession,
+  sem: asyncio.Semaphore,
+  set: Set,
+  incremental: bool,
+):
+  output_file = f"{constants.SETS_OUTPUT_DIR}/{set.code}.json"
+
+  stored_cards = read_set_cards(log, output_file) if incremental else None
+  if stored_cards is None:
+    page, cards = await extract_set(log, session, sem, set.url)
+    set.cards = cards
+  else:
+    # The set page is revalidated, only the cards missing from the file are
+    # fetched and appended after the stored ones
+    known_urls = frozenset(card.url for card in stored_cards)
+    page, cards = await extract_set(log, session, sem, set.url, known_urls=known_urls)
+    if not cards:
+      await mark_page_processed(log, sem, page)
+      return 0
+    set.cards = stored_cards + cards
+
+  try:
+    create_directory_for_file(output_file)
+    write_output_file(output_file, set)
+  except (OSError, IOError) as e:
+    log.error(f"Failed to write set file {output_file}: {e}")
+    raise
+  except Exception as e:
+    log.error(f"Unexpected error writing set file {output_file}: {e}")
+    raise
+
+  await mark_page_processed(log, sem, page)
+  return len(cards)
+
+
+async def extract_all_cards(
+  log: DagsterLogManager, scraper: ScraperResource, incremental: bool = True
+):
   # Limit number of concurent open files
   sem = asyncio.Semaphore(50)
 
-  async with aiohttp.ClientSession(
-    base_url=constants.BASE_URL_CARDS, connector=connector
-  ) as session:
-    soup = await async_soup_from_url(log, session, sem, "/cards", use_cache=False)
+  async with scraper.get_session(constants.BASE_URL_CARDS) as session:
+    # The index is revalidated to find new sets, the pages of the known sets are
+    # revalidated by refresh_set since cards can be added after a release
+    soup = await async_soup_from_url(log, session, sem, "/cards")
+    if soup is None:
+      raise ValueError("Failed to fetch or parse HTML for the /cards index")
     trs = extract_trs(soup, "sets-table", 2)
 
     sets: list[Set] = []
@@ -526,44 +706,19 @@ async def extract_all_cards(log: DagsterLogManager):
 
       sets.append(Set(set_name, set_code, set_release_date, set_url, None))
 
-    sets_urls = [set.url for set in sets]
-    sets_output_files = [
-      f"{constants.JSON_OUTPUT}/sets/{set.code}.json" for set in sets
-    ]
-
-    for i in range(len(sets)):
-      if os.path.isfile(sets_output_files[i]):
-        sets_urls[i] = None
-        log.info(
-          f"skipping set {sets[i].code} because {sets_output_files[i]} already exists"
-        )
-
-    cards = await asyncio.gather(
-      *[extract_set(log, session, sem, url) for url in sets_urls]
+    nb_new_cards = await asyncio.gather(
+      *[refresh_set(log, session, sem, set, incremental) for set in sets]
     )
 
-    for i in range(len(sets)):
-      if cards[i] is None:
-        continue
-
-      sets[i].cards = cards[i]
-
-      output_file = f"{constants.JSON_OUTPUT}/sets/{sets[i].code}.json"
-
-      try:
-        create_directory_for_file(output_file)
-        with open(output_file, "w") as f:
-          json.dump(asdict(sets[i]), f, indent=2)
-      except (OSError, IOError) as e:
-        log.error(f"Failed to write set file {output_file}: {e}")
-        raise
-      except Exception as e:
-        log.error(f"Unexpected error writing set file {output_file}: {e}")
-        raise
-
+    write_prometheus_textfile("set_files", session.stats.prometheus_lines("set_files"))
     return dagster.MaterializeResult(
       metadata={
         "Number of files": dagster.MetadataValue.int(len(sets)),
+        "Number of new cards": dagster.MetadataValue.int(sum(nb_new_cards)),
+        "Number of updated sets": dagster.MetadataValue.int(
+          len([nb for nb in nb_new_cards if nb > 0])
+        ),
+        **session.stats.to_metadata(),
       }
     )
 
@@ -603,91 +758,211 @@ def extract_decklist(decklist: BeautifulSoup) -> list[DeckListItem]:
     raise ValueError(f"Error extracting decklist: {e}")
 
 
+@dataclass
+class PlayerRow:
+  id: str
+  name: str
+  placing: Union[str, int]
+  country: Optional[str]
+  has_decklist: bool
+
+
+# Return the players listed in the table of a standings page
+def extract_player_rows(standings_page: BeautifulSoup) -> list[PlayerRow]:
+  player_trs = extract_trs(standings_page, "striped")
+  return [
+    PlayerRow(
+      player_tr.find("a", {"href": regex_player_id}).attrs["href"].split("/")[4],
+      player_tr.attrs["data-name"],
+      player_tr.attrs.get("data-placing", -1),
+      player_tr.attrs.get("data-country", None),
+      player_tr.find("a", {"href": regex_decklist_url}) is not None,
+    )
+    for player_tr in player_trs
+  ]
+
+
+# Return the matches of a pairing page, whatever its type
+def extract_matches_from_pairings(pairings: BeautifulSoup) -> list[Match]:
+  if is_bracket_pairing(pairings):
+    return extract_matches_from_bracket_pairings(pairings)
+  elif is_table_pairing(pairings):
+    return extract_matches_from_table_pairings(pairings)
+  else:
+    raise Exception("Unrecognized pairing type")
+
+
+# Parsers taking raw html and returning plain records, so that they can be run
+# in the parse pool of the session
+def parse_standings_page(html: str) -> list[PlayerRow]:
+  return extract_player_rows(make_soup(html, "standings"))
+
+
+def parse_decklist_page(html: str) -> list[DeckListItem]:
+  return extract_decklist(make_soup(html, "decklist"))
+
+
+def parse_pairings_page(html: str) -> list[Match]:
+  return extract_matches_from_pairings(make_soup(html, "pairings"))
+
+
+def parse_pairings_nav(html: str) -> list[str]:
+  return extract_previous_pairings_urls(make_soup(html, "pairings-nav", partial=True))
+
+
+# Fetch and parse a decklist page, return None if it could not be fetched.
+# The number of pages held between their download and their parse is capped by
+# the page slots of the session.
+async def extract_player_decklist(
+  log: DagsterLogManager,
+  session: ScraperSession,
+  sem: asyncio.Semaphore,
+  url: str,
+) -> Optional[list[DeckListItem]]:
+  async with session.page_slots:
+    page = await async_html_from_url(log, session, sem, url)
+    if page is None:
+      return None
+
+    return await session.parse("decklist", parse_decklist_page, page.html)
+
+
+# Return the players of a tournament with their decklist, or None if the
+# standings could not be fetched. Each stage is journaled in the crawl state and
+# resumed from it.
 async def extract_players(
   log: DagsterLogManager,
-  session: aiohttp.ClientSession,
+  session: ScraperSession,
   sem: asyncio.Semaphore,
-  standings_page: BeautifulSoup,
+  crawl_state: CrawlState,
   tournament_id: str,
-) -> list[Player]:
-  players = []
-  player_trs = extract_trs(standings_page, "striped")
-  player_ids = [
-    player_tr.find("a", {"href": regex_player_id}).attrs["href"].split("/")[4]
-    for player_tr in player_trs
-  ]
-  has_decklist = [
-    player_tr.find("a", {"href": regex_decklist_url}) is not None
-    for player_tr in player_trs
-  ]
-  player_names = [player_tr.attrs["data-name"] for player_tr in player_trs]
-  player_placings = [
-    player_tr.attrs.get("data-placing", -1) for player_tr in player_trs
-  ]
-  player_countries = [
-    player_tr.attrs.get("data-country", None) for player_tr in player_trs
-  ]
+) -> Optional[list[Player]]:
+  players = crawl_state.get(tournament_id, "decklists", list[Player])
+  if players is not None:
+    return players
+
+  player_rows = crawl_state.get(tournament_id, "standings", list[PlayerRow])
+  if player_rows is None:
+    standings_page = await async_html_from_url(
+      log, session, sem, construct_standings_url(tournament_id)
+    )
+    if standings_page is None:
+      return None
 
-  decklist_urls = []
-  for i in range(len(player_ids)):
-    decklist_urls.append(
-      construct_decklist_url(tournament_id, player_ids[i]) if has_decklist[i] else None
+    player_rows = await session.parse(
+      "standings", parse_standings_page, standings_page.html
     )
+    crawl_state.complete(tournament_id, "standings", player_rows)
+
+  decklist_urls = [
+    construct_decklist_url(tournament_id, row.id) if row.has_decklist else None
+    for row in player_rows
+  ]
 
   player_decklists = await asyncio.gather(
-    *[async_soup_from_url(log, session, sem, url, True) for url in decklist_urls]
+    *[extract_player_decklist(log, session, sem, url) for url in decklist_urls]
   )
 
   players = []
-  for i in range(len(player_ids)):
+  for i in range(len(player_rows)):
     if player_decklists[i] is None:
+      if decklist_urls[i] is not None:
+        log.warning(
+          f"dropping player {player_rows[i].id} of tournament {tournament_id}, "
+          "decklist could not be fetched"
+        )
       continue
 
     players.append(
       Player(
-        player_ids[i],
-        player_names[i],
-        player_placings[i],
-        player_countries[i],
-        extract_decklist(player_decklists[i]),
+        player_rows[i].id,
+        player_rows[i].name,
+        player_rows[i].placing,
+        player_rows[i].country,
+        player_decklists[i],
       )
     )
 
+  crawl_state.complete(tournament_id, "decklists", players)
   return players
 
 
+# Fetch and parse the matches of a pairings page
+async def extract_pairings(
+  log: DagsterLogManager,
+  session: ScraperSession,
+  sem: asyncio.Semaphore,
+  url: str,
+) -> list[Match]:
+  async with session.page_slots:
+    page = await async_html_from_url(log, session, sem, url)
+    if page is None:
+      raise ValueError(f"Failed to fetch pairings page {url}")
+
+    return await session.parse("pairings", parse_pairings_page, page.html)
+
+
+# Return the matches of every round of a tournament. The earlier rounds are
+# listed by the mini-nav of the last round page, they are fetched as soon as it
+# is read, while the matches of the last round are parsed.
 async def extract_matches(
   log: DagsterLogManager,
-  session: aiohttp.ClientSession,
+  session: ScraperSession,
   sem: asyncio.Semaphore,
+  crawl_state: CrawlState,
   tournament_id: str,
 ) -> list[Match]:
-  matches = []
-  last_pairings = await async_soup_from_url(
-    log, session, sem, construct_pairings_url(tournament_id)
-  )
-  previous_pairings_urls = extract_previous_pairings_urls(last_pairings)
-  pairings = await asyncio.gather(
-    *[async_soup_from_url(log, session, sem, url) for url in previous_pairings_urls]
-  )
-  pairings.append(last_pairings)
+  matches = crawl_state.get(tournament_id, "pairings", list[Match])
+  if matches is not None:
+    return matches
 
-  for pairing in pairings:
-    if is_bracket_pairing(pairing):
-      matches = matches + extract_matches_from_bracket_pairings(pairing)
-    elif is_table_pairing(pairing):
-      matches = matches + extract_matches_from_table_pairings(pairing)
-    else:
-      raise Exception("Unrecognized pairing type")
+  url = construct_pairings_url(tournament_id)
+  previous_rounds = None
+  try:
+    async with session.page_slots:
+      last_page = await async_html_from_url(log, session, sem, url)
+      if last_page is None:
+        raise ValueError(f"Failed to fetch pairings page {url}")
 
+      previous_urls = await session.parse(
+        "pairings-nav", parse_pairings_nav, last_page.html
+      )
+      previous_rounds = asyncio.gather(
+        *[
+          extract_pairings(log, session, sem, previous_url)
+          for previous_url in previous_urls
+        ]
+      )
+      last_round = await session.parse("pairings", parse_pairings_page, last_page.html)
+
+    matches = []
+    for round_matches in await previous_rounds:
+      matches.extend(round_matches)
+    matches.extend(last_round)
+  except BaseException:
+    if previous_rounds is not None:
+      previous_rounds.cancel()
+      await asyncio.gather(previous_rounds, return_exceptions=True)
+    raise
+
+  crawl_state.complete(tournament_id, "pairings", matches)
   return matches
 
 
+# Append a tournament to the tournaments without decklist, so that it is not
+# extracted again
+def record_tournament_without_decklist(tournament_id: str):
+  create_directory_for_file(constants.TOURNAMENTS_WITHOUT_DECKLIST_FILE)
+  with open(constants.TOURNAMENTS_WITHOUT_DECKLIST_FILE, "a") as f:
+    f.write(f"{tournament_id}\n")
+
+
 async def extract_standings(
   log: DagsterLogManager,
-  session: aiohttp.ClientSession,
+  session: ScraperSession,
   sem: asyncio.Semaphore,
-  standings_page: BeautifulSoup,
+  crawl_state: CrawlState,
+  source: "TournamentSource",
   tournament_id: str,
   tournament_name: str,
   tournament_date: str,
@@ -695,30 +970,54 @@ async def extract_standings(
   tournament_format: str,
   tournament_nb_players: int,
 ):
-  if standings_page is None:
-    log.debug("skipping because tournament is already in output")
-    return
-
   log.debug(f"extracting tournament {tournament_id}")
 
-  players = await extract_players(log, session, sem, standings_page, tournament_id)
-  if len(players) == 0:
-    log.debug("skipping because no decklist was detected")
-    return
-
-  output_file = f"{constants.TOURNAMENTS_OUTPUT_DIR}/{tournament_id}.json"
+  # The pairings are extracted along with the decklists, and dropped if the
+  # tournament turns out to have no decklist
+  matches_task = asyncio.ensure_future(
+    source.extract_matches(log, session, sem, crawl_state, tournament_id)
+  )
   try:
-    create_directory_for_file(output_file)
-  except Exception as e:
-    log.error(f"Failed to create directory for tournament file {output_file}: {e}")
-    raise
+    players = await source.extract_players(
+      log, session, sem, crawl_state, tournament_id
+    )
 
-  nb_decklists = 0
-  for player in players:
-    if len(player.decklist) > 0:
-      nb_decklists += 1
+    if players is None:
+      log.warning(
+        f"skipping tournament {tournament_id}, standings could not be fetched"
+      )
+      return
 
-  matches = await extract_matches(log, session, sem, tournament_id)
+    if len(players) == 0:
+      log.debug("skipping because no decklist was detected")
+      try:
+        await asyncio.to_thread(record_tournament_without_decklist, tournament_id)
+      except (OSError, IOError) as e:
+        log.warning(
+          f"Failed to record tournament {tournament_id} without decklist: {e}"
+        )
+        return
+      crawl_state.written(tournament_id)
+      return
+
+    output_file = f"{constants.TOURNAMENTS_OUTPUT_DIR}/{tournament_id}.json"
+    try:
+      create_directory_for_file(output_file)
+    except Exception as e:
+      log.error(f"Failed to create directory for tournament file {output_file}: {e}")
+      raise
+
+    nb_decklists = 0
+    for player in players:
+      if len(player.decklist) > 0:
+        nb_decklists += 1
+
+    matches = await matches_task
+  finally:
+    # Whatever the exit, the pairings task does not outlive the tournament
+    if not matches_task.done():
+      matches_task.cancel()
+    await asyncio.gather(matches_task, return_exceptions=True)
 
   tournament = Tournament(
     tournament_id,
@@ -732,8 +1031,7 @@ async def extract_standings(
   )
 
   try:
-    with open(output_file, "w") as f:
-      json.dump(asdict(tournament), f, indent=2)
+    write_output_file(output_file, tournament)
   except (OSError, IOError) as e:
     log.error(f"Failed to write tournament file {output_file}: {e}")
     raise
@@ -741,99 +1039,489 @@ async def extract_standings(
     log.error(f"Unexpected error writing tournament file {output_file}: {e}")
     raise
 
+  crawl_state.written(tournament_id)
+
+
+# Url of a page of the completed tournaments list
+def construct_tournament_list_url(page_number: int):
+  if page_number == 1:
+    return first_tournament_page
+  return f"{first_tournament_page}&page={page_number}"
+
+
+# Ids of the tournaments that were already crawled, either written to the output
+# directory or skipped because they had no decklist
+def read_known_tournament_ids():
+  known_ids = set()
+  if os.path.isdir(constants.TOURNAMENTS_OUTPUT_DIR):
+    known_ids.update(
+      name.removesuffix(".json")
+      for name in os.listdir(constants.TOURNAMENTS_OUTPUT_DIR)
+    )
+  if os.path.isfile(constants.TOURNAMENTS_WITHOUT_DECKLIST_FILE):
+    with open(constants.TOURNAMENTS_WITHOUT_DECKLIST_FILE) as f:
+      known_ids.update(line.strip() for line in f if line.strip())
+  return known_ids
+
+
+@dataclass
+class TournamentListing:
+  id: str
+  name: str
+  date: str
+  organizer: str
+  format: str
+  nb_players: str
+
+
+# Extract the tournaments queued by the completed tournaments pages, until the
+# worker is cancelled. The future queued with each tournament is resolved once
+# the tournament is written, or skipped.
+async def tournament_worker(
+  log: DagsterLogManager,
+  session: ScraperSession,
+  sem: asyncio.Semaphore,
+  crawl_state: CrawlState,
+  source: "TournamentSource",
+  tournaments: asyncio.Queue,
+):
+  while True:
+    listing, done = await tournaments.get()
+    try:
+      await extract_standings(
+        log,
+        session,
+        sem,
+        crawl_state,
+        source,
+        listing.id,
+        listing.name,
+        listing.date,
+        listing.organizer,
+        listing.format,
+        listing.nb_players,
+      )
+      done.set_result(None)
+    except Exception as e:
+      done.set_exception(e)
+    finally:
+      tournaments.task_done()
+
+
+# Queue a tournament for the workers, and journal it so that an interrupted run
+# resumes it. Return the future resolved once the tournament is extracted.
+async def queue_tournament(
+  crawl_state: CrawlState, tournaments: asyncio.Queue, listing: TournamentListing
+):
+  crawl_state.complete(listing.id, "listed", listing)
+  future = asyncio.get_running_loop().create_future()
+  await tournaments.put((listing, future))
+  return future
+
+
+# Extract one page of the completed tournaments list. Return the max page number
+# (None when the source does not give it), whether every tournament of the page
+# was already known and whether the page was empty.
+async def extract_tournament_list_page(
+  log: DagsterLogManager,
+  session: ScraperSession,
+  sem: asyncio.Semaphore,
+  crawl_state: CrawlState,
+  source: "TournamentSource",
+  page_number: int,
+  known_ids: set[str],
+  tournaments: asyncio.Queue,
+):
+  page = await async_html_from_url(log, session, sem, source.list_url(page_number))
+  if page is None:
+    raise ValueError(f"Failed to fetch completed tournaments page {page_number}")
+
+  if not page.changed and source.parse_max_page is not None:
+    # Only the max page is needed when the page was already processed
+    max_page = source.parse_max_page(page.html)
+    log.info(f"skipping completed tournaments page {page_number}, unchanged")
+    return max_page, True, False
+
+  log.info(f"extracting completed tournaments page {page_number}")
+  max_page, listings = await session.parse(
+    "tournament-list", source.parse_list_page, page.html
+  )
+  await extract_tournament_page(log, crawl_state, listings, known_ids, tournaments)
+  await mark_page_processed(log, sem, page)
+
+  return (
+    max_page,
+    all(listing.id in known_ids for listing in listings),
+    len(listings) == 0,
+  )
+
 
+# Extract the completed tournaments list. The max page is read from the first
+# page and the other pages are fetched concurrently.
+# In incremental mode the pages are fetched by windows, and the crawl stops after
+# the first window containing a page where every tournament is already known.
+# When the source does not give the max page, the pages are fetched by windows
+# until an empty one.
+# The listing pages queue their new tournaments for a fixed number of workers,
+# the queue is bounded so that a page waits while the workers are busy.
 async def extract_tournament_list(
   log: DagsterLogManager,
-  session: aiohttp.ClientSession,
+  session: ScraperSession,
   sem: asyncio.Semaphore,
-  url: str,
+  crawl_state: CrawlState,
+  source: "TournamentSource",
+  incremental: bool = False,
 ):
-  soup = await async_soup_from_url(log, session, sem, url, False)
+  known_ids = read_known_tournament_ids()
 
-  current_page = int(soup.find("ul", class_="pagination").attrs["data-current"])
-  max_page = int(soup.find("ul", class_="pagination").attrs["data-max"])
+  tournaments = asyncio.Queue(maxsize=constants.TOURNAMENTS_IN_FLIGHT)
+  workers = [
+    asyncio.create_task(
+      tournament_worker(log, session, sem, crawl_state, source, tournaments)
+    )
+    for _ in range(constants.TOURNAMENTS_IN_FLIGHT)
+  ]
 
-  log.info(f"extracting completed tournaments page {current_page}")
+  try:
+    # Tournaments left unfinished by an interrupted run are extracted first,
+    # they may be listed on pages the incremental crawl does not reach anymore
+    pending = [
+      listing
+      for listing in crawl_state.pending(TournamentListing)
+      if listing.id not in known_ids
+    ]
+    if pending:
+      log.info(f"resuming {len(pending)} tournaments left unfinished by last run")
+      crawl_state.resumed_tournaments = len(pending)
+      done = [
+        await queue_tournament(crawl_state, tournaments, listing) for listing in pending
+      ]
+      await asyncio.gather(*done)
+
+    max_page, all_known, empty = await extract_tournament_list_page(
+      log, session, sem, crawl_state, source, 1, known_ids, tournaments
+    )
+    nb_pages = 1
+    if empty:
+      return nb_pages
+    if incremental and all_known:
+      log.info("stopping at completed tournaments page 1, no new tournament")
+      return nb_pages
+
+    if incremental or max_page is None:
+      window = constants.TOURNAMENT_PAGES_WINDOW
+    else:
+      window = max_page
+    page_number = 2
+    while max_page is None or page_number <= max_page:
+      last_page = page_number + window - 1
+      if max_page is not None:
+        last_page = min(last_page, max_page)
+      page_numbers = range(page_number, last_page + 1)
+      results = await asyncio.gather(
+        *[
+          extract_tournament_list_page(
+            log, session, sem, crawl_state, source, n, known_ids, tournaments
+          )
+          for n in page_numbers
+        ]
+      )
+      nb_pages += len(page_numbers)
+
+      if incremental and any(all_known for _, all_known, _ in results):
+        log.info(
+          f"stopping at completed tournaments page {page_numbers[-1]}, "
+          "no new tournament after this page"
+        )
+        break
+      if any(empty for _, _, empty in results):
+        break
+
+      page_number += window
+
+    return nb_pages
+  finally:
+    for worker in workers:
+      worker.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+
+
+# Queue every new tournament listed on a completed tournaments page and wait for
+# them to be extracted
+async def extract_tournament_page(
+  log: DagsterLogManager,
+  crawl_state: CrawlState,
+  listings: list[TournamentListing],
+  known_ids: set[str],
+  tournaments: asyncio.Queue,
+):
+  done = []
+  for listing in listings:
+    output_file = f"{constants.TOURNAMENTS_OUTPUT_DIR}/{listing.id}.json"
+    if listing.id in known_ids or os.path.isfile(output_file):
+      log.debug(f"skipping tournament {listing.id}, already in output")
+      continue
+
+    done.append(await queue_tournament(crawl_state, tournaments, listing))
+
+  await asyncio.gather(*done)
+
+
+first_tournament_page = (
+  "/tournaments/completed?game=POCKET&format=STANDARD&platform=all&type=online&time=all"
+)
+regex_standings_url = re.compile(r"/tournament/[a-zA-Z0-9_\-]*/standings")
+
+
+# Parsers of a completed tournaments page, returning the max page number and the
+# tournaments listed on the page, or only the max page number
+def parse_tournament_list_page(html: str):
+  soup = make_soup(html, "tournament-list")
+  max_page = int(soup.find("ul", class_="pagination").attrs["data-max"])
 
   tournament_trs = extract_trs(soup, "completed-tournaments")
-  tournament_ids = [
-    tournament_tr.find("a", {"href": regex_standings_url}).attrs["href"].split("/")[2]
+  return max_page, [
+    TournamentListing(
+      tournament_tr.find("a", {"href": regex_standings_url})
+      .attrs["href"]
+      .split("/")[2],
+      tournament_tr.attrs["data-name"],
+      tournament_tr.attrs["data-date"],
+      tournament_tr.attrs["data-organizer"],
+      tournament_tr.attrs["data-format"],
+      tournament_tr.attrs["data-players"],
+    )
     for tournament_tr in tournament_trs
   ]
-  tournament_names = [
-    tournament_tr.attrs["data-name"] for tournament_tr in tournament_trs
-  ]
-  tournament_dates = [
-    tournament_tr.attrs["data-date"] for tournament_tr in tournament_trs
-  ]
-  tournament_organizers = [
-    tournament_tr.attrs["data-organizer"] for tournament_tr in tournament_trs
-  ]
-  tournament_formats = [
-    tournament_tr.attrs["data-format"] for tournament_tr in tournament_trs
-  ]
-  tournament_nb_players = [
-    tournament_tr.attrs["data-players"] for tournament_tr in tournament_trs
-  ]
 
-  standings_urls = [
-    construct_standings_url(tournament_id) for tournament_id in tournament_ids
-  ]
 
-  for i in range(len(tournament_ids)):
-    output_file = f"{constants.TOURNAMENTS_OUTPUT_DIR}/{tournament_ids[i]}.json"
-    if os.path.isfile(output_file):
-      standings_urls[i] = None
+def parse_tournament_list_max_page(html: str) -> int:
+  soup = make_soup(html, "pagination", partial=True)
+  return int(soup.find("ul", class_="pagination").attrs["data-max"])
+
 
-  # Get all standings page asynchroneously
-  standings = await asyncio.gather(
-    *[async_soup_from_url(log, session, sem, url) for url in standings_urls]
+# Urls of the Limitless JSON API, served by the tournaments site
+def construct_api_tournament_list_url(page_number: int):
+  return (
+    "/api/tournaments?game=POCKET&format=STANDARD"
+    f"&limit={constants.LIMITLESS_API_PAGE_SIZE}&page={page_number}"
   )
 
-  await asyncio.gather(
-    *[
-      extract_standings(
-        log,
-        session,
-        sem,
-        standings[i],
-        tournament_ids[i],
-        tournament_names[i],
-        tournament_dates[i],
-        tournament_organizers[i],
-        tournament_formats[i],
-        tournament_nb_players[i],
+
+def construct_api_standings_url(tournament_id: str):
+  return f"/api/tournaments/{tournament_id}/standings"
+
+
+def construct_api_pairings_url(tournament_id: str):
+  return f"/api/tournaments/{tournament_id}/pairings"
+
+
+# Parsers of the Limitless JSON API responses, returning the same records as the
+# html parsers. The list does not give the number of pages, and gives the id of
+# the organizer rather than its name. Tournaments played with a custom format
+# have a null format, stored as an empty format like the html source does.
+def parse_api_tournament_list_page(text: str):
+  try:
+    return None, [
+      TournamentListing(
+        tournament["id"],
+        tournament["name"],
+        tournament["date"],
+        str(tournament.get("organizerId", "")),
+        tournament.get("format") or "",
+        str(tournament["players"]),
+      )
+      for tournament in json.loads(text)
+    ]
+  except (KeyError, TypeError, ValueError) as e:
+    raise ValueError(f"Error extracting tournaments from api list: {e}")
+
+
+# Return the cards of a decklist of the api standings, grouped by card category
+def extract_api_decklist(decklist: dict) -> list[DeckListItem]:
+  return [
+    DeckListItem(f"/cards/{card['set']}/{card['number']}", card["count"])
+    for cards in decklist.values()
+    for card in cards
+  ]
+
+
+# Return the players of the api standings, the players without decklist are
+# dropped like on the standings page
+def parse_api_standings_page(text: str) -> list[Player]:
+  try:
+    return [
+      Player(
+        standing["player"],
+        standing["name"],
+        -1 if standing.get("placing") is None else str(standing["placing"]),
+        standing.get("country"),
+        extract_api_decklist(standing["decklist"]),
       )
-      for i in range(len(tournament_ids))
+      for standing in json.loads(text)
+      if standing.get("decklist")
     ]
+  except (AttributeError, KeyError, TypeError, ValueError) as e:
+    raise ValueError(f"Error extracting players from api standings: {e}")
+
+
+# Return the matches of the api pairings of every round. The api only gives the
+# winner, who scores 1 while the loser scores 0, and both score 0 on a tie.
+def parse_api_pairings_page(text: str) -> list[Match]:
+  try:
+    matches = []
+    for pairing in json.loads(text):
+      # Byes have no second player, unfinished matches no winner
+      if not pairing.get("player2") or pairing.get("winner") is None:
+        continue
+
+      winner = str(pairing["winner"])
+      matches.append(
+        Match(
+          [
+            MatchResult(player_id, 1 if player_id == winner else 0)
+            for player_id in (pairing["player1"], pairing["player2"])
+          ]
+        )
+      )
+    return matches
+  except (KeyError, TypeError, ValueError) as e:
+    raise ValueError(f"Error extracting matches from api pairings: {e}")
+
+
+# Return the players of a tournament with their decklist from the api, or None if
+# the standings could not be fetched
+async def extract_api_players(
+  log: DagsterLogManager,
+  session: ScraperSession,
+  sem: asyncio.Semaphore,
+  crawl_state: CrawlState,
+  tournament_id: str,
+) -> Optional[list[Player]]:
+  players = crawl_state.get(tournament_id, "decklists", list[Player])
+  if players is not None:
+    return players
+
+  page = await async_html_from_url(
+    log, session, sem, construct_api_standings_url(tournament_id)
   )
+  if page is None:
+    return None
 
-  # for i in range(len(tournament_ids)):
-  #   await extract_standings(log, session, sem, standings[i], tournament_ids[i], tournament_names[i], tournament_dates[i], tournament_organizers[i], tournament_formats[i], tournament_nb_players[i])
+  players = await session.parse("api-standings", parse_api_standings_page, page.html)
+  crawl_state.complete(tournament_id, "decklists", players)
+  return players
 
-  if current_page < max_page:
-    await extract_tournament_list(
-      log, session, sem, f"{first_tournament_page}&page={current_page + 1}"
-    )
 
+async def extract_api_matches(
+  log: DagsterLogManager,
+  session: ScraperSession,
+  sem: asyncio.Semaphore,
+  crawl_state: CrawlState,
+  tournament_id: str,
+) -> list[Match]:
+  matches = crawl_state.get(tournament_id, "pairings", list[Match])
+  if matches is not None:
+    return matches
 
-first_tournament_page = (
-  "/tournaments/completed?game=POCKET&format=STANDARD&platform=all&type=online&time=all"
-)
-regex_standings_url = re.compile(r"/tournament/[a-zA-Z0-9_\-]*/standings")
+  url = construct_api_pairings_url(tournament_id)
+  page = await async_html_from_url(log, session, sem, url)
+  if page is None:
+    raise ValueError(f"Failed to fetch pairings {url}")
+
+  matches = await session.parse("api-pairings", parse_api_pairings_page, page.html)
+  crawl_state.complete(tournament_id, "pairings", matches)
+  return matches
 
 
-async def extract_all_tournaments(log: DagsterLogManager):
-  # Limit number of concurent http calls
-  connector = aiohttp.TCPConnector(limit=20)
+@dataclass
+class TournamentSource:
+  # Headers sent with every request to the source
+  headers: dict[str, str]
+  # Url of a page of the completed tournaments list
+  list_url: Callable[[int], str]
+  # Parser of a completed tournaments page taking its body, run in the parse
+  # pool. Return the max page number, None when the source does not give it,
+  # and the tournaments listed on the page.
+  parse_list_page: Callable[[str], tuple[Optional[int], list[TournamentListing]]]
+  # Parser of the max page number alone, for the pages unchanged since they were
+  # processed. The whole page is parsed again when None.
+  parse_max_page: Optional[Callable[[str], int]]
+  # Return the players of a tournament with their decklist, or None if the
+  # standings could not be fetched
+  extract_players: Callable[..., Awaitable[Optional[list[Player]]]]
+  # Return the matches of every round of a tournament
+  extract_matches: Callable[..., Awaitable[list[Match]]]
+  # Pattern of the urls of the pages read from the source
+  cache_url_pattern: str
+
+
+# Sources the tournaments can be extracted from, they produce the same records
+# and share the tournaments site
+tournament_sources = {
+  "html": TournamentSource(
+    {},
+    construct_tournament_list_url,
+    parse_tournament_list_page,
+    parse_tournament_list_max_page,
+    extract_players,
+    extract_matches,
+    rf"^{re.escape(constants.BASE_URL_TOURNAMENTS)}/tournaments?/",
+  ),
+  "limitless-api": TournamentSource(
+    {"X-Access-Key": constants.LIMITLESS_API_KEY}
+    if constants.LIMITLESS_API_KEY
+    else {},
+    construct_api_tournament_list_url,
+    parse_api_tournament_list_page,
+    None,
+    extract_api_players,
+    extract_api_matches,
+    rf"^{re.escape(constants.BASE_URL_TOURNAMENTS)}/api/tournaments",
+  ),
+}
+
+
+async def extract_all_tournaments(
+  log: DagsterLogManager,
+  scraper: ScraperResource,
+  incremental: bool = False,
+  source: str = constants.TOURNAMENT_SOURCE,
+):
+  if source not in tournament_sources:
+    raise ValueError(f"Unknown tournament source '{source}'")
+  tournament_source = tournament_sources[source]
 
   # Limit number of concurent open files
   sem = asyncio.Semaphore(50)
 
-  async with aiohttp.ClientSession(
-    base_url=constants.BASE_URL_TOURNAMENTS, connector=connector
-  ) as session:
-    await extract_tournament_list(log, session, sem, first_tournament_page)
+  crawl_state = CrawlState(constants.CRAWL_STATE_DATABASE)
+  try:
+    crawl_state.record_source(source)
+    async with scraper.get_session(
+      constants.BASE_URL_TOURNAMENTS,
+      parse_workers=constants.PARSE_WORKERS,
+      headers=tournament_source.headers,
+    ) as session:
+      nb_pages = await extract_tournament_list(
+        log, session, sem, crawl_state, tournament_source, incremental
+      )
+      write_prometheus_textfile(
+        "tournament_files", session.stats.prometheus_lines("tournament_files")
+      )
+      return nb_pages, {**session.stats.to_metadata(), **crawl_state.to_metadata()}
+  finally:
+    crawl_state.close()
+
+
+class SetFilesConfig(dagster.Config):
+  incremental: bool = Field(
+    default=True,
+    description=(
+      "Only fetch the cards missing from the existing set files, instead of "
+      "extracting every card of every set again"
+    ),
+  )
 
 
 @dagster.asset(
@@ -842,10 +1530,29 @@ async def extract_all_tournaments(log: DagsterLogManager):
 )
 async def set_files(
   context: dagster.AssetExecutionContext,
+  config: SetFilesConfig,
+  scraper: ScraperResource,
 ) -> dagster.MaterializeResult:
   """The raw JSON files containing all the cards for each set"""
 
-  return await extract_all_cards(context.log)
+  return await extract_all_cards(context.log, scraper, config.incremental)
+
+
+class TournamentFilesConfig(dagster.Config):
+  incremental: bool = Field(
+    default=True,
+    description=(
+      "Stop crawling the completed tournaments list after the first page where "
+      "every tournament was already extracted"
+    ),
+  )
+  source: str = Field(
+    default=constants.TOURNAMENT_SOURCE,
+    description=(
+      "Source of the tournaments, 'html' to scrape the tournament pages or "
+      "'limitless-api' to read the Limitless JSON API"
+    ),
+  )
 
 
 @dagster.asset(
@@ -854,10 +1561,14 @@ async def set_files(
 )
 async def tournament_files(
   context: dagster.AssetExecutionContext,
+  config: TournamentFilesConfig,
+  scraper: ScraperResource,
 ) -> dagster.MaterializeResult:
   """The raw JSON files containing all the tournament data"""
 
-  await extract_all_tournaments(context.log)
+  nb_pages, crawl_metadata = await extract_all_tournaments(
+    context.log, scraper, config.incremental, config.source
+  )
 
   number_of_files = len(
     [
@@ -869,6 +1580,8 @@ async def tournament_files(
   return dagster.MaterializeResult(
     metadata={
       "Number of files": dagster.MetadataValue.int(number_of_files),
+      "Number of listing pages": dagster.MetadataValue.int(nb_pages),
+      **crawl_metadata,
     }
   )
 
@@ -894,70 +1607,191 @@ def translate_extension_code(full_name: str):
 regex_extension_url = re.compile(r"/extensions/[a-zA-Z0-9\-]*.html")
 
 
+# Return the [set code, card number, card name] rows of a translated set page
+def extract_translations(set_page: BeautifulSoup, set_code: str):
+  cards_a = set_page.find("div", {"id": "liste_cartes"}).find_all("a", class_="carte")
+  return [
+    [
+      set_code,
+      int(a.find("div", class_="carte_rarete").find("div").getText().split(" / ")[0]),
+      a.find("div", class_="carte_nom").get_text(strip=True),
+    ]
+    for a in cards_a
+  ]
+
+
+# Return the (set code, url) of every set page listed on the pokekalos index
+def extract_pokekalos_set_pages(index: BeautifulSoup) -> list[tuple[str, str]]:
+  sets_a = index.find_all("a", {"href": regex_extension_url})
+  return [(translate_extension_code(a.get_text()), a["href"]) for a in sets_a]
+
+
+def parse_pokekalos_set_page(html: str, set_code: str):
+  return extract_translations(make_soup(html, "translation-set"), set_code)
+
+
+@dataclass
+class TranslationSource:
+  base_url: str
+  index_url: str
+  # Return the (set code, url) of the set pages listed on the index page
+  extract_set_pages: Callable[[BeautifulSoup], list[tuple[str, str]]]
+  # Parser of a set page taking its html and set code, run in the parse pool
+  parse_set_page: Callable[[str, str], list[list]]
+
+
+# Sites the card names of each locale are extracted from. The locales sharing a
+# site are extracted with the same session.
+translation_sources = {
+  "fr": TranslationSource(
+    constants.BASE_URL_TRANSLATIONS,
+    "/jeux/mobile/pocket/cartodex/extensions.html",
+    extract_pokekalos_set_pages,
+    parse_pokekalos_set_page,
+  ),
+}
+
+
+# Return the rows of an existing translation file by set code
+def read_translation_rows(path: str) -> dict[str, list[list]]:
+  rows = defaultdict(list)
+  if os.path.isfile(path):
+    with open(path) as f:
+      for row in csv.reader(f):
+        rows[row[0]].append(row)
+  return rows
+
+
+# Write the rows of a translation file, set by set
+def write_translation_file(path: str, rows: dict[str, list[list]]):
+  create_directory_for_file(path)
+  with open(path, "w") as f:
+    write = csv.writer(f)
+    for set_rows in rows.values():
+      write.writerows(set_rows)
+
+
+# Extract the translations of one locale into its csv file. Only the sets with
+# a changed page are parsed again, the rows of the other sets are kept from the
+# existing file. Return the number of lines and of parsed pages.
+async def extract_locale_translations(
+  log: DagsterLogManager,
+  session: ScraperSession,
+  sem: asyncio.Semaphore,
+  locale: str,
+  source: TranslationSource,
+):
+  output_file = f"{constants.TRANSLATIONS_OUTPUT_DIR}/{locale}.csv"
+  rows = await asyncio.to_thread(read_translation_rows, output_file)
+
+  index = await async_soup_from_url(log, session, sem, source.index_url)
+  if index is None:
+    raise ValueError(f"Failed to fetch or parse translations index {source.index_url}")
+  set_pages = source.extract_set_pages(index)
+
+  pages = await asyncio.gather(
+    *[async_html_from_url(log, session, sem, url) for _, url in set_pages]
+  )
+
+  pages_by_code = defaultdict(list)
+  for (set_code, url), page in zip(set_pages, pages):
+    if page is None:
+      raise ValueError(f"Failed to fetch translation page {url}")
+    pages_by_code[set_code].append(page)
+
+  changed_codes = [
+    set_code
+    for set_code, code_pages in pages_by_code.items()
+    if set_code not in rows or any(page.changed for page in code_pages)
+  ]
+  log.info(f"parsing {len(changed_codes)} changed sets for locale {locale}")
+
+  parsed = await asyncio.gather(
+    *[
+      asyncio.gather(
+        *[
+          session.parse("translation-set", source.parse_set_page, page.html, set_code)
+          for page in pages_by_code[set_code]
+        ]
+      )
+      for set_code in changed_codes
+    ]
+  )
+  for set_code, set_rows in zip(changed_codes, parsed):
+    rows[set_code] = [row for page_rows in set_rows for row in page_rows]
+
+  try:
+    await asyncio.to_thread(write_translation_file, output_file, rows)
+  except (OSError, IOError) as e:
+    log.error(f"Failed to write translation file {output_file}: {e}")
+    raise
+  except Exception as e:
+    log.error(f"Unexpected error writing translation file {output_file}: {e}")
+    raise
+
+  for set_code in changed_codes:
+    for page in pages_by_code[set_code]:
+      await mark_page_processed(log, sem, page)
+
+  nb_lines = sum(len(set_rows) for set_rows in rows.values())
+  nb_pages = sum(len(pages_by_code[set_code]) for set_code in changed_codes)
+  return nb_lines, nb_pages
+
+
+class TranslationFilesConfig(dagster.Config):
+  locales: list[str] = Field(
+    default=["fr"],
+    description="Locales of the translation files, one csv file per locale",
+  )
+
+
 @dagster.asset(
   group_name="extract",
   kinds=["python", "csv"],
 )
 async def translation_files(
   context: dagster.AssetExecutionContext,
+  config: TranslationFilesConfig,
+  scraper: ScraperResource,
 ) -> dagster.MaterializeResult:
   """The raw CSV files containing translations for each card"""
 
-  # Limit number of concurent http calls
-  connector = aiohttp.TCPConnector(limit=20)
-
   # Limit number of concurent open files
   sem = asyncio.Semaphore(50)
 
-  async with aiohttp.ClientSession(
-    base_url=constants.BASE_URL_TRANSLATIONS, connector=connector
-  ) as session:
-    soup = await async_soup_from_url(
-      context.log, session, sem, "/jeux/mobile/pocket/cartodex/extensions.html", False
-    )
-    sets_a = soup.find_all("a", {"href": regex_extension_url})
-    sets_ids = [translate_extension_code(a.get_text()) for a in sets_a]
-    sets_urls = [a["href"] for a in sets_a]
-    sets_soups = await asyncio.gather(
-      *[async_soup_from_url(context.log, session, sem, url, True) for url in sets_urls]
-    )
-    translation_output_file = f"{constants.JSON_OUTPUT}/translations/fr.csv"
-
-    card_translations = []
-
-    for i in range(len(sets_ids)):
-      cards_a = (
-        sets_soups[i].find("div", {"id": "liste_cartes"}).find_all("a", class_="carte")
-      )
-      for a in cards_a:
-        card_translations.append(
-          [
-            sets_ids[i],
-            int(
-              a.find("div", class_="carte_rarete").find("div").getText().split(" / ")[0]
-            ),
-            a.find("div", class_="carte_nom").get_text(strip=True),
-          ]
-        )
-
-    try:
-      create_directory_for_file(translation_output_file)
-      with open(translation_output_file, "w") as f:
-        write = csv.writer(f)
-        write.writerows(card_translations)
-    except (OSError, IOError) as e:
-      context.log.error(
-        f"Failed to write translation file {translation_output_file}: {e}"
-      )
-      raise
-    except Exception as e:
-      context.log.error(
-        f"Unexpected error writing translation file {translation_output_file}: {e}"
+  locales_by_base_url = defaultdict(list)
+  for locale in config.locales:
+    if locale not in translation_sources:
+      raise ValueError(f"Unknown translation locale '{locale}'")
+    locales_by_base_url[translation_sources[locale].base_url].append(locale)
+
+  nb_lines = 0
+  nb_pages = 0
+  stats = ScraperStats()
+  for base_url, locales in locales_by_base_url.items():
+    async with scraper.get_session(
+      base_url, parse_workers=constants.PARSE_WORKERS
+    ) as session:
+      results = await asyncio.gather(
+        *[
+          extract_locale_translations(
+            context.log, session, sem, locale, translation_sources[locale]
+          )
+          for locale in locales
+        ]
       )
-      raise
+    for locale_lines, locale_pages in results:
+      nb_lines += locale_lines
+      nb_pages += locale_pages
+    stats.add(session.stats)
 
+  write_prometheus_textfile(
+    "translation_files", stats.prometheus_lines("translation_files")
+  )
   return dagster.MaterializeResult(
     metadata={
-      "Number of lines": dagster.MetadataValue.int(len(card_translations)),
+      "Number of lines": dagster.MetadataValue.int(nb_lines),
+      "Number of parsed pages": dagster.MetadataValue.int(nb_pages),
+      **stats.to_metadata(),
     }
   )
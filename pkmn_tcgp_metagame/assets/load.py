@@ -1,14 +1,162 @@
+import asyncio
+import contextlib
 import csv
-import json
+import hashlib
+import multiprocessing
 import os
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import astuple, dataclass
 from datetime import datetime
+from typing import Callable, Iterator, Optional
 
 import dagster
+from pydantic import Field
 
 from pkmn_tcgp_metagame.assets import constants
-from pkmn_tcgp_metagame.postgres.helpers import execute_many, execute_sql_script
+from pkmn_tcgp_metagame.assets.records import Set, Tournament, decode_record
+from pkmn_tcgp_metagame.assets.serialization import loads_output, read_output_file
+from pkmn_tcgp_metagame.postgres.helpers import (
+  CopyWriter,
+  StagingTableLoad,
+  create_staging_table,
+  execute_sql_script,
+  swap_staging_table,
+  table_is_empty,
+  table_is_unlogged,
+)
 from pkmn_tcgp_metagame.postgres.postgres_resource import PostgresResource
 
+# Postgres types of the columns of the raw tables, in order, for the binary copy
+RAW_CARDS_TYPES = [
+  "varchar",
+  "varchar",
+  "int4",
+  "varchar",
+  "varchar",
+  "varchar",
+  "varchar",
+  "bool",
+]
+RAW_SETS_TYPES = ["varchar", "varchar", "timestamp"]
+RAW_EVOLUTIONS_TYPES = ["varchar", "varchar"]
+RAW_TOURNAMENTS_TYPES = ["varchar", "varchar", "varchar", "timestamp"]
+RAW_DECKLISTS_TYPES = ["varchar", "varchar", "varchar", "int4"]
+RAW_MATCHES_TYPES = ["varchar", "varchar", "varchar"]
+
+
+class RawTableConfig(dagster.Config):
+  logged: bool = Field(
+    default=constants.RAW_TABLES_LOGGED,
+    description=(
+      "Set the reloaded raw tables logged, so that they survive a crash of the "
+      "postgres server. Unlogged tables are faster to load, a crash empties them "
+      "and they are reloaded in full by their next load."
+    ),
+  )
+
+
+def load_metadata(nb_rows: int, rows_per_second: float):
+  return {
+    "Number of lines": dagster.MetadataValue.int(nb_rows),
+    "Rows per second": dagster.MetadataValue.float(round(rows_per_second, 1)),
+  }
+
+
+@dataclass
+class RawTable:
+  """A raw table and the rows of each of the records loaded into it."""
+
+  name: str
+  columns: str
+  types: list[str]
+  rows: Callable[[object], list[tuple]]
+
+
+def set_rows(set: Set):
+  return [
+    (
+      set.code,
+      set.name,
+      datetime.strptime(set.release_date, "%d %b %y") if set.release_date else None,
+    )
+  ]
+
+
+def card_rows(set: Set):
+  return [
+    (
+      card.url,
+      set.code,
+      card.number,
+      card.name,
+      card.type,
+      card.subtype,
+      card.stage,
+      card.is_promo,
+    )
+    for card in set.cards
+  ]
+
+
+def evolution_rows(set: Set):
+  return [
+    (previous_stage_url, card.url)
+    for card in set.cards
+    if card.evolves_from is not None
+    for previous_stage_url in card.evolves_from
+  ]
+
+
+raw_set_tables = {
+  "raw_cards": RawTable(
+    name="raw.cards",
+    columns="""
+      card_url varchar null,
+      set_code varchar null,
+      card_number int null,
+      card_name varchar null,
+      card_type varchar null,
+      card_subtype varchar null,
+      card_stage varchar null,
+      is_promo boolean null
+    """,
+    types=RAW_CARDS_TYPES,
+    rows=card_rows,
+  ),
+  "raw_sets": RawTable(
+    name="raw.sets",
+    columns="""
+      set_code varchar null,
+      set_name varchar null,
+      set_release_date timestamp null
+    """,
+    types=RAW_SETS_TYPES,
+    rows=set_rows,
+  ),
+  "raw_evolutions": RawTable(
+    name="raw.evolutions",
+    columns="""
+      previous_stage_url varchar null,
+      next_stage_url varchar null
+    """,
+    types=RAW_EVOLUTIONS_TYPES,
+    rows=evolution_rows,
+  ),
+}
+
+
+# Read the set files one at a time
+def read_set_files() -> Iterator[Set]:
+  for file in [
+    f"{constants.SETS_OUTPUT_DIR}/{file}"
+    for file in os.listdir(constants.SETS_OUTPUT_DIR)
+  ]:
+    try:
+      yield decode_record(Set, read_output_file(file))
+    except ValueError as e:
+      raise ValueError(f"Invalid set file {file}: {e}")
+
 
 @dagster.multi_asset(
   can_subset=True,
@@ -36,107 +184,445 @@ from pkmn_tcgp_metagame.postgres.postgres_resource import PostgresResource
     ),
   ],
 )
-def load_set_files(context: dagster.AssetExecutionContext, database: PostgresResource):
-  if "raw_cards" in context.selected_output_names:
-    query_create_raw_cards = """
-      drop table if exists raw.cards;
-      create table raw.cards (
-        card_url varchar null,
-        set_code varchar null,
-        card_number int null,
-        card_name varchar null,
-        card_type varchar null,
-        card_subtype varchar null,
-        card_stage varchar null,
-        is_promo boolean null
-      );
-    """
-    execute_sql_script(context.log, database, query_create_raw_cards)
-
-  if "raw_sets" in context.selected_output_names:
-    query_create_raw_sets = """
-      drop table if exists raw.sets;
-      create table raw.sets (
-        set_code varchar null,
-        set_name varchar null,
-        set_release_date timestamp null
-      );
-    """
-    execute_sql_script(context.log, database, query_create_raw_sets)
-
-  if "raw_evolutions" in context.selected_output_names:
-    query_create_raw_evolutions = """
-      drop table if exists raw.evolutions;
-      create table raw.evolutions (
-        previous_stage_url varchar null,
-        next_stage_url varchar null
-      );
+def load_set_files(
+  context: dagster.AssetExecutionContext,
+  config: RawTableConfig,
+  database: PostgresResource,
+):
+  tables = {
+    key: table
+    for key, table in raw_set_tables.items()
+    if key in context.selected_output_names
+  }
+
+  # Each table is copied into its staging table from its own connection and
+  # transaction, while the files are parsed
+  with contextlib.ExitStack() as stack:
+    loads: dict[str, StagingTableLoad] = {}
+    for key, table in tables.items():
+      conn = stack.enter_context(database.get_connection())
+      stack.enter_context(conn.transaction())
+      cur = stack.enter_context(conn.cursor())
+      loads[key] = stack.enter_context(
+        StagingTableLoad(
+          context.log, cur, table.name, table.columns, table.types, config.logged
+        )
+      )
+
+    for set in read_set_files():
+      for key, table in tables.items():
+        loads[key].write_rows(table.rows(set))
+
+  for key, load in loads.items():
+    yield dagster.MaterializeResult(
+      asset_key=key,
+      metadata=load_metadata(load.writer.nb_rows, load.writer.rows_per_second()),
+    )
+
+
+def tournament_rows(tournament: Tournament):
+  return [
+    (
+      tournament.id,
+      tournament.name,
+      tournament.organizer,
+      datetime.strptime(tournament.date, "%Y-%m-%dT%H:%M:%S.000Z"),
+    )
+  ]
+
+
+def decklist_rows(tournament: Tournament):
+  return [
+    (tournament.id, player.id, card.url, card.count)
+    for player in tournament.players
+    for card in player.decklist
+  ]
+
+
+def match_rows(tournament: Tournament):
+  rows = []
+  for match in tournament.matches:
+    match_results = match.match_results
+
+    # Only insert the match if it's not a draw
+    if match_results[0].score == match_results[1].score:
+      continue
+
+    sorted_match_results = sorted(match_results, key=lambda x: x.score)
+    rows.append(
+      (
+        tournament.id,
+        sorted_match_results[1].player_id,
+        sorted_match_results[0].player_id,
+      )
+    )
+  return rows
+
+
+raw_tournament_tables = {
+  "raw_tournaments": RawTable(
+    name="raw.tournaments",
+    columns="""
+      tournament_id varchar null,
+      tournament_name varchar null,
+      tournament_organizer varchar null,
+      tournament_date timestamp NULL
+    """,
+    types=RAW_TOURNAMENTS_TYPES,
+    rows=tournament_rows,
+  ),
+  "raw_decklists": RawTable(
+    name="raw.decklists",
+    columns="""
+      tournament_id varchar null,
+      player_id varchar null,
+      card_url varchar null,
+      decklist_count int null
+    """,
+    types=RAW_DECKLISTS_TYPES,
+    rows=decklist_rows,
+  ),
+  "raw_matches": RawTable(
+    name="raw.matches",
+    columns="""
+      tournament_id varchar null,
+      winner_player_id varchar null,
+      loser_player_id varchar null
+    """,
+    types=RAW_MATCHES_TYPES,
+    rows=match_rows,
+  ),
+}
+
+# The files loaded into each raw table, to only load the files that are new,
+# changed or removed since the last load
+query_create_load_manifest = """
+  create table if not exists raw.load_manifest (
+    table_name varchar not null,
+    file_name varchar not null,
+    file_size bigint not null,
+    file_mtime_ns bigint not null,
+    content_hash varchar not null,
+    tournament_id varchar not null,
+    nb_rows bigint,
+    primary key (table_name, file_name)
+  );
+  alter table raw.load_manifest add column if not exists nb_rows bigint;
+"""
+
+
+@dataclass
+class ManifestEntry:
+  """A file as it was when it was loaded into a raw table."""
+
+  file_size: int
+  file_mtime_ns: int
+  content_hash: str
+  tournament_id: str
+  # Number of rows of the file in the table, None when loaded before it was kept
+  nb_rows: Optional[int]
+
+
+def read_load_manifest(cur, table: str) -> dict[str, ManifestEntry]:
+  cur.execute(
     """
-    execute_sql_script(context.log, database, query_create_raw_evolutions)
+    select file_name, file_size, file_mtime_ns, content_hash, tournament_id, nb_rows
+    from raw.load_manifest
+    where table_name = %s
+    """,
+    (table,),
+  )
+  return {row[0]: ManifestEntry(*row[1:]) for row in cur.fetchall()}
+
+
+# Decode a tournament file into the rows of the raw tables with the given keys.
+# Return its content hash, its tournament id and the rows by table key.
+def decode_tournament_file(
+  path: str, keys: list[str]
+) -> tuple[str, str, dict[str, list[tuple]]]:
+  with open(path, "rb") as f:
+    data = f.read()
+  try:
+    tournament = decode_record(Tournament, loads_output(data))
+  except ValueError as e:
+    raise ValueError(f"Invalid tournament file {path}: {e}")
+  rows = {key: raw_tournament_tables[key].rows(tournament) for key in keys}
+  return hashlib.sha256(data).hexdigest(), tournament.id, rows
+
+
+# Same as executor.map with a single iterable, with at most in_flight calls
+# submitted ahead of the result being read
+def map_in_flight(executor: Executor, fn, items, *args, in_flight: int):
+  futures = deque()
+  for item in items:
+    futures.append(executor.submit(fn, item, *args))
+    if len(futures) >= in_flight:
+      yield futures.popleft().result()
+  while futures:
+    yield futures.popleft().result()
+
+
+class TournamentFiles:
+  """The tournament files on disk, each hashed at most once."""
+
+  def __init__(self, directory: str):
+    self.directory = directory
+    self.stats = {
+      name: os.stat(f"{directory}/{name}") for name in os.listdir(directory)
+    }
+    self.hashes: dict[str, str] = {}
+    self.ids: dict[str, str] = {}
+
+  def read_bytes(self, name: str) -> bytes:
+    with open(f"{self.directory}/{name}", "rb") as f:
+      data = f.read()
+    self.hashes[name] = hashlib.sha256(data).hexdigest()
+    return data
+
+  def content_hash(self, name: str) -> str:
+    if name not in self.hashes:
+      self.read_bytes(name)
+    return self.hashes[name]
+
+  # Decode the files into the rows of the raw tables with the given keys, in the
+  # order of names, one file at a time or in worker processes. Nothing is kept but
+  # the hash and id of the files.
+  def decode(
+    self, names: list[str], keys: list[str], workers: int = 0
+  ) -> Iterator[tuple[str, dict[str, list[tuple]]]]:
+    paths = [f"{self.directory}/{name}" for name in names]
+    if workers > 0:
+      executor = ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+      )
+      # Files decoded ahead of the writers, the rest are not submitted yet so
+      # that the rows held in memory stay bounded
+      results = map_in_flight(
+        executor, decode_tournament_file, paths, keys, in_flight=workers * 4
+      )
+    else:
+      executor = None
+      results = (decode_tournament_file(path, keys) for path in paths)
+
+    try:
+      for name, (content_hash, tournament_id, rows) in zip(names, results):
+        self.hashes[name] = content_hash
+        self.ids[name] = tournament_id
+        yield name, rows
+    finally:
+      if executor is not None:
+        executor.shutdown(cancel_futures=True)
+
+  def manifest_entry(
+    self, name: str, tournament_id: str, nb_rows: Optional[int]
+  ) -> ManifestEntry:
+    stat = self.stats[name]
+    return ManifestEntry(
+      stat.st_size, stat.st_mtime_ns, self.content_hash(name), tournament_id, nb_rows
+    )
 
-  set_data = []
-  card_data = []
-  evolution_data = []
+  def is_unchanged(self, name: str, entry: Optional[ManifestEntry]):
+    stat = self.stats[name]
+    return (
+      entry is not None
+      and entry.file_size == stat.st_size
+      and entry.file_mtime_ns == stat.st_mtime_ns
+    )
 
-  for file in [
-    f"{constants.SETS_OUTPUT_DIR}/{file}"
-    for file in os.listdir(constants.SETS_OUTPUT_DIR)
-  ]:
-    with open(file) as f:
-      set = json.load(f)
-      set_code = set["code"]
 
-      set_data.append(
-        (
-          set_code,
-          set["name"],
-          datetime.strptime(set["release_date"], "%d %b %y")
-          if set["release_date"]
-          else None,
+class RawTournamentTableLoad:
+  """Load of the tournament files that are new or changed since the last load
+  into a raw table, in the transaction of its cursor.
+
+  Entering the load removes the rows of the files that changed or were removed.
+  When full_reload is set, when the table has no manifest or does not exist, or
+  when it is an unlogged table emptied of the rows its manifest lists, the files
+  are all loaded into a staging table instead, swapped in place of the table when
+  the load exits. The rows of the files are written as they are read, and the
+  manifest is updated when the load exits.
+  """
+
+  def __init__(
+    self,
+    log: dagster.DagsterLogManager,
+    cur,
+    table: RawTable,
+    files: TournamentFiles,
+    full_reload: bool,
+    logged: bool,
+  ):
+    self.log = log
+    self.cur = cur
+    self.table = table
+    self.files = files
+    self.full_reload = full_reload
+    self.logged = logged
+    self.manifest: dict[str, ManifestEntry] = {}
+    self.loaded: set[str] = set()
+    self.nb_rows: dict[str, int] = {}
+    self.touched: list[str] = []
+    self.removed: list[str] = []
+    self.target = table.name
+    self.writer: Optional[CopyWriter] = None
+
+  def __enter__(self):
+    if not self.full_reload:
+      self.manifest = read_load_manifest(self.cur, self.table.name)
+      # An unlogged table is emptied by a crash of the server, while its manifest
+      # is kept. A table the manifest lists no row of is legitimately empty.
+      unlogged = table_is_unlogged(self.cur, self.table.name)
+      self.full_reload = (
+        not self.manifest
+        or unlogged is None
+        or (
+          unlogged
+          and any(entry.nb_rows != 0 for entry in self.manifest.values())
+          and table_is_empty(self.cur, self.table.name)
         )
       )
-
-      for card in set["cards"]:
-        card_data.append(
-          (
-            card["url"],
-            set_code,
-            card["number"],
-            card["name"],
-            card["type"],
-            card["subtype"],
-            card["stage"],
-            card["is_promo"],
-          )
+      if self.full_reload:
+        self.manifest = {}
+
+    self.removed = [name for name in self.manifest if name not in self.files.stats]
+    for name in self.files.stats:
+      entry = self.manifest.get(name)
+      if self.full_reload:
+        self.loaded.add(name)
+      elif self.files.is_unchanged(name, entry):
+        continue
+      elif entry is not None and entry.content_hash == self.files.content_hash(name):
+        # Same content with a new mtime, only the manifest is updated
+        self.touched.append(name)
+      else:
+        self.loaded.add(name)
+
+    if self.full_reload:
+      self.log.info(f"Reloading {self.table.name} from {len(self.loaded)} files")
+      self.target = create_staging_table(self.cur, self.table.name, self.table.columns)
+      self.cur.execute(
+        "delete from raw.load_manifest where table_name = %s", (self.table.name,)
+      )
+    else:
+      self.log.info(
+        f"Loading {len(self.loaded)} new or changed files into {self.table.name}, "
+        f"removing {len(self.removed)} files"
+      )
+      # The files are named after their tournament, the new files are not read
+      # before they are copied
+      stale_ids = {
+        *[self.manifest[name].tournament_id for name in self.removed],
+        *[
+          self.manifest[name].tournament_id
+          if name in self.manifest
+          else name.removesuffix(".json")
+          for name in self.loaded
+        ],
+      }
+      if stale_ids:
+        self.cur.execute(
+          f"delete from {self.table.name} where tournament_id = any(%s)",
+          (list(stale_ids),),
         )
 
-        previous_stages = card["evolves_from"]
-        if previous_stages is not None:
-          for previous_stage_url in previous_stages:
-            evolution_data.append((previous_stage_url, card["url"]))
+    self.writer = CopyWriter(self.log, self.cur, self.target, self.table.types)
+    self.writer.__enter__()
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.writer.__exit__(exc_type, exc_value, traceback)
+    if exc_type is not None:
+      return
+
+    # Created after the copy, so that a full reload does not maintain it row by
+    # row. The index of the staging table is renamed after the swap, so that it
+    # keeps the same name from one reload to the next.
+    schema, name = self.table.name.split(".")
+    index_name = f"{name}_tournament_id_idx"
+    if self.full_reload:
+      staging_index_name = f"{name}_staging_tournament_id_idx"
+      self.cur.execute(
+        f"create index {staging_index_name} on {self.target} (tournament_id)"
+      )
+      swap_staging_table(self.cur, self.table.name, self.target, self.logged)
+      self.cur.execute(
+        f"alter index {schema}.{staging_index_name} rename to {index_name}"
+      )
+    else:
+      self.cur.execute(
+        f"create index if not exists {index_name} on {self.table.name} (tournament_id)"
+      )
 
-  if "raw_cards" in context.selected_output_names:
-    execute_many(context.log, database, "INSERT INTO raw.cards values ()", card_data)
-    yield dagster.MaterializeResult(
-      asset_key="raw_cards",
-      metadata={"Number of lines": dagster.MetadataValue.int(len(card_data))},
+    if self.removed:
+      self.cur.execute(
+        "delete from raw.load_manifest where table_name = %s and file_name = any(%s)",
+        (self.table.name, self.removed),
+      )
+    self.cur.executemany(
+      """
+      insert into raw.load_manifest (
+        table_name, file_name, file_size, file_mtime_ns, content_hash,
+        tournament_id, nb_rows
+      )
+      values (%s, %s, %s, %s, %s, %s, %s)
+      on conflict (table_name, file_name) do update set
+        file_size = excluded.file_size,
+        file_mtime_ns = excluded.file_mtime_ns,
+        content_hash = excluded.content_hash,
+        tournament_id = excluded.tournament_id,
+        nb_rows = excluded.nb_rows
+      """,
+      [
+        (
+          self.table.name,
+          name,
+          *astuple(self.files.manifest_entry(name, tournament_id, nb_rows)),
+        )
+        for name, tournament_id, nb_rows in [
+          *[
+            (name, self.files.ids[name], self.nb_rows.get(name, 0))
+            for name in sorted(self.loaded)
+          ],
+          *[
+            (name, self.manifest[name].tournament_id, self.manifest[name].nb_rows)
+            for name in self.touched
+          ],
+        ]
+      ],
     )
 
-  if "raw_sets" in context.selected_output_names:
-    execute_many(context.log, database, "INSERT INTO raw.sets values ()", set_data)
-    yield dagster.MaterializeResult(
-      asset_key="raw_sets",
-      metadata={"Number of lines": dagster.MetadataValue.int(len(set_data))},
-    )
+  def write(self, name: str, rows: list[tuple]):
+    if name in self.loaded:
+      self.nb_rows[name] = len(rows)
+      self.writer.write_rows(rows)
+
+  def metadata(self):
+    return {
+      **load_metadata(self.writer.nb_rows, self.writer.rows_per_second()),
+      "Full reload": dagster.MetadataValue.bool(self.full_reload),
+      "Loaded files": dagster.MetadataValue.int(len(self.loaded)),
+      "Removed files": dagster.MetadataValue.int(len(self.removed)),
+      "Unchanged files": dagster.MetadataValue.int(
+        len(self.files.stats) - len(self.loaded)
+      ),
+    }
 
-  if "raw_evolutions" in context.selected_output_names:
-    execute_many(
-      context.log, database, "INSERT INTO raw.evolutions values ()", evolution_data
-    )
-    yield dagster.MaterializeResult(
-      asset_key="raw_evolutions",
-      metadata={"Number of lines": dagster.MetadataValue.int(len(evolution_data))},
-    )
+
+class LoadTournamentFilesConfig(RawTableConfig):
+  full_reload: bool = Field(
+    default=False,
+    description=(
+      "Drop the raw tournament tables and load every tournament file again, "
+      "instead of only the files that are new, changed or removed since the last "
+      "load"
+    ),
+  )
+  decode_workers: int = Field(
+    default=constants.LOAD_WORKERS,
+    description=(
+      "Number of worker processes decoding the tournament files into rows, 0 to "
+      "decode them in the asset process"
+    ),
+  )
 
 
 @dagster.multi_asset(
@@ -166,111 +652,66 @@ def load_set_files(context: dagster.AssetExecutionContext, database: PostgresRes
   ],
 )
 def load_tournaments_files(
-  context: dagster.AssetExecutionContext, database: PostgresResource
+  context: dagster.AssetExecutionContext,
+  config: LoadTournamentFilesConfig,
+  database: PostgresResource,
 ):
-  if "raw_tournaments" in context.selected_output_names:
-    query_create_raw_tournaments = """
-      drop table if exists raw.tournaments;
-      create table raw.tournaments (
-        tournament_id varchar null,
-        tournament_name varchar null,
-        tournament_organizer varchar null,
-        tournament_date timestamp NULL
-      );
-    """
-    execute_sql_script(context.log, database, query_create_raw_tournaments)
-
-  if "raw_decklists" in context.selected_output_names:
-    query_create_raw_tournaments = """
-      drop table if exists raw.decklists;
-      create table raw.decklists (
-        tournament_id varchar null,
-        player_id varchar null,
-        card_url varchar null,
-        decklist_count int null
-      );
-    """
-    execute_sql_script(context.log, database, query_create_raw_tournaments)
-
-  if "raw_matches" in context.selected_output_names:
-    query_create_raw_matches = """
-      drop table if exists raw.matches;
-      create table raw.matches (
-        tournament_id varchar null,
-        winner_player_id varchar null,
-        loser_player_id varchar null
-      );
-    """
-    execute_sql_script(context.log, database, query_create_raw_matches)
-
-  decklist_data = []
-  tournament_data = []
-  match_data = []
-
-  for file in [
-    f"{constants.TOURNAMENTS_OUTPUT_DIR}/{file}"
-    for file in os.listdir(constants.TOURNAMENTS_OUTPUT_DIR)
-  ]:
-    with open(file) as f:
-      tournament = json.load(f)
-      tournament_data.append(
-        (
-          tournament["id"],
-          tournament["name"],
-          tournament["organizer"],
-          datetime.strptime(tournament["date"], "%Y-%m-%dT%H:%M:%S.000Z"),
+  execute_sql_script(context.log, database, query_create_load_manifest)
+  files = TournamentFiles(constants.TOURNAMENTS_OUTPUT_DIR)
+
+  # Each table is loaded in its own transaction, the files are decoded once for
+  # all the tables while their rows are copied
+  with contextlib.ExitStack() as stack:
+    loads: dict[str, RawTournamentTableLoad] = {}
+    for key, table in raw_tournament_tables.items():
+      if key not in context.selected_output_names:
+        continue
+      conn = stack.enter_context(database.get_connection())
+      stack.enter_context(conn.transaction())
+      cur = stack.enter_context(conn.cursor())
+      loads[key] = stack.enter_context(
+        RawTournamentTableLoad(
+          context.log, cur, table, files, config.full_reload, config.logged
         )
       )
 
-      if "raw_decklists" in context.selected_output_names:
-        for player in tournament["players"]:
-          player_id = player["id"]
-          for card in player["decklist"]:
-            decklist_data.append(
-              (tournament["id"], player_id, card["url"], int(card["count"]))
-            )
-
-      if "raw_matches" in context.selected_output_names:
-        for match in tournament["matches"]:
-          match_results = match["match_results"]
-
-          # Only insert the match if it's not a draw
-          if match_results[0]["score"] == match_results[1]["score"]:
-            continue
-
-          sorted_match_results = sorted(match_results, key=lambda x: x["score"])
-          match_data.append(
-            (
-              tournament["id"],
-              sorted_match_results[1]["player_id"],
-              sorted_match_results[0]["player_id"],
-            )
-          )
-
-  if "raw_tournaments" in context.selected_output_names:
-    execute_many(
-      context.log, database, "insert into raw.tournaments values ()", tournament_data
-    )
-    yield dagster.MaterializeResult(
-      asset_key="raw_tournaments",
-      metadata={"Number of lines": dagster.MetadataValue.int(len(tournament_data))},
-    )
+    names = sorted(set().union(*[load.loaded for load in loads.values()]))
+    for name, rows in files.decode(names, list(loads), config.decode_workers):
+      for key, load in loads.items():
+        load.write(name, rows[key])
+
+  for key, load in loads.items():
+    yield dagster.MaterializeResult(asset_key=key, metadata=load.metadata())
+
+
+# Load the translation files into raw.translations, return the load. The values
+# are read as text from the csv files, they are converted by the server.
+def load_translation_files(
+  log: dagster.DagsterLogManager, database: PostgresResource, logged: bool
+) -> StagingTableLoad:
+  columns = """
+    set_code varchar null,
+    card_number int null,
+    card_name varchar null,
+    locale varchar null
+  """
 
-  if "raw_decklists" in context.selected_output_names:
-    execute_many(
-      context.log, database, "insert into raw.decklists values ()", decklist_data
-    )
-    yield dagster.MaterializeResult(
-      asset_key="raw_decklists",
-      metadata={"Number of lines": dagster.MetadataValue.int(len(decklist_data))},
-    )
+  with database.get_connection() as conn:
+    with conn.transaction():
+      with conn.cursor() as cur:
+        with StagingTableLoad(
+          log, cur, "raw.translations", columns, logged=logged
+        ) as load:
+          # One file per locale, named after the locale
+          for name in os.listdir(constants.TRANSLATIONS_OUTPUT_DIR):
+            if not name.endswith(".csv"):
+              continue
+            locale = name.removesuffix(".csv")
 
-  if "raw_matches" in context.selected_output_names:
-    execute_many(context.log, database, "insert into raw.matches values ()", match_data)
-    yield dagster.MaterializeResult(
-      asset_key="raw_matches",
-      metadata={"Number of lines": dagster.MetadataValue.int(len(match_data))},
-    )
+            with open(f"{constants.TRANSLATIONS_OUTPUT_DIR}/{name}") as f:
+              reader = csv.reader(f)
+              load.write_rows((*row, locale) for row in reader)
+  return load
 
 
 @dagster.asset(
@@ -279,33 +720,16 @@ def load_tournaments_files(
   kinds=["python", "postgres"],
 )
 async def raw_translations(
-  context: dagster.AssetExecutionContext, database: PostgresResource
+  context: dagster.AssetExecutionContext,
+  config: RawTableConfig,
+  database: PostgresResource,
 ) -> dagster.MaterializeResult:
   """Table raw.translations created and loaded with data"""
-  translation_input_file = f"{constants.JSON_OUTPUT}/translations/fr.csv"
-
-  translation_data = []
-
-  with open(translation_input_file) as f:
-    reader = csv.reader(f)
-    for row in reader:
-      translation_data.append(tuple(row))
-
-  query_create_raw_translations = """
-    drop table if exists raw.translations;
-    create table raw.translations (
-      set_code varchar null,
-      card_number int null,
-      card_name varchar null
-    );
-  """
-  execute_sql_script(context.log, database, query_create_raw_translations)
-
-  execute_many(
-    context.log, database, "insert into raw.translations values ()", translation_data
+  # The files and the database are accessed in a thread, off the event loop
+  load = await asyncio.to_thread(
+    load_translation_files, context.log, database, config.logged
   )
+
   return dagster.MaterializeResult(
-    metadata={
-      "Number of lines": dagster.MetadataValue.int(len(translation_data)),
-    }
+    metadata=load_metadata(load.writer.nb_rows, load.writer.rows_per_second())
   )
@@ -0,0 +1,194 @@
+import os
+import re
+from typing import Optional
+
+import dagster
+from pydantic import Field
+from yarl import URL
+
+from pkmn_tcgp_metagame.assets import constants
+from pkmn_tcgp_metagame.assets.extract import (
+  read_known_tournament_ids,
+  tournament_sources,
+)
+from pkmn_tcgp_metagame.scraper.crawl_state import CrawlState
+from pkmn_tcgp_metagame.scraper.html_cache import (
+  CacheEntryInfo,
+  DirectoryHtmlCache,
+  SqliteHtmlCache,
+  migrate_directory_cache,
+  open_html_cache,
+)
+
+
+@dagster.asset(
+  group_name="maintenance",
+  kinds=["python", "sqlite"],
+)
+def html_cache_migration(
+  context: dagster.AssetExecutionContext,
+) -> dagster.MaterializeResult:
+  """The packed html cache store, filled with the pages of the data/cache tree"""
+  if not os.path.isdir(constants.BEAUTIFULSOUP_CACHE):
+    context.log.info(f"nothing to migrate, {constants.BEAUTIFULSOUP_CACHE} not found")
+    nb_pages, nb_bytes, nb_skipped = 0, 0, 0
+  else:
+    target = SqliteHtmlCache(constants.HTML_CACHE_DATABASE)
+    try:
+      nb_pages, nb_bytes, nb_skipped = migrate_directory_cache(
+        DirectoryHtmlCache(constants.BEAUTIFULSOUP_CACHE), target
+      )
+    finally:
+      target.close()
+
+  context.log.info(
+    f"migrated {nb_pages} pages from {constants.BEAUTIFULSOUP_CACHE} "
+    f"to {constants.HTML_CACHE_DATABASE}, skipped {nb_skipped} pages"
+  )
+
+  return dagster.MaterializeResult(
+    metadata={
+      "Number of pages": dagster.MetadataValue.int(nb_pages),
+      "Number of skipped pages": dagster.MetadataValue.int(nb_skipped),
+      "Source size (bytes)": dagster.MetadataValue.int(nb_bytes),
+      "Store size (bytes)": dagster.MetadataValue.int(
+        os.path.getsize(constants.HTML_CACHE_DATABASE)
+        if os.path.isfile(constants.HTML_CACHE_DATABASE)
+        else 0
+      ),
+    }
+  )
+
+
+# Url paths of the pages of a tournament, with the tournament id
+regex_tournament_path = re.compile(r"^/(?:api/tournaments|tournament)/([^/]+)/")
+
+
+class HtmlCacheGcConfig(dagster.Config):
+  max_size_mb: int = Field(
+    default=constants.HTML_CACHE_MAX_SIZE_MB,
+    description="Budget of the cached pages, the least recently used are evicted",
+  )
+  purge_patterns: Optional[list[str]] = Field(
+    default=None,
+    description=(
+      "Regular expressions of the urls of url classes that are no longer read, "
+      "purged whatever the budget. Defaults to the pages of the tournament "
+      "sources other than the one the tournaments were last crawled from."
+    ),
+  )
+  compact: bool = Field(
+    default=True,
+    description="Give the space of the deleted pages back to the file system",
+  )
+
+
+# Source the tournaments were last crawled from, which may have been set in the
+# config of the tournament assets rather than in TOURNAMENT_SOURCE
+def read_crawled_source():
+  if not os.path.isfile(constants.CRAWL_STATE_DATABASE):
+    return constants.TOURNAMENT_SOURCE
+  crawl_state = CrawlState(constants.CRAWL_STATE_DATABASE)
+  try:
+    return crawl_state.last_source() or constants.TOURNAMENT_SOURCE
+  finally:
+    crawl_state.close()
+
+
+# Pick the cache entries to delete. The entries whose url matches a purge
+# pattern are always deleted. Then while the cache is over budget the least
+# recently used entries are evicted, the entries that are never read again
+# first: the pages of tournaments already written to the output and the entries
+# left under a legacy key.
+def select_cache_evictions(
+  entries: list[CacheEntryInfo],
+  max_size: int,
+  purge_patterns: list[re.Pattern],
+  written_ids: set[str],
+):
+  purged = []
+  kept = []
+  for entry in entries:
+    if entry.url is not None and any(
+      pattern.search(entry.url) for pattern in purge_patterns
+    ):
+      purged.append(entry)
+    else:
+      kept.append(entry)
+
+  def eviction_order(entry: CacheEntryInfo):
+    if entry.url is None:
+      return (False, entry.accessed_at)
+    match = regex_tournament_path.match(URL(entry.url).path)
+    written = match is not None and match.group(1) in written_ids
+    return (not written, entry.accessed_at)
+
+  evicted = []
+  size = sum(entry.size for entry in kept)
+  for entry in sorted(kept, key=eviction_order):
+    if size <= max_size:
+      break
+    evicted.append(entry)
+    size -= entry.size
+
+  return purged, evicted
+
+
+@dagster.asset(
+  group_name="maintenance",
+  kinds=["python", "sqlite"],
+)
+def html_cache_gc(
+  context: dagster.AssetExecutionContext, config: HtmlCacheGcConfig
+) -> dagster.MaterializeResult:
+  """The html cache, with the unused pages purged and trimmed to its size budget"""
+  if config.purge_patterns is None:
+    live_source = read_crawled_source()
+    purge_patterns = [
+      source.cache_url_pattern
+      for name, source in tournament_sources.items()
+      if name != live_source
+    ]
+  else:
+    purge_patterns = config.purge_patterns
+
+  cache = open_html_cache()
+  try:
+    size_before = cache.disk_size()
+    entries = list(cache.entries())
+    purged, evicted = select_cache_evictions(
+      entries,
+      config.max_size_mb * 1024 * 1024,
+      [re.compile(pattern) for pattern in purge_patterns],
+      read_known_tournament_ids(),
+    )
+
+    deleted = [entry.key for entry in purged + evicted]
+    for i in range(0, len(deleted), 500):
+      cache.delete_many(deleted[i : i + 500])
+    if deleted and config.compact:
+      cache.compact()
+    size_after = cache.disk_size()
+  finally:
+    cache.close()
+
+  # The space given back to the file system is measured on the store, the size
+  # of the deleted entries is only freed within the store until it is compacted
+  reclaimed = max(0, size_before - size_after)
+  deleted_payload = sum(entry.size for entry in purged + evicted)
+  context.log.info(
+    f"purged {len(purged)} and evicted {len(evicted)} of {len(entries)} cached "
+    f"pages holding {deleted_payload} bytes, {reclaimed} bytes reclaimed on disk"
+  )
+
+  return dagster.MaterializeResult(
+    metadata={
+      "Number of pages": dagster.MetadataValue.int(len(entries) - len(deleted)),
+      "Number of purged pages": dagster.MetadataValue.int(len(purged)),
+      "Number of evicted pages": dagster.MetadataValue.int(len(evicted)),
+      "Deleted payload bytes": dagster.MetadataValue.int(deleted_payload),
+      "Reclaimed bytes": dagster.MetadataValue.int(reclaimed),
+      "Store size before (bytes)": dagster.MetadataValue.int(size_before),
+      "Store size after (bytes)": dagster.MetadataValue.int(size_after),
+    }
+  )
@@ -0,0 +1,163 @@
+import functools
+import typing
+from dataclasses import dataclass, fields, is_dataclass
+from typing import Optional, Union
+
+# Records written to the output files by the extract assets and read back by the
+# load assets. They declare __slots__ so that the many small records of a
+# tournament do not each carry a __dict__.
+
+
+@dataclass
+class DeckListItem:
+  __slots__ = ("url", "count")
+  url: str
+  count: int
+
+
+@dataclass
+class Player:
+  __slots__ = ("id", "name", "placing", "country", "decklist")
+  id: str
+  name: str
+  # -1 when the standings do not give a placing
+  placing: Union[str, int]
+  country: Optional[str]
+  decklist: list[DeckListItem]
+
+
+@dataclass
+class MatchResult:
+  __slots__ = ("player_id", "score")
+  player_id: str
+  score: int
+
+
+@dataclass
+class Match:
+  __slots__ = ("match_results",)
+  match_results: list[MatchResult]
+
+
+@dataclass
+class Tournament:
+  __slots__ = (
+    "id",
+    "name",
+    "date",
+    "organizer",
+    "format",
+    "nb_players",
+    "players",
+    "matches",
+  )
+  id: str
+  name: str
+  date: str
+  organizer: str
+  format: str
+  nb_players: str
+  players: list[Player]
+  matches: list[Match]
+
+
+@dataclass
+class Card:
+  __slots__ = (
+    "url",
+    "number",
+    "name",
+    "type",
+    "subtype",
+    "stage",
+    "evolves_from",
+    "is_promo",
+  )
+  url: str
+  number: int
+  name: str
+  type: str
+  subtype: Optional[str]
+  stage: Optional[str]
+  evolves_from: Optional[list[str]]
+  is_promo: bool
+
+
+@dataclass
+class Set:
+  __slots__ = ("name", "code", "release_date", "url", "cards")
+  name: str
+  code: str
+  release_date: str
+  url: str
+  cards: list[Card]
+
+
+# Build the function decoding a json value into the given type, checking the
+# value against the type annotations along the way
+@functools.lru_cache(maxsize=None)
+def decoder_for(value_type):
+  origin = typing.get_origin(value_type)
+
+  if origin is list:
+    decode_item = decoder_for(typing.get_args(value_type)[0])
+
+    def decode_list(value, path: str):
+      if not isinstance(value, list):
+        raise ValueError(f"{path}: expected a list, got {type(value).__name__}")
+      return [decode_item(item, f"{path}[{i}]") for i, item in enumerate(value)]
+
+    return decode_list
+
+  if origin is Union:
+    args = typing.get_args(value_type)
+    nullable = type(None) in args
+    decoders = [decoder_for(arg) for arg in args if arg is not type(None)]
+
+    def decode_union(value, path: str):
+      if value is None and nullable:
+        return None
+      for decode in decoders:
+        try:
+          return decode(value, path)
+        except ValueError:
+          pass
+      raise ValueError(f"{path}: unexpected value {value!r}")
+
+    return decode_union
+
+  if is_dataclass(value_type):
+    hints = typing.get_type_hints(value_type)
+    field_decoders = [
+      (field.name, decoder_for(hints[field.name])) for field in fields(value_type)
+    ]
+
+    def decode_fields(value, path: str):
+      if not isinstance(value, dict):
+        raise ValueError(f"{path}: expected an object, got {type(value).__name__}")
+      try:
+        return value_type(
+          *[decode(value[name], f"{path}.{name}") for name, decode in field_decoders]
+        )
+      except KeyError as e:
+        raise ValueError(f"{path}: missing field {e}")
+
+    return decode_fields
+
+  def decode_value(value, path: str):
+    # bool is a subclass of int, but a boolean is never a valid count or score
+    if not isinstance(value, value_type) or (
+      isinstance(value, bool) and value_type is not bool
+    ):
+      raise ValueError(
+        f"{path}: expected {value_type.__name__}, got {type(value).__name__}"
+      )
+    return value
+
+  return decode_value
+
+
+# Decode the content of an output file into a record, raise a ValueError naming
+# the offending field when the content does not match the record
+def decode_record(record_type, value):
+  return decoder_for(record_type)(value, record_type.__name__)
@@ -0,0 +1,51 @@
+import json
+from dataclasses import fields, is_dataclass
+
+from pkmn_tcgp_metagame.assets import constants
+
+try:
+  import orjson
+except ImportError:
+  orjson = None
+
+
+def use_orjson():
+  return orjson is not None and constants.OUTPUT_SERIALIZER == "orjson"
+
+
+# Shallow conversion of a dataclass for the json encoder, the nested values are
+# converted when the encoder reaches them instead of copying the whole tree
+def encode_dataclass(obj):
+  if is_dataclass(obj):
+    return {field.name: getattr(obj, field.name) for field in fields(obj)}
+  raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+# Serialize a record, or any tree of dataclasses, lists and dicts, to compact
+# utf-8 json
+def dumps_output(obj) -> bytes:
+  if use_orjson():
+    return orjson.dumps(obj)
+  # dumps rather than dump, only the one shot encoding uses the C encoder
+  return json.dumps(
+    obj, default=encode_dataclass, ensure_ascii=False, separators=(",", ":")
+  ).encode("utf-8")
+
+
+def loads_output(data: bytes):
+  if use_orjson():
+    return orjson.loads(data)
+  return json.loads(data)
+
+
+def write_output_file(path: str, obj):
+  data = dumps_output(obj)
+  with open(path, "wb") as f:
+    f.write(data)
+
+
+# Read an output file written by write_output_file, or by an older version that
+# indented its output
+def read_output_file(path: str):
+  with open(path, "rb") as f:
+    return loads_output(f.read())
@@ -1,14 +1,15 @@
 from dagster import Definitions, EnvVar, load_assets_from_modules
 from dagster_dbt import DbtCliResource
 
-from pkmn_tcgp_metagame.assets import extract, load, metabase, transform
+from pkmn_tcgp_metagame.assets import extract, load, maintenance, metabase, transform
 from pkmn_tcgp_metagame.metabase.metabase_resource import MetabaseResource
 from pkmn_tcgp_metagame.postgres.postgres_io_manager import PostgresIOManager
 from pkmn_tcgp_metagame.postgres.postgres_resource import PostgresResource
 from pkmn_tcgp_metagame.project import dbt_project
+from pkmn_tcgp_metagame.scraper.scraper_resource import ScraperResource
 
 defs = Definitions(
-  assets=load_assets_from_modules([extract, load, transform, metabase]),
+  assets=load_assets_from_modules([extract, load, transform, metabase, maintenance]),
   resources={
     "dbt": DbtCliResource(
       project_dir=dbt_project,
@@ -20,6 +21,7 @@ defs = Definitions(
       user=EnvVar("POSTGRES_USER").get_value(),
       password=EnvVar("POSTGRES_PASSWORD").get_value(),
     ),
+    "scraper": ScraperResource(),
     "metabase": MetabaseResource(
       host=f"http://{EnvVar('METABASE_HOST').get_value()}:{EnvVar('METABASE_PORT').get_value()}",
       user=EnvVar("METABASE_ADMIN_USER").get_value(),
@@ -1,5 +1,13 @@
+import itertools
+import queue
+import threading
+import time
+from typing import Iterable, Optional
+
 from dagster import DagsterLogManager
 
+from pkmn_tcgp_metagame.assets import constants
+
 
 def execute_sql_script(log: DagsterLogManager, database, query: str, params=None):
   log.info(query)
@@ -17,3 +25,171 @@ def execute_many(log: DagsterLogManager, database, sql: str, data):
   with database.get_connection() as conn:
     with conn.cursor() as cur:
       cur.executemany(sql.replace("()", parameters), data)
+
+
+# Marks the end of the rows of a CopyWriter, or the failure of their producer
+_END_OF_ROWS = None
+_ABORTED = object()
+
+
+class CopyWriter:
+  """Copy rows into a table from a writer thread, batch by batch, while the
+  caller builds the next batches."""
+
+  def __init__(
+    self,
+    log: DagsterLogManager,
+    cur,
+    table: str,
+    types: Optional[list[str]] = None,
+    batch_size: Optional[int] = None,
+    batches_in_flight: Optional[int] = None,
+  ):
+    self.log = log
+    self.cur = cur
+    self.table = table
+    self.types = types
+    self.sql = f"copy {table} from stdin"
+    if types is not None:
+      self.sql += " (format binary)"
+
+    self.batch_size = batch_size or constants.LOAD_BATCH_SIZE
+    self.batch: list[tuple] = []
+    # Bounds the rows held in memory when the database is slower than the caller
+    self.queue = queue.Queue(batches_in_flight or constants.LOAD_BATCHES_IN_FLIGHT)
+    self.thread = threading.Thread(target=self.write_batches, daemon=True)
+    self.error: Optional[BaseException] = None
+    self.nb_rows = 0
+    self.start = 0.0
+    self.seconds = 0.0
+
+  def __enter__(self):
+    self.log.info(self.sql)
+    self.start = time.perf_counter()
+    self.thread.start()
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    if exc_type is not None:
+      self.queue.put(_ABORTED)
+      self.thread.join()
+      return
+
+    if self.batch:
+      self.nb_rows += len(self.batch)
+      self.queue.put(self.batch)
+      self.batch = []
+    self.queue.put(_END_OF_ROWS)
+    self.thread.join()
+    self.seconds = time.perf_counter() - self.start
+    if self.error is not None:
+      raise self.error
+    self.log.info(
+      f"Copied {self.nb_rows} rows into {self.table} in {self.seconds:.2f}s"
+    )
+
+  def write_batches(self):
+    batch = []
+    try:
+      with self.cur.copy(self.sql) as copy:
+        if self.types is not None:
+          copy.set_types(self.types)
+        while (batch := self.queue.get()) is not _END_OF_ROWS:
+          if batch is _ABORTED:
+            raise RuntimeError(f"Copy into {self.table} aborted")
+          for row in batch:
+            copy.write_row(row)
+    except BaseException as e:
+      self.error = e
+      # Keep reading, so that the caller never blocks on a full queue
+      while batch not in (_END_OF_ROWS, _ABORTED):
+        batch = self.queue.get()
+
+  def write_rows(self, rows: Iterable[tuple]):
+    rows = iter(rows)
+    while chunk := list(itertools.islice(rows, self.batch_size - len(self.batch))):
+      self.batch.extend(chunk)
+      if len(self.batch) >= self.batch_size:
+        self.flush()
+
+  def flush(self):
+    if self.error is not None:
+      raise self.error
+    self.nb_rows += len(self.batch)
+    self.queue.put(self.batch)
+    self.batch = []
+
+  def rows_per_second(self):
+    return self.nb_rows / self.seconds if self.seconds > 0 else 0.0
+
+
+# Create an empty unlogged copy of a table to load into, so that the table stays
+# readable during the load and the rows are written without the write ahead log.
+# Return the name of the staging table.
+def create_staging_table(cur, table: str, columns: str) -> str:
+  staging = f"{table}_staging"
+  cur.execute(f"drop table if exists {staging}")
+  cur.execute(f"create unlogged table {staging} ({columns})")
+  return staging
+
+
+# Replace a table by its loaded staging table, in the transaction of the cursor.
+# Readers of the table see its previous rows until the transaction commits. The
+# staging table is set logged first when logged is set, otherwise it stays
+# unlogged and is emptied if the server crashes.
+def swap_staging_table(cur, table: str, staging: str, logged: bool):
+  if logged:
+    cur.execute(f"alter table {staging} set logged")
+  cur.execute(f"drop table if exists {table}")
+  cur.execute(f"alter table {staging} rename to {table.split('.')[-1]}")
+
+
+# Return whether a table is unlogged, None when it does not exist
+def table_is_unlogged(cur, table: str) -> Optional[bool]:
+  cur.execute(
+    "select relpersistence = 'u' from pg_class where oid = to_regclass(%s)", (table,)
+  )
+  row = cur.fetchone()
+  return None if row is None else row[0]
+
+
+def table_is_empty(cur, table: str) -> bool:
+  cur.execute(f"select not exists (select 1 from {table})")
+  return cur.fetchone()[0]
+
+
+class StagingTableLoad:
+  """Load of a whole table into a staging table, swapped in place of the table
+  when the load exits without error, in the transaction of the cursor."""
+
+  def __init__(
+    self,
+    log: DagsterLogManager,
+    cur,
+    table: str,
+    columns: str,
+    types: Optional[list[str]] = None,
+    logged: bool = True,
+  ):
+    self.log = log
+    self.cur = cur
+    self.table = table
+    self.columns = columns
+    self.types = types
+    self.logged = logged
+    self.staging = ""
+    self.writer: Optional[CopyWriter] = None
+
+  def __enter__(self):
+    self.staging = create_staging_table(self.cur, self.table, self.columns)
+    self.writer = CopyWriter(self.log, self.cur, self.staging, self.types)
+    self.writer.__enter__()
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.writer.__exit__(exc_type, exc_value, traceback)
+    if exc_type is None:
+      swap_staging_table(self.cur, self.table, self.staging, self.logged)
+
+  def write_rows(self, rows: Iterable[tuple]):
+    self.writer.write_rows(rows)
@@ -0,0 +1,62 @@
+import re
+import time
+from typing import Optional
+
+from yarl import URL
+
+from pkmn_tcgp_metagame.scraper.html_cache import CacheEntry
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+
+class CachePolicy:
+  """How long a cached page matching a url pattern can be used as is.
+
+  A ttl of None means the page never changes, 0 that it is revalidated with the
+  server before every use. Past a positive ttl the cached page is still served,
+  and refreshed in the background for the next runs.
+  """
+
+  def __init__(self, pattern: str, ttl: Optional[float]):
+    self.pattern = re.compile(pattern)
+    self.ttl = ttl
+
+  def is_fresh(self, entry: CacheEntry):
+    return self.ttl is None or time.time() - entry.stored_at < self.ttl
+
+  @property
+  def serves_stale(self):
+    return self.ttl is not None and self.ttl > 0
+
+
+# Policies by url path, the first matching pattern applies
+cache_policies = [
+  # Lists that gain entries over time
+  CachePolicy(r"^/tournaments/completed", 0),
+  CachePolicy(r"^/api/tournaments\?", 0),
+  CachePolicy(r"^/cards$", 0),
+  CachePolicy(r"^/cards/[^/?]+$", 0),
+  CachePolicy(r"^/jeux/mobile/pocket/cartodex/extensions\.html$", 0),
+  # Pages of finished tournaments and card pages
+  CachePolicy(r"^/tournament/[^/]+/player/[^/]+/decklist$", None),
+  CachePolicy(r"^/tournament/[^/]+/pairings", None),
+  CachePolicy(r"^/api/tournaments/[^/]+/pairings$", None),
+  CachePolicy(r"^/cards/[^/?]+/[^/?]+$", None),
+  # Standings can still be corrected shortly after a tournament ends
+  CachePolicy(r"^/tournament/[^/]+/standings", 6 * HOUR),
+  CachePolicy(r"^/api/tournaments/[^/]+/standings$", 6 * HOUR),
+  # Searches and translations change when new cards are released
+  CachePolicy(r"^/cards\?q=", 7 * DAY),
+  CachePolicy(r"^/jeux/mobile/pocket/cartodex/extensions/", 7 * DAY),
+]
+
+default_cache_policy = CachePolicy(r"", None)
+
+
+def cache_policy(url: str) -> CachePolicy:
+  path = URL(url).path_qs
+  for policy in cache_policies:
+    if policy.pattern.search(path):
+      return policy
+  return default_cache_policy
@@ -0,0 +1,163 @@
+import os
+import sqlite3
+import time
+from typing import Any, Optional
+
+import dagster
+
+from pkmn_tcgp_metagame.assets.records import decode_record
+from pkmn_tcgp_metagame.assets.serialization import dumps_output, loads_output
+
+
+class CrawlState:
+  """Journal of the extraction stages completed for each tournament.
+
+  A tournament is listed when it is queued for extraction, then goes through
+  the standings, decklists and pairings stages, each one stored with the records
+  it produced, and is written once its file is written. The records of a
+  tournament are dropped once it is written. The source the tournaments were
+  last crawled from is kept along with the stages.
+  """
+
+  resumable_stages = ["standings", "decklists", "pairings"]
+
+  def __init__(self, path: str):
+    self.path = path
+    self.resumed = {stage: 0 for stage in self.resumable_stages}
+    self.resumed_tournaments = 0
+    try:
+      directory = os.path.dirname(path)
+      if directory:
+        os.makedirs(directory, exist_ok=True)
+
+      self.conn = sqlite3.connect(path, isolation_level=None)
+      self.conn.execute("pragma journal_mode=wal")
+      self.conn.execute("pragma synchronous=normal")
+      self.conn.execute(
+        """
+        create table if not exists tournament_stages (
+          tournament_id text not null,
+          stage text not null,
+          payload blob null,
+          completed_at real not null,
+          primary key (tournament_id, stage)
+        ) without rowid
+      """
+      )
+      self.conn.execute(
+        """
+        create table if not exists crawl_sources (
+          source text primary key,
+          crawled_at real not null
+        ) without rowid
+      """
+      )
+    except sqlite3.Error as e:
+      raise OSError(f"Failed to open crawl state database {path}: {e}")
+
+  # Remember that the tournaments are being crawled from source
+  def record_source(self, source: str):
+    try:
+      self.conn.execute(
+        "insert or replace into crawl_sources (source, crawled_at) values (?, ?)",
+        (source, time.time()),
+      )
+    except sqlite3.Error as e:
+      raise OSError(f"Failed to write crawl source to {self.path}: {e}")
+
+  # Return the source the tournaments were last crawled from, None before the
+  # first crawl
+  def last_source(self) -> Optional[str]:
+    try:
+      row = self.conn.execute(
+        "select source from crawl_sources order by crawled_at desc limit 1"
+      ).fetchone()
+    except sqlite3.Error as e:
+      raise OSError(f"Failed to read crawl source from {self.path}: {e}")
+    return None if row is None else row[0]
+
+  # Return the records of a completed stage decoded as record_type, or None when
+  # the stage still has to be done
+  def get(self, tournament_id: str, stage: str, record_type) -> Any:
+    try:
+      row = self.conn.execute(
+        "select payload from tournament_stages where tournament_id = ? and stage = ?",
+        (tournament_id, stage),
+      ).fetchone()
+    except sqlite3.Error as e:
+      raise OSError(f"Failed to read crawl state of tournament {tournament_id}: {e}")
+
+    if row is None or row[0] is None:
+      return None
+
+    # Records journaled by an older version that do not decode anymore are
+    # extracted again
+    try:
+      records = decode_record(record_type, loads_output(row[0]))
+    except ValueError:
+      return None
+
+    self.resumed[stage] += 1
+    return records
+
+  # Return the listings of the tournaments that were queued but not written,
+  # decoded as record_type
+  def pending(self, record_type) -> list:
+    try:
+      rows = self.conn.execute(
+        "select payload from tournament_stages where stage = 'listed'"
+      ).fetchall()
+    except sqlite3.Error as e:
+      raise OSError(f"Failed to read crawl state from {self.path}: {e}")
+
+    listings = []
+    for (payload,) in rows:
+      try:
+        listings.append(decode_record(record_type, loads_output(payload)))
+      except ValueError:
+        continue
+    return listings
+
+  def complete(self, tournament_id: str, stage: str, records):
+    try:
+      self.conn.execute(
+        """
+        insert or replace into tournament_stages (
+          tournament_id, stage, payload, completed_at
+        ) values (?, ?, ?, ?)
+        """,
+        (tournament_id, stage, dumps_output(records), time.time()),
+      )
+    except sqlite3.Error as e:
+      raise OSError(f"Failed to write crawl state of tournament {tournament_id}: {e}")
+
+  def written(self, tournament_id: str):
+    try:
+      with self.conn:
+        self.conn.execute("begin")
+        self.conn.execute(
+          "delete from tournament_stages where tournament_id = ?", (tournament_id,)
+        )
+        self.conn.execute(
+          """
+          insert into tournament_stages (tournament_id, stage, payload, completed_at)
+          values (?, 'written', null, ?)
+          """,
+          (tournament_id, time.time()),
+        )
+    except sqlite3.Error as e:
+      raise OSError(f"Failed to write crawl state of tournament {tournament_id}: {e}")
+
+  def to_metadata(self):
+    return {
+      "Number of resumed tournaments": dagster.MetadataValue.int(
+        self.resumed_tournaments
+      ),
+      **{
+        f"Number of resumed {stage} stages": dagster.MetadataValue.int(nb)
+        for stage, nb in self.resumed.items()
+      },
+    }
+
+  def close(self):
+    self.conn.close()
@@ -0,0 +1,661 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+import aiofile
+from yarl import URL
+
+from pkmn_tcgp_metagame.assets import constants
+
+try:
+  import zstandard
+except ImportError:
+  zstandard = None
+
+
+@dataclass
+class CacheEntry:
+  html: str
+  stored_at: float
+  etag: Optional[str] = None
+  last_modified: Optional[str] = None
+  content_hash: Optional[str] = None
+  processed_hash: Optional[str] = None
+  url: Optional[str] = None
+
+
+# Size and times of a stored page, used to pick the pages to evict
+@dataclass
+class CacheEntryInfo:
+  key: str
+  # None for the entries stored under a legacy key that could not be converted
+  url: Optional[str]
+  size: int
+  stored_at: float
+  accessed_at: float
+
+
+# Whether the last access time of an entry read now needs to be updated. Access
+# times are kept with a coarse resolution so that reads rarely cause a write.
+def access_is_stale(accessed_at: Optional[float]):
+  return (
+    accessed_at is None
+    or time.time() - accessed_at > constants.HTML_CACHE_ACCESS_RESOLUTION
+  )
+
+
+# Absolute url with the host lowercased, the default port and the fragment
+# dropped and the path and query in their encoded form
+def normalize_cache_url(url: str):
+  normalized = URL(url)
+  if not normalized.is_absolute():
+    raise ValueError(f"Cache url '{url}' is not absolute")
+  return str(normalized.with_fragment(None))
+
+
+# Build the cache key of an absolute url, the hash of its normalized form so that
+# every url, host included, gets its own key
+def html_cache_key(url: str):
+  return hashlib.sha1(normalize_cache_url(url).encode("utf-8")).hexdigest()
+
+
+regex_html_cache_key = re.compile(r"^[0-9a-f]{40}$")
+
+# Urls of the classes of legacy cache keys, which were the url paths with every
+# character but "/" and the alphanumerics removed. The keys of the other urls
+# can not be converted back since the removed characters are unknown.
+completed_tournaments_url = (
+  f"{constants.BASE_URL_TOURNAMENTS}/tournaments/completed"
+  "?game=POCKET&format=STANDARD&platform=all&type=online&time=all"
+)
+legacy_cache_urls = [
+  (
+    r"^/tournaments/completedgamePOCKETformatSTANDARDplatformalltypeonlinetimeall$",
+    completed_tournaments_url,
+  ),
+  (
+    r"^/tournaments/completedgamePOCKETformatSTANDARDplatformalltypeonlinetimeall"
+    r"page(\d+)$",
+    f"{completed_tournaments_url}&page=\\1",
+  ),
+  (
+    r"^/tournament/(\w+)/(standings|pairings)players$",
+    f"{constants.BASE_URL_TOURNAMENTS}/tournament/\\1/\\2?players",
+  ),
+  (
+    r"^/tournament/(\w+)/pairingsround(\d+)$",
+    f"{constants.BASE_URL_TOURNAMENTS}/tournament/\\1/pairings?round=\\2",
+  ),
+  (
+    r"^/tournament/\w+/player/\w+/decklist$",
+    f"{constants.BASE_URL_TOURNAMENTS}\\g<0>",
+  ),
+  (
+    r"^/api/tournamentsgamePOCKETformatSTANDARDlimit(\d+)page(\d+)$",
+    f"{constants.BASE_URL_TOURNAMENTS}/api/tournaments?game=POCKET&format=STANDARD"
+    "&limit=\\1&page=\\2",
+  ),
+  (
+    r"^/api/tournaments/\w+/(?:standings|pairings)$",
+    f"{constants.BASE_URL_TOURNAMENTS}\\g<0>",
+  ),
+  (r"^/cards(?:/\w+){0,2}$", f"{constants.BASE_URL_CARDS}\\g<0>"),
+  (r"^/cardsqname(\w+)$", f"{constants.BASE_URL_CARDS}/cards?q=name:\\1"),
+  (
+    r"^/jeux/mobile/pocket/cartodex/extensions(/\w+)?html$",
+    f"{constants.BASE_URL_TRANSLATIONS}/jeux/mobile/pocket/cartodex/extensions\\1.html",
+  ),
+]
+legacy_cache_urls = [(re.compile(regex), url) for regex, url in legacy_cache_urls]
+
+
+def is_legacy_cache_key(key: str):
+  return key.startswith("/")
+
+
+# Legacy key of an absolute url, its path and query with every character but "/"
+# and the alphanumerics removed
+def legacy_cache_key(url: str):
+  return "".join(x for x in URL(url).path_qs if (x == "/" or x.isalnum()))
+
+
+# Return the normalized url a legacy cache key was built from, or None when it
+# can not be told from the key
+def legacy_cache_url(key: str) -> Optional[str]:
+  for regex, url in legacy_cache_urls:
+    match = regex.match(key)
+    if match is not None:
+      return normalize_cache_url(match.expand(url))
+  return None
+
+
+def html_content_hash(html: str):
+  return hashlib.sha1(html.encode("utf-8")).hexdigest()
+
+
+# Compress a page body, zstd is used when available and zlib otherwise
+def compress_html(html: str):
+  data = html.encode("utf-8")
+  if zstandard is not None:
+    compressor = zstandard.ZstdCompressor(level=constants.HTML_CACHE_ZSTD_LEVEL)
+    return "zstd", compressor.compress(data)
+  return "zlib", zlib.compress(data, 6)
+
+
+def decompress_html(codec: str, body: bytes):
+  if codec == "zstd":
+    if zstandard is None:
+      raise OSError("zstandard is required to read zstd compressed cache entries")
+    return zstandard.ZstdDecompressor().decompress(body).decode("utf-8")
+  elif codec == "zlib":
+    return zlib.decompress(body).decode("utf-8")
+  elif codec == "none":
+    return body.decode("utf-8")
+  else:
+    raise OSError(f"Unknown cache codec '{codec}'")
+
+
+class HtmlCache:
+  """Base class for the stores used to keep fetched pages between runs."""
+
+  # Return the entry of a page, url is used by the stores that can find pages
+  # stored under a legacy key
+  async def get(self, key: str, url: Optional[str] = None) -> Optional[CacheEntry]:
+    raise NotImplementedError()
+
+  # Store the body of the page at url along with the validators sent by the server
+  async def put(
+    self,
+    key: str,
+    url: str,
+    html: str,
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+  ):
+    raise NotImplementedError()
+
+  # Refresh the validators of an entry after a 304, the body is kept as is
+  async def touch(
+    self, key: str, etag: Optional[str] = None, last_modified: Optional[str] = None
+  ):
+    raise NotImplementedError()
+
+  # Remember the hash of the last body that was fully processed by a caller
+  async def mark_processed(self, key: str, content_hash: str):
+    raise NotImplementedError()
+
+  # Iterate over the keys of every page in the store
+  def keys(self) -> Iterator[str]:
+    raise NotImplementedError()
+
+  # Iterate over the size and times of every page in the store
+  def entries(self) -> Iterator[CacheEntryInfo]:
+    raise NotImplementedError()
+
+  def delete_many(self, keys: list[str]):
+    raise NotImplementedError()
+
+  # Size of the store on disk, in bytes
+  def disk_size(self) -> int:
+    raise NotImplementedError()
+
+  # Give the space of the deleted pages back to the file system
+  def compact(self):
+    pass
+
+  def close(self):
+    pass
+
+
+class DirectoryHtmlCache(HtmlCache):
+  """One uncompressed html file per page under a directory tree.
+
+  Pages are spread over subdirectories named after the first characters of their
+  key. The url and validators are kept in a json file next to each html file.
+  """
+
+  def __init__(self, directory: str):
+    self.directory = directory
+
+  # Path of a page without extension, legacy keys are the path of their page
+  def base_path(self, key: str):
+    if is_legacy_cache_key(key):
+      return f"{self.directory}{key}"
+    return f"{self.directory}/{key[:2]}/{key}"
+
+  def path(self, key: str):
+    return f"{self.base_path(key)}.html"
+
+  def meta_path(self, key: str):
+    return f"{self.base_path(key)}.json"
+
+  def read_meta(self, key: str):
+    try:
+      with open(self.meta_path(key)) as f:
+        return json.load(f)
+    except (OSError, ValueError):
+      return {}
+
+  def write_meta(self, key: str, meta: dict):
+    with open(self.meta_path(key), "w") as f:
+      json.dump(meta, f)
+
+  # Move the page of url stored under its legacy key to key, return whether
+  # there was one
+  def move_legacy_page(self, key: str, url: str):
+    legacy_key = legacy_cache_key(url)
+    if not os.path.isfile(self.path(legacy_key)):
+      return False
+
+    os.makedirs(os.path.dirname(self.path(key)), exist_ok=True)
+    meta = self.read_meta(legacy_key)
+    meta.setdefault("stored_at", os.path.getmtime(self.path(legacy_key)))
+    meta["url"] = url
+    os.replace(self.path(legacy_key), self.path(key))
+    self.write_meta(key, meta)
+    try:
+      os.remove(self.meta_path(legacy_key))
+    except FileNotFoundError:
+      pass
+    return True
+
+  async def get(self, key: str, url: Optional[str] = None) -> Optional[CacheEntry]:
+    path = self.path(key)
+    # Pages of the tree written before keys were hashed are moved to their key
+    # the first time they are read
+    if not os.path.isfile(path) and (
+      url is None or not self.move_legacy_page(key, url)
+    ):
+      return None
+    if os.path.getsize(path) == 0:
+      return None
+
+    async with aiofile.async_open(path, "r") as file:
+      html = await file.read()
+
+    meta = self.read_meta(key)
+    if access_is_stale(meta.get("accessed_at")):
+      meta["accessed_at"] = time.time()
+      self.write_meta(key, meta)
+
+    return CacheEntry(
+      html,
+      meta.get("stored_at", os.path.getmtime(path)),
+      meta.get("etag"),
+      meta.get("last_modified"),
+      meta.get("content_hash"),
+      meta.get("processed_hash"),
+      meta.get("url"),
+    )
+
+  async def put(
+    self,
+    key: str,
+    url: str,
+    html: str,
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+  ):
+    path = self.path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    async with aiofile.async_open(path, "w") as file:
+      await file.write(html)
+
+    meta = self.read_meta(key)
+    now = time.time()
+    meta.update(
+      {
+        "url": url,
+        "stored_at": now,
+        "accessed_at": now,
+        "etag": etag,
+        "last_modified": last_modified,
+        "content_hash": html_content_hash(html),
+      }
+    )
+    self.write_meta(key, meta)
+
+  async def touch(
+    self, key: str, etag: Optional[str] = None, last_modified: Optional[str] = None
+  ):
+    meta = self.read_meta(key)
+    meta["stored_at"] = time.time()
+    if etag is not None:
+      meta["etag"] = etag
+    if last_modified is not None:
+      meta["last_modified"] = last_modified
+    self.write_meta(key, meta)
+
+  async def mark_processed(self, key: str, content_hash: str):
+    meta = self.read_meta(key)
+    meta["processed_hash"] = content_hash
+    self.write_meta(key, meta)
+
+  def keys(self) -> Iterator[str]:
+    for key, _ in self.walk():
+      yield key
+
+  # Iterate over (key, path) for every page stored in the tree, including the
+  # pages stored under a legacy key
+  def walk(self) -> Iterator[tuple[str, str]]:
+    for root, _, files in os.walk(self.directory):
+      for name in files:
+        if not name.endswith(".html"):
+          continue
+        path = os.path.join(root, name)
+        key = name[: -len(".html")]
+        if not regex_html_cache_key.match(key) or path != self.path(key):
+          key = path[len(self.directory) : -len(".html")].replace(os.sep, "/")
+        yield key, path
+
+  def entries(self) -> Iterator[CacheEntryInfo]:
+    for key, path in self.walk():
+      try:
+        size = os.path.getsize(path)
+        if os.path.isfile(self.meta_path(key)):
+          size += os.path.getsize(self.meta_path(key))
+        meta = self.read_meta(key)
+        stored_at = meta.get("stored_at", os.path.getmtime(path))
+      except OSError:
+        continue
+      yield CacheEntryInfo(
+        key, meta.get("url"), size, stored_at, meta.get("accessed_at", stored_at)
+      )
+
+  def delete_many(self, keys: list[str]):
+    for key in keys:
+      for path in (self.path(key), self.meta_path(key)):
+        try:
+          os.remove(path)
+        except FileNotFoundError:
+          pass
+
+  def disk_size(self) -> int:
+    size = 0
+    for root, _, files in os.walk(self.directory):
+      for name in files:
+        size += os.path.getsize(os.path.join(root, name))
+    return size
+
+  # Remove the directories left empty by deleted pages
+  def compact(self):
+    for root, directories, files in os.walk(self.directory, topdown=False):
+      if root != self.directory and not directories and not files:
+        os.rmdir(root)
+
+
+class SqliteHtmlCache(HtmlCache):
+  """Single file store with compressed bodies indexed by cache key."""
+
+  # Columns added after the first version of the store, created on open when an
+  # older database is found
+  added_columns = [
+    ("etag", "text"),
+    ("last_modified", "text"),
+    ("content_hash", "text"),
+    ("processed_hash", "text"),
+    ("accessed_at", "real"),
+    ("url", "text"),
+  ]
+
+  def __init__(self, path: str):
+    self.path = path
+    try:
+      directory = os.path.dirname(path)
+      if directory:
+        os.makedirs(directory, exist_ok=True)
+
+      self.conn = sqlite3.connect(path, isolation_level=None)
+      self.conn.execute("pragma journal_mode=wal")
+      self.conn.execute("pragma synchronous=normal")
+      self.conn.execute(
+        """
+        create table if not exists pages (
+          key text primary key,
+          codec text not null,
+          body blob not null,
+          size integer not null,
+          stored_at real not null
+        ) without rowid
+      """
+      )
+
+      columns = {row[1] for row in self.conn.execute("pragma table_info(pages)")}
+      for column, column_type in self.added_columns:
+        if column not in columns:
+          self.conn.execute(f"alter table pages add column {column} {column_type}")
+    except sqlite3.Error as e:
+      raise OSError(f"Failed to open cache database {path}: {e}")
+
+  async def get(self, key: str, url: Optional[str] = None) -> Optional[CacheEntry]:
+    try:
+      row = self.conn.execute(
+        """
+        select codec, body, accessed_at, stored_at, etag, last_modified,
+          content_hash, processed_hash, url
+        from pages where key = ?
+        """,
+        (key,),
+      ).fetchone()
+      if row is not None and access_is_stale(row[2]):
+        self.conn.execute(
+          "update pages set accessed_at = ? where key = ?", (time.time(), key)
+        )
+    except sqlite3.Error as e:
+      raise OSError(f"Failed to read cache entry {key}: {e}")
+
+    if row is None:
+      return None
+
+    codec, body, _, *fields = row
+    try:
+      return CacheEntry(decompress_html(codec, body), *fields)
+    except Exception as e:
+      raise OSError(f"Failed to decode cache entry {key}: {e}")
+
+  async def put(
+    self,
+    key: str,
+    url: str,
+    html: str,
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+  ):
+    entry = CacheEntry(html, time.time(), etag, last_modified, url=url)
+    self.put_many([(key, entry)])
+
+  # Insert several pages in one transaction, existing keys are replaced unless
+  # replace is False. The processed hash of a replaced entry is kept.
+  def put_many(self, entries: list[tuple[str, CacheEntry]], replace: bool = True):
+    rows = []
+    for key, entry in entries:
+      codec, body = compress_html(entry.html)
+      rows.append(
+        (
+          key,
+          codec,
+          body,
+          len(body),
+          entry.stored_at,
+          entry.etag,
+          entry.last_modified,
+          entry.content_hash or html_content_hash(entry.html),
+          entry.processed_hash,
+          entry.stored_at,
+          entry.url,
+        )
+      )
+
+    on_conflict = (
+      """
+      do update set codec = excluded.codec, body = excluded.body,
+        size = excluded.size, stored_at = excluded.stored_at, etag = excluded.etag,
+        last_modified = excluded.last_modified, content_hash = excluded.content_hash,
+        accessed_at = excluded.accessed_at, url = excluded.url
+      """
+      if replace
+      else "do nothing"
+    )
+
+    try:
+      with self.conn:
+        self.conn.execute("begin")
+        self.conn.executemany(
+          f"""
+          insert into pages (
+            key, codec, body, size, stored_at, etag, last_modified, content_hash,
+            processed_hash, accessed_at, url
+          ) values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+          on conflict (key) {on_conflict}
+          """,
+          rows,
+        )
+    except sqlite3.Error as e:
+      raise OSError(f"Failed to write cache entries to {self.path}: {e}")
+
+  async def touch(
+    self, key: str, etag: Optional[str] = None, last_modified: Optional[str] = None
+  ):
+    try:
+      self.conn.execute(
+        """
+        update pages set stored_at = ?, etag = coalesce(?, etag),
+          last_modified = coalesce(?, last_modified)
+        where key = ?
+        """,
+        (time.time(), etag, last_modified, key),
+      )
+    except sqlite3.Error as e:
+      raise OSError(f"Failed to update cache entry {key}: {e}")
+
+  async def mark_processed(self, key: str, content_hash: str):
+    try:
+      self.conn.execute(
+        "update pages set processed_hash = ? where key = ?", (content_hash, key)
+      )
+    except sqlite3.Error as e:
+      raise OSError(f"Failed to update cache entry {key}: {e}")
+
+  def keys(self) -> Iterator[str]:
+    try:
+      for (key,) in self.conn.execute("select key from pages").fetchall():
+        yield key
+    except sqlite3.Error as e:
+      raise OSError(f"Failed to list cache entries of {self.path}: {e}")
+
+  def entries(self) -> Iterator[CacheEntryInfo]:
+    try:
+      rows = self.conn.execute(
+        """
+        select key, url, size, stored_at, coalesce(accessed_at, stored_at)
+        from pages
+        """
+      ).fetchall()
+    except sqlite3.Error as e:
+      raise OSError(f"Failed to list cache entries of {self.path}: {e}")
+    for row in rows:
+      yield CacheEntryInfo(*row)
+
+  def delete_many(self, keys: list[str]):
+    try:
+      with self.conn:
+        self.conn.execute("begin")
+        self.conn.executemany("delete from pages where key = ?", [(k,) for k in keys])
+    except sqlite3.Error as e:
+      raise OSError(f"Failed to delete cache entries from {self.path}: {e}")
+
+  def disk_size(self) -> int:
+    return sum(
+      os.path.getsize(path)
+      for path in (self.path, f"{self.path}-wal")
+      if os.path.isfile(path)
+    )
+
+  def compact(self):
+    try:
+      self.conn.execute("vacuum")
+      self.conn.execute("pragma wal_checkpoint(truncate)")
+    except sqlite3.Error as e:
+      raise OSError(f"Failed to compact cache database {self.path}: {e}")
+
+  def close(self):
+    self.conn.close()
+
+
+def open_html_cache(backend: Optional[str] = None) -> HtmlCache:
+  backend = backend or constants.HTML_CACHE_BACKEND
+  if backend == "sqlite":
+    return SqliteHtmlCache(constants.HTML_CACHE_DATABASE)
+  elif backend == "directory":
+    return DirectoryHtmlCache(constants.BEAUTIFULSOUP_CACHE)
+  else:
+    raise ValueError(f"Unknown html cache backend '{backend}'")
+
+
+_html_cache: Optional[HtmlCache] = None
+
+
+# Return the cache shared by every fetch of the process, opened on first use
+def get_html_cache() -> HtmlCache:
+  global _html_cache
+  if _html_cache is None:
+    _html_cache = open_html_cache()
+  return _html_cache
+
+
+# Copy every page of the directory tree into the sqlite store, pages already in
+# the store are kept as is so the migration can be run again safely. Pages under
+# a legacy key are stored under the key of their url, and skipped when their url
+# can not be told from their key. Return the number of pages and bytes copied,
+# and the number of pages skipped.
+def migrate_directory_cache(
+  source: DirectoryHtmlCache, target: SqliteHtmlCache, batch_size: int = 500
+):
+  nb_pages = 0
+  nb_bytes = 0
+  nb_skipped = 0
+  batch = []
+
+  for key, path in source.walk():
+    with open(path) as f:
+      html = f.read()
+    if not html:
+      continue
+
+    meta = source.read_meta(key)
+    url = meta.get("url")
+    if is_legacy_cache_key(key):
+      url = url or legacy_cache_url(key)
+      if url is None:
+        nb_skipped += 1
+        continue
+      key = html_cache_key(url)
+
+    entry = CacheEntry(
+      html,
+      meta.get("stored_at", os.path.getmtime(path)),
+      meta.get("etag"),
+      meta.get("last_modified"),
+      meta.get("content_hash"),
+      meta.get("processed_hash"),
+      url,
+    )
+
+    batch.append((key, entry))
+    nb_pages += 1
+    nb_bytes += os.path.getsize(path)
+
+    if len(batch) >= batch_size:
+      target.put_many(batch, replace=False)
+      batch = []
+
+  if batch:
+    target.put_many(batch, replace=False)
+
+  return nb_pages, nb_bytes, nb_skipped
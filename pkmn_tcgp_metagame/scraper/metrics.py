@@ -0,0 +1,182 @@
+import bisect
+import os
+import time
+from collections import defaultdict
+
+import dagster
+
+from pkmn_tcgp_metagame.assets import constants
+
+REQUEST_LATENCY_BUCKETS = [0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+PARSE_TIME_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1]
+
+CACHE_RESULTS = ["hit", "stale", "revalidated", "miss"]
+
+
+class Histogram:
+  """Count of observations by bucket upper bound, with their sum and max."""
+
+  def __init__(self, buckets: list[float]):
+    self.buckets = buckets
+    # One more bucket for the observations above the last bound
+    self.counts = [0] * (len(buckets) + 1)
+    self.count = 0
+    self.sum = 0.0
+    self.max = 0.0
+
+  def observe(self, value: float):
+    self.counts[bisect.bisect_left(self.buckets, value)] += 1
+    self.count += 1
+    self.sum += value
+    self.max = max(self.max, value)
+
+  def add(self, other: "Histogram"):
+    for i, count in enumerate(other.counts):
+      self.counts[i] += count
+    self.count += other.count
+    self.sum += other.sum
+    self.max = max(self.max, other.max)
+
+  # Upper bound of the bucket holding the quantile, the max past the last bucket
+  def quantile(self, q: float):
+    rank = q * self.count
+    cumulative = 0
+    for bound, count in zip(self.buckets, self.counts):
+      cumulative += count
+      if cumulative >= rank:
+        return min(bound, self.max)
+    return self.max
+
+  def summary(self):
+    return {
+      "count": self.count,
+      "total": round(self.sum, 3),
+      "p50": round(self.quantile(0.5), 3),
+      "p95": round(self.quantile(0.95), 3),
+      "max": round(self.max, 3),
+    }
+
+  def prometheus_lines(self, name: str, labels: str):
+    lines = []
+    cumulative = 0
+    for bound, count in zip(self.buckets, self.counts):
+      cumulative += count
+      lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+    lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+    lines.append(f"{name}_count{{{labels}}} {self.count}")
+    return lines
+
+
+class CrawlerMetrics:
+  """Where the time of a crawl goes: network, cache and parsing."""
+
+  def __init__(self):
+    self.request_latency: dict[str, Histogram] = defaultdict(
+      lambda: Histogram(REQUEST_LATENCY_BUCKETS)
+    )
+    self.downloaded_bytes: dict[str, int] = defaultdict(int)
+    self.retries: dict[str, int] = defaultdict(int)
+    self.cache_lookups = {result: 0 for result in CACHE_RESULTS}
+    self.parse_time: dict[str, Histogram] = defaultdict(
+      lambda: Histogram(PARSE_TIME_BUCKETS)
+    )
+
+  def observe_request(self, host: str, seconds: float, nb_bytes: int):
+    self.request_latency[host].observe(seconds)
+    self.downloaded_bytes[host] += nb_bytes
+
+  def observe_retry(self, host: str):
+    self.retries[host] += 1
+
+  # Result of a cache lookup, one of CACHE_RESULTS
+  def observe_cache(self, result: str):
+    self.cache_lookups[result] += 1
+
+  def observe_parse(self, page_type: str, seconds: float):
+    self.parse_time[page_type].observe(seconds)
+
+  def add(self, other: "CrawlerMetrics"):
+    for host, histogram in other.request_latency.items():
+      self.request_latency[host].add(histogram)
+    for host, nb_bytes in other.downloaded_bytes.items():
+      self.downloaded_bytes[host] += nb_bytes
+    for host, nb_retries in other.retries.items():
+      self.retries[host] += nb_retries
+    for result, count in other.cache_lookups.items():
+      self.cache_lookups[result] += count
+    for page_type, histogram in other.parse_time.items():
+      self.parse_time[page_type].add(histogram)
+
+  def cache_hit_ratio(self):
+    nb_lookups = sum(self.cache_lookups.values())
+    if nb_lookups == 0:
+      return 0.0
+    return (self.cache_lookups["hit"] + self.cache_lookups["stale"]) / nb_lookups
+
+  def to_metadata(self):
+    return {
+      "Request latency per host (s)": dagster.MetadataValue.json(
+        {host: h.summary() for host, h in self.request_latency.items()}
+      ),
+      "Downloaded bytes": dagster.MetadataValue.int(
+        sum(self.downloaded_bytes.values())
+      ),
+      "Retries per host": dagster.MetadataValue.json(dict(self.retries)),
+      "Cache lookups": dagster.MetadataValue.json(self.cache_lookups),
+      "Cache hit ratio": dagster.MetadataValue.float(round(self.cache_hit_ratio(), 3)),
+      "Parse time per page type (s)": dagster.MetadataValue.json(
+        {page_type: h.summary() for page_type, h in self.parse_time.items()}
+      ),
+    }
+
+  def prometheus_lines(self, job: str):
+    lines = [
+      "# TYPE scraper_request_duration_seconds histogram",
+      *[
+        line
+        for host, histogram in self.request_latency.items()
+        for line in histogram.prometheus_lines(
+          "scraper_request_duration_seconds", f'job="{job}",host="{host}"'
+        )
+      ],
+      "# TYPE scraper_downloaded_bytes_total counter",
+      *[
+        f'scraper_downloaded_bytes_total{{job="{job}",host="{host}"}} {nb_bytes}'
+        for host, nb_bytes in self.downloaded_bytes.items()
+      ],
+      "# TYPE scraper_retries_total counter",
+      *[
+        f'scraper_retries_total{{job="{job}",host="{host}"}} {nb_retries}'
+        for host, nb_retries in self.retries.items()
+      ],
+      "# TYPE scraper_cache_lookups_total counter",
+      *[
+        f'scraper_cache_lookups_total{{job="{job}",result="{result}"}} {count}'
+        for result, count in self.cache_lookups.items()
+      ],
+      "# TYPE scraper_parse_duration_seconds histogram",
+      *[
+        line
+        for page_type, histogram in self.parse_time.items()
+        for line in histogram.prometheus_lines(
+          "scraper_parse_duration_seconds", f'job="{job}",page_type="{page_type}"'
+        )
+      ],
+    ]
+    return lines
+
+
+# Write metrics in the Prometheus text format, in the directory read by the
+# textfile collector of a node exporter. The file is replaced atomically so that
+# the collector never reads a partial file.
+def write_prometheus_textfile(job: str, lines: list[str]):
+  if not constants.METRICS_TEXTFILE_DIR:
+    return
+
+  path = f"{constants.METRICS_TEXTFILE_DIR}/pkmn_tcgp_metagame_{job}.prom"
+  os.makedirs(constants.METRICS_TEXTFILE_DIR, exist_ok=True)
+  lines = [*lines, f'scraper_last_run_timestamp_seconds{{job="{job}"}} {time.time()}']
+  with open(f"{path}.tmp", "w") as f:
+    f.write("\n".join(lines) + "\n")
+  os.replace(f"{path}.tmp", path)
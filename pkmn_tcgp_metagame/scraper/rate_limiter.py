@@ -0,0 +1,76 @@
+import asyncio
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+
+# Parse a Retry-After header, either a number of seconds or an http date
+def parse_retry_after(value: Optional[str]):
+  if not value:
+    return None
+
+  try:
+    return max(0.0, float(value))
+  except ValueError:
+    pass
+
+  try:
+    return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+  except (TypeError, ValueError):
+    return None
+
+
+class HostLimiter:
+  """Adaptive concurrency window for the requests sent to one host.
+
+  The window grows by one request for every window of successful responses
+  and is halved when the host throttles us (additive increase, multiplicative
+  decrease). The window is halved once per throttling episode: the throttled
+  responses of requests started before the last decrease were sent with the
+  previous window and are not counted again. Requests that failed for another
+  reason leave the window as is. A Retry-After pauses every request to the host
+  until it expires.
+  """
+
+  def __init__(self, initial: int, minimum: int, maximum: int):
+    self.limit = float(initial)
+    self.minimum = minimum
+    self.maximum = maximum
+    self.in_flight = 0
+    self.paused_until = 0.0
+    self.decreased_at = float("-inf")
+    self.condition = asyncio.Condition()
+
+  # Wait for a slot in the window, return the time the request starts at to be
+  # given back to release
+  async def acquire(self) -> float:
+    while True:
+      async with self.condition:
+        delay = self.paused_until - time.monotonic()
+        if delay <= 0:
+          if self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return time.monotonic()
+          await self.condition.wait()
+          continue
+
+      await asyncio.sleep(delay)
+
+  # Give back the slot of a request, outcome is "success", "throttled" or
+  # "failed"
+  async def release(
+    self, started_at: float, outcome: str, retry_after: Optional[float] = None
+  ):
+    async with self.condition:
+      self.in_flight -= 1
+
+      if outcome == "throttled":
+        if started_at > self.decreased_at:
+          self.limit = max(float(self.minimum), self.limit / 2)
+          self.decreased_at = time.monotonic()
+        if retry_after is not None:
+          self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+      elif outcome == "success":
+        self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+
+      self.condition.notify_all()
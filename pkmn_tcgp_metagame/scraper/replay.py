@@ -0,0 +1,156 @@
+"""Record the pages of a crawl and replay them from a local server.
+
+A crawl run with HTTP_RECORD_ARCHIVE set stores every page it reads, from the
+network or from the html cache, in a fixture archive. The replay server answers
+the requests of a crawl run with HTTP_REPLAY_URL set from that archive, so that
+the crawler can be measured and tuned offline and reproducibly.
+
+Usage: python -m pkmn_tcgp_metagame.scraper.replay ARCHIVE [--port 8780]
+  [--latency 0.05] [--jitter 0.02] [--error-rate 0.01]
+"""
+
+import argparse
+import asyncio
+import random
+import sqlite3
+from typing import Optional
+
+from aiohttp import web
+from yarl import URL
+
+from pkmn_tcgp_metagame.scraper.html_cache import compress_html, decompress_html
+
+# Header carrying the host a request was meant for, the replay server serves the
+# pages of every recorded host
+REPLAY_HOST_HEADER = "X-Replay-Host"
+
+
+class FixtureArchive:
+  """Pages recorded from the live sites, keyed by host and encoded path with query."""
+
+  def __init__(self, path: str):
+    self.conn = sqlite3.connect(path)
+    self.conn.execute(
+      """
+      create table if not exists responses (
+        host text not null,
+        path text not null,
+        codec text not null,
+        body blob not null,
+        primary key (host, path)
+      )
+      """
+    )
+    self.conn.commit()
+
+  def put(self, url: URL, html: str):
+    codec, body = compress_html(html)
+    self.conn.execute(
+      "insert or replace into responses values (?, ?, ?, ?)",
+      (url.host, url.raw_path_qs, codec, body),
+    )
+    self.conn.commit()
+
+  def get(self, host: str, path: str) -> Optional[str]:
+    row = self.conn.execute(
+      "select codec, body from responses where host = ? and path = ?",
+      (host, path),
+    ).fetchone()
+    if row is None:
+      return None
+    return decompress_html(*row)
+
+  def __len__(self):
+    return self.conn.execute("select count(*) from responses").fetchone()[0]
+
+  def close(self):
+    self.conn.close()
+
+
+class ReplayServer:
+  """Local http server answering requests with the pages of a fixture archive.
+
+  Every response is delayed by latency plus a random jitter, and error_rate of
+  the requests get a 429 or a 503 instead of their page. Pages missing from the
+  archive get a 404.
+  """
+
+  def __init__(
+    self,
+    archive: FixtureArchive,
+    latency: float = 0.0,
+    jitter: float = 0.0,
+    error_rate: float = 0.0,
+    seed: Optional[int] = None,
+  ):
+    self.archive = archive
+    self.latency = latency
+    self.jitter = jitter
+    self.error_rate = error_rate
+    self.random = random.Random(seed)
+    self.runner: Optional[web.AppRunner] = None
+    self.stats = {"requests": 0, "errors": 0, "missing": 0}
+
+  async def handle(self, request: web.Request):
+    self.stats["requests"] += 1
+    await asyncio.sleep(self.latency + self.random.uniform(0, self.jitter))
+
+    if self.random.random() < self.error_rate:
+      self.stats["errors"] += 1
+      return web.Response(
+        status=self.random.choice([429, 503]), headers={"Retry-After": "0"}
+      )
+
+    # The path is matched as sent, the same encoded form the archive is keyed on
+    host = request.headers.get(REPLAY_HOST_HEADER, request.host)
+    html = self.archive.get(host, request.raw_path)
+    if html is None:
+      self.stats["missing"] += 1
+      return web.Response(status=404)
+    return web.Response(text=html, content_type="text/html")
+
+  # Start serving, return the url to set as HTTP_REPLAY_URL
+  async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+    app = web.Application()
+    app.router.add_get("/{path:.*}", self.handle)
+    self.runner = web.AppRunner(app, access_log=None)
+    await self.runner.setup()
+    site = web.TCPSite(self.runner, host, port)
+    await site.start()
+    host, port = self.runner.addresses[0][:2]
+    return f"http://{host}:{port}"
+
+  async def stop(self):
+    if self.runner is not None:
+      await self.runner.cleanup()
+      self.runner = None
+
+
+async def serve(args: argparse.Namespace):
+  archive = FixtureArchive(args.archive)
+  server = ReplayServer(archive, args.latency, args.jitter, args.error_rate)
+  url = await server.start(args.host, args.port)
+  print(f"Replaying {len(archive)} pages on {url}")
+  try:
+    await asyncio.Event().wait()
+  finally:
+    await server.stop()
+    archive.close()
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("archive")
+  parser.add_argument("--host", default="127.0.0.1")
+  parser.add_argument("--port", type=int, default=8780)
+  parser.add_argument("--latency", type=float, default=0.0)
+  parser.add_argument("--jitter", type=float, default=0.0)
+  parser.add_argument("--error-rate", type=float, default=0.0)
+  try:
+    asyncio.run(serve(parser.parse_args()))
+  except KeyboardInterrupt:
+    pass
+
+
+if __name__ == "__main__":
+  main()
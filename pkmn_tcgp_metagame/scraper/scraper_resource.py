@@ -0,0 +1,93 @@
+import asyncio
+from typing import Optional
+
+import aiohttp
+from dagster import ConfigurableResource, InitResourceContext
+from pydantic import Field
+
+from pkmn_tcgp_metagame.assets import constants
+from pkmn_tcgp_metagame.scraper.scraper_session import ScraperSession
+
+try:
+  import uvloop
+except ImportError:
+  uvloop = None
+
+
+class ScraperResource(ConfigurableResource):
+  """Resource creating the http sessions of the extract assets."""
+
+  max_connections: int = Field(
+    default=constants.HTTP_MAX_CONNECTIONS,
+    description="Maximum number of connections open at once",
+  )
+  max_connections_per_host: int = Field(
+    default=constants.HTTP_HOST_CONCURRENCY_MAX,
+    description="Maximum number of connections open at once to a single host",
+  )
+  dns_cache_ttl: int = Field(
+    default=300, description="Seconds the resolved addresses of a host are kept"
+  )
+  keepalive_timeout: float = Field(
+    default=30.0, description="Seconds an idle connection is kept open for reuse"
+  )
+  connect_timeout: float = Field(
+    default=10.0, description="Seconds to wait for a connection to be established"
+  )
+  read_timeout: float = Field(
+    default=30.0, description="Seconds to wait for data from an open connection"
+  )
+  compression: bool = Field(
+    default=True, description="Ask the servers for compressed response bodies"
+  )
+  use_uvloop: bool = Field(
+    default=False,
+    description="Run the assets on the uvloop event loop, when uvloop is installed",
+  )
+
+  @classmethod
+  def _is_dagster_maintained(cls) -> bool:
+    return True
+
+  def setup_for_execution(self, context: InitResourceContext):
+    self.install_event_loop_policy()
+
+  # The policy applies to the event loops created afterwards, so it is installed
+  # when the resource is set up, before the loop of the asset is created
+  def install_event_loop_policy(self):
+    if not self.use_uvloop:
+      return
+    if uvloop is None:
+      raise OSError("uvloop is required to run the assets on the uvloop event loop")
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+  def connector(self):
+    return aiohttp.TCPConnector(
+      limit=self.max_connections,
+      limit_per_host=self.max_connections_per_host,
+      use_dns_cache=True,
+      ttl_dns_cache=self.dns_cache_ttl,
+      keepalive_timeout=self.keepalive_timeout,
+    )
+
+  # Return a new session for the site at base_url, to be used with async with
+  def get_session(
+    self,
+    base_url: str,
+    parse_workers: int = 0,
+    headers: Optional[dict[str, str]] = None,
+  ) -> ScraperSession:
+    headers = dict(headers or {})
+    if not self.compression:
+      headers["Accept-Encoding"] = "identity"
+
+    return ScraperSession(
+      base_url,
+      parse_workers=parse_workers,
+      connector=self.connector(),
+      max_concurrency_per_host=self.max_connections_per_host,
+      timeout=aiohttp.ClientTimeout(
+        sock_connect=self.connect_timeout, sock_read=self.read_timeout
+      ),
+      headers=headers,
+    )
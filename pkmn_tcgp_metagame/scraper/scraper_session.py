@@ -0,0 +1,296 @@
+import asyncio
+import multiprocessing
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+import aiohttp
+import dagster
+from multidict import CIMultiDictProxy
+from yarl import URL
+
+from pkmn_tcgp_metagame.assets import constants
+from pkmn_tcgp_metagame.scraper.html_cache import html_cache_key
+from pkmn_tcgp_metagame.scraper.metrics import CrawlerMetrics
+from pkmn_tcgp_metagame.scraper.rate_limiter import HostLimiter, parse_retry_after
+from pkmn_tcgp_metagame.scraper.replay import REPLAY_HOST_HEADER, FixtureArchive
+
+
+@dataclass
+class FetchResponse:
+  status: int
+  text: str
+  headers: CIMultiDictProxy
+
+
+@dataclass
+class ScraperStats:
+  requests: int = 0
+  retries: int = 0
+  throttled: int = 0
+  failures: int = 0
+  max_limit_per_host: dict[str, float] = field(default_factory=dict)
+  metrics: CrawlerMetrics = field(default_factory=CrawlerMetrics)
+
+  # Accumulate the stats of another session
+  def add(self, other: "ScraperStats"):
+    self.requests += other.requests
+    self.retries += other.retries
+    self.throttled += other.throttled
+    self.failures += other.failures
+    for host, limit in other.max_limit_per_host.items():
+      self.max_limit_per_host[host] = max(self.max_limit_per_host.get(host, 0), limit)
+    self.metrics.add(other.metrics)
+
+  def to_metadata(self):
+    return {
+      "Number of requests": dagster.MetadataValue.int(self.requests),
+      "Number of retries": dagster.MetadataValue.int(self.retries),
+      "Number of throttled responses": dagster.MetadataValue.int(self.throttled),
+      "Number of failed requests": dagster.MetadataValue.int(self.failures),
+      "Max concurrency per host": dagster.MetadataValue.json(
+        {host: int(limit) for host, limit in self.max_limit_per_host.items()}
+      ),
+      **self.metrics.to_metadata(),
+    }
+
+  def prometheus_lines(self, job: str):
+    return [
+      "# TYPE scraper_requests_total counter",
+      f'scraper_requests_total{{job="{job}"}} {self.requests}',
+      "# TYPE scraper_throttled_total counter",
+      f'scraper_throttled_total{{job="{job}"}} {self.throttled}',
+      "# TYPE scraper_failures_total counter",
+      f'scraper_failures_total{{job="{job}"}} {self.failures}',
+      *self.metrics.prometheus_lines(job),
+    ]
+
+
+# Run a parser and time it, in the process running the parser so that the time
+# spent waiting for a pool worker is not counted
+def timed_call(parser: Callable, *args):
+  start = time.perf_counter()
+  result = parser(*args)
+  return result, time.perf_counter() - start
+
+
+def is_throttling_status(status: int):
+  return status == 429 or status >= 500
+
+
+class ScraperSession:
+  """aiohttp session with adaptive per-host concurrency and retries.
+
+  Responses with a 429 or 5xx status, connection errors and timeouts are
+  retried with an exponential backoff and jitter, honoring Retry-After.
+  Requests go to the replay server instead when HTTP_REPLAY_URL is set.
+  The concurrency of a host never goes over max_concurrency_per_host.
+  """
+
+  def __init__(
+    self,
+    base_url: str,
+    parse_workers: int = 0,
+    connector: Optional[aiohttp.BaseConnector] = None,
+    max_concurrency_per_host: int = constants.HTTP_HOST_CONCURRENCY_MAX,
+    **session_kwargs,
+  ):
+    self.base_url = URL(base_url)
+    self.max_concurrency_per_host = max_concurrency_per_host
+    self.session = aiohttp.ClientSession(
+      base_url=base_url,
+      connector=connector or aiohttp.TCPConnector(limit=constants.HTTP_MAX_CONNECTIONS),
+      **session_kwargs,
+    )
+    self.limiters: dict[str, HostLimiter] = {}
+    self.stats = ScraperStats()
+
+    self.replay_url = (
+      URL(constants.HTTP_REPLAY_URL) if constants.HTTP_REPLAY_URL else None
+    )
+    self.recorder = None
+    if constants.HTTP_RECORD_ARCHIVE:
+      self.recorder = FixtureArchive(constants.HTTP_RECORD_ARCHIVE)
+
+    # Pages held at once between their download and the end of their parse
+    self.page_slots = asyncio.Semaphore(constants.PAGES_IN_FLIGHT)
+
+    # Work shared by concurrent callers, and results kept for the whole run
+    self.in_flight: dict[Hashable, asyncio.Future] = {}
+    self.memo: dict[Hashable, Any] = {}
+    self.background_tasks: set[asyncio.Future] = set()
+
+    # Pages are parsed in worker processes when parse_workers is set, so that
+    # parsing does not block the downloads running on the event loop
+    self.parse_executor = None
+    if parse_workers > 0:
+      self.parse_executor = ProcessPoolExecutor(
+        max_workers=parse_workers, mp_context=multiprocessing.get_context("spawn")
+      )
+
+  async def __aenter__(self):
+    return self
+
+  async def __aexit__(self, *args):
+    await self.close()
+
+  async def close(self):
+    # Background work is awaited, shared work left running by cancelled callers
+    # ends with the session
+    await asyncio.gather(*self.background_tasks, return_exceptions=True)
+
+    tasks = list(self.in_flight.values())
+    for task in tasks:
+      task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    await self.session.close()
+    if self.recorder is not None:
+      self.recorder.close()
+    if self.parse_executor is not None:
+      await asyncio.get_running_loop().run_in_executor(
+        None, self.parse_executor.shutdown
+      )
+
+  # Run a parser taking raw html and returning plain records, in the parse pool
+  # when there is one and in a thread otherwise so that it never blocks the
+  # event loop. The parse time is recorded under page_type.
+  async def parse(self, page_type: str, parser: Callable, *args):
+    if self.parse_executor is None:
+      result, seconds = await asyncio.to_thread(timed_call, parser, *args)
+    else:
+      result, seconds = await asyncio.get_running_loop().run_in_executor(
+        self.parse_executor, timed_call, parser, *args
+      )
+    self.stats.metrics.observe_parse(page_type, seconds)
+    return result
+
+  # Run the coroutine built by factory once for every caller asking for the same
+  # key while it is running, they all get its result or its exception
+  async def single_flight(self, key: Hashable, factory: Callable[[], Awaitable]):
+    task = self.in_flight.get(key)
+    if task is None:
+      task = asyncio.ensure_future(factory())
+      self.in_flight[key] = task
+      task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+    # A cancelled caller must not cancel the work shared with the others
+    return await asyncio.shield(task)
+
+  # Same as single_flight, and the result is kept for the rest of the run.
+  # Results that are None are not kept so that failures are retried.
+  async def memoized(self, key: Hashable, factory: Callable[[], Awaitable]):
+    if key in self.memo:
+      return self.memo[key]
+    result = await self.single_flight(key, factory)
+    if result is not None:
+      self.memo[key] = result
+    return result
+
+  # Run work nobody waits for, shared by key with the other callers of
+  # single_flight. The session waits for it to end before closing.
+  def run_in_background(self, key: Hashable, factory: Callable[[], Awaitable]):
+    task = asyncio.ensure_future(self.single_flight(key, factory))
+    self.background_tasks.add(task)
+    task.add_done_callback(self.background_tasks.discard)
+
+  def absolute_url(self, url: str):
+    return self.base_url.join(URL(url))
+
+  # Key of the html cache entry of url, which includes the host of the site
+  def cache_key(self, url: str):
+    return html_cache_key(str(self.absolute_url(url)))
+
+  # Record a page read by the crawl in the fixture archive, when recording
+  def record(self, url: str, html: str):
+    if self.recorder is not None:
+      self.recorder.put(self.absolute_url(url), html)
+
+  # Url and headers of the request actually sent for url, the replay server is
+  # told the host the request was meant for
+  def route(self, url: str, headers: Optional[dict]):
+    if self.replay_url is None:
+      return url, headers
+    target = self.absolute_url(url)
+    return (
+      self.replay_url.join(URL(target.raw_path_qs)),
+      {**(headers or {}), REPLAY_HOST_HEADER: target.host},
+    )
+
+  def limiter(self, url: str):
+    host = URL(url).host or self.base_url.host
+    if host not in self.limiters:
+      self.limiters[host] = HostLimiter(
+        min(constants.HTTP_HOST_CONCURRENCY_INITIAL, self.max_concurrency_per_host),
+        min(constants.HTTP_HOST_CONCURRENCY_MIN, self.max_concurrency_per_host),
+        self.max_concurrency_per_host,
+      )
+    return host, self.limiters[host]
+
+  def backoff(self, attempt: int, retry_after: Optional[float] = None):
+    delay = min(
+      constants.HTTP_BACKOFF_MAX, constants.HTTP_BACKOFF_BASE * 2**attempt
+    ) * random.uniform(0.5, 1.5)
+    if retry_after is not None:
+      delay = max(delay, retry_after)
+    return delay
+
+  # Send a GET request and read its body, retrying throttled and failed
+  # requests. Raise an aiohttp.ClientError once the retries are exhausted.
+  async def fetch(self, url: str, headers: Optional[dict] = None) -> FetchResponse:
+    host, limiter = self.limiter(url)
+    request_url, headers = self.route(url, headers)
+
+    for attempt in range(constants.HTTP_MAX_RETRIES + 1):
+      last_attempt = attempt == constants.HTTP_MAX_RETRIES
+      retry_after = None
+
+      started_at = await limiter.acquire()
+      outcome = "failed"
+      start = time.perf_counter()
+      try:
+        self.stats.requests += 1
+        async with self.session.get(request_url, headers=headers) as resp:
+          if not is_throttling_status(resp.status):
+            resp.raise_for_status()
+            body = await resp.read()
+            self.stats.metrics.observe_request(
+              host, time.perf_counter() - start, len(body)
+            )
+            outcome = "success"
+            return FetchResponse(
+              resp.status, body.decode(resp.get_encoding()), resp.headers
+            )
+
+          outcome = "throttled"
+          self.stats.throttled += 1
+          retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+          if last_attempt:
+            self.stats.failures += 1
+            resp.raise_for_status()
+      except aiohttp.ClientResponseError:
+        # Error statuses other than the throttling ones are not retried, the
+        # throttled responses of the last attempt are already counted
+        if outcome != "throttled":
+          self.stats.failures += 1
+          self.stats.metrics.observe_request(host, time.perf_counter() - start, 0)
+        raise
+      except (
+        aiohttp.ClientConnectionError,
+        aiohttp.ClientPayloadError,
+        asyncio.TimeoutError,
+      ):
+        outcome = "throttled"
+        if last_attempt:
+          self.stats.failures += 1
+          raise
+      finally:
+        await limiter.release(started_at, outcome, retry_after)
+        self.stats.max_limit_per_host[host] = max(
+          self.stats.max_limit_per_host.get(host, 0), limiter.limit
+        )
+
+      self.stats.retries += 1
+      self.stats.metrics.observe_retry(host)
+      await asyncio.sleep(self.backoff(attempt, retry_after))
@@ -22,5 +22,5 @@ select
   en.card_subtype,
   en.card_stage
 from {{ source('raw', 'cards') }} as en
-inner join {{ source('raw', 'translations') }} as fr on en.set_code = fr.set_code and en.card_number = fr.card_number
+inner join {{ source('raw', 'translations') }} as fr on en.set_code = fr.set_code and en.card_number = fr.card_number and fr.locale = 'fr'
 left outer join cards_with_duplicate_names as cwdn on en.set_code = cwdn.set_code and en.card_name = cwdn.card_name
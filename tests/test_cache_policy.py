@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import time
+from types import SimpleNamespace
+
+import pytest
+from yarl import URL
+
+from pkmn_tcgp_metagame.assets import constants, extract
+from pkmn_tcgp_metagame.scraper import cache_policy as cache_policy_module
+from pkmn_tcgp_metagame.scraper import html_cache
+from pkmn_tcgp_metagame.scraper.cache_policy import DAY, HOUR, cache_policy
+from pkmn_tcgp_metagame.scraper.html_cache import CacheEntry
+from pkmn_tcgp_metagame.scraper.replay import FixtureArchive, ReplayServer
+from pkmn_tcgp_metagame.scraper.scraper_session import ScraperSession
+
+TOURNAMENT = "67d1f0e0c3a5b20012ab34cd"
+
+
+@pytest.mark.parametrize(
+  "url, ttl",
+  [
+    (extract.construct_tournament_list_url(2), 0),
+    (extract.construct_api_tournament_list_url(2), 0),
+    ("/cards", 0),
+    ("/cards/A1", 0),
+    (extract.translation_sources["fr"].index_url, 0),
+    (extract.construct_decklist_url(TOURNAMENT, "zoe"), None),
+    (extract.construct_pairings_url(TOURNAMENT), None),
+    (f"/tournament/{TOURNAMENT}/pairings?round=3", None),
+    (extract.construct_api_pairings_url(TOURNAMENT), None),
+    ("/cards/A1/1", None),
+    (f"{constants.BASE_URL_CARDS}/cards/A1a/38", None),
+    (extract.construct_standings_url(TOURNAMENT), 6 * HOUR),
+    (extract.construct_api_standings_url(TOURNAMENT), 6 * HOUR),
+    ("/cards?q=name:Flabébé", 7 * DAY),
+    ("/jeux/mobile/pocket/cartodex/extensions/promoa.html", 7 * DAY),
+    ("/somewhere/else", None),
+  ],
+)
+def test_cache_policy_matching(url, ttl):
+  assert cache_policy(url).ttl == ttl
+
+
+def test_cache_policy_freshness():
+  entry = CacheEntry("<html></html>", time.time() - 7 * HOUR)
+  assert not cache_policy(extract.construct_standings_url(TOURNAMENT)).is_fresh(entry)
+  assert cache_policy("/cards?q=name:Mew").is_fresh(entry)
+  assert cache_policy("/cards/A1/1").is_fresh(CacheEntry("<html></html>", 0.0))
+  assert not cache_policy("/cards").is_fresh(CacheEntry("<html></html>", time.time()))
+
+  assert cache_policy(extract.construct_standings_url(TOURNAMENT)).serves_stale
+  assert not cache_policy("/cards").serves_stale
+  assert not cache_policy("/cards/A1/1").serves_stale
+
+
+# Cached pages are stored at the time of the test and read 7 hours later
+@pytest.mark.parametrize(
+  "url, served, stored, nb_requests",
+  [
+    # Stale while revalidate, the page is refreshed in the background
+    (extract.construct_standings_url(TOURNAMENT), "old", "new", 1),
+    # Revalidated before use
+    (extract.construct_tournament_list_url(2), "new", "new", 1),
+    # Still fresh, or never expired
+    ("/cards?q=name:Mew", "old", "old", 0),
+    (extract.construct_pairings_url(TOURNAMENT), "old", "old", 0),
+  ],
+)
+def test_cache_policy_fetch(tmp_path, monkeypatch, url, served, stored, nb_requests):
+  monkeypatch.chdir(tmp_path)
+  monkeypatch.setattr(constants, "HTML_CACHE_BACKEND", "sqlite")
+  monkeypatch.setattr(constants, "HTTP_RECORD_ARCHIVE", "")
+  monkeypatch.setattr(html_cache, "_html_cache", None)
+  later = time.time() + 7 * HOUR
+  monkeypatch.setattr(cache_policy_module, "time", SimpleNamespace(time=lambda: later))
+
+  base_url = constants.BASE_URL_TOURNAMENTS
+  if url.startswith("/cards"):
+    base_url = constants.BASE_URL_CARDS
+  absolute_url = str(URL(base_url).join(URL(url)))
+  archive = FixtureArchive(str(tmp_path / "archive.sqlite"))
+  archive.put(URL(absolute_url), "<html>new</html>")
+
+  async def run():
+    server = ReplayServer(archive)
+    monkeypatch.setattr(constants, "HTTP_REPLAY_URL", await server.start())
+    cache = html_cache.get_html_cache()
+    try:
+      async with ScraperSession(base_url) as session:
+        key = session.cache_key(url)
+        await cache.put(key, absolute_url, "<html>old</html>")
+        page = await extract.async_html_from_url(
+          logging.getLogger("test"), session, asyncio.Semaphore(1), url
+        )
+      # The background refresh is done once the session is closed
+      return page.html, (await cache.get(key)).html, session.stats.requests
+    finally:
+      await server.stop()
+      cache.close()
+
+  result = asyncio.run(run())
+  archive.close()
+  assert result == (f"<html>{served}</html>", f"<html>{stored}</html>", nb_requests)
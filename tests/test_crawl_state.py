@@ -0,0 +1,99 @@
+import asyncio
+import json
+import logging
+
+from pkmn_tcgp_metagame.assets import constants, extract
+from pkmn_tcgp_metagame.assets.extract import TournamentListing
+from pkmn_tcgp_metagame.assets.records import DeckListItem, Match, MatchResult, Player
+from pkmn_tcgp_metagame.scraper.crawl_state import CrawlState
+
+
+def listing(tournament_id: str):
+  return TournamentListing(
+    tournament_id, "Weekly", "2025-03-12T18:00:00.000Z", "12", "STANDARD", "2"
+  )
+
+
+players = [Player("ana", "Ana", "1", "FR", [DeckListItem("/cards/A1/1", 2)])]
+matches = [Match([MatchResult("ana", 1), MatchResult("bo", 0)])]
+
+
+# Extract t1 without a session, every stage must be journaled
+async def extract_standings(crawl_state: CrawlState):
+  await extract.extract_standings(
+    logging.getLogger("test"),
+    None,
+    asyncio.Semaphore(1),
+    crawl_state,
+    extract.tournament_sources["html"],
+    "t1",
+    "Weekly",
+    "2025-03-12T18:00:00.000Z",
+    "12",
+    "STANDARD",
+    2,
+  )
+
+
+def test_crawl_state_resume(tmp_path):
+  path = str(tmp_path / "state" / "crawl.sqlite")
+  crawl_state = CrawlState(path)
+  for tournament_id in ("t1", "t2", "t3"):
+    crawl_state.complete(tournament_id, "listed", listing(tournament_id))
+  crawl_state.complete("t1", "decklists", players)
+  crawl_state.complete("t1", "pairings", matches)
+  crawl_state.written("t2")
+  # A listing journaled by an older version is skipped
+  crawl_state.complete("t4", "listed", {"id": "t4"})
+  crawl_state.close()
+
+  # The state survives the interrupted run
+  crawl_state = CrawlState(path)
+  assert crawl_state.pending(TournamentListing) == [listing("t1"), listing("t3")]
+  assert crawl_state.get("t1", "decklists", list[Player]) == players
+  assert crawl_state.get("t1", "pairings", list[Match]) == matches
+  assert crawl_state.get("t1", "standings", list[Player]) is None
+  assert crawl_state.get("t3", "decklists", list[Player]) is None
+  assert crawl_state.resumed == {"standings": 0, "decklists": 1, "pairings": 1}
+
+  # Records that do not decode are extracted again
+  assert crawl_state.get("t1", "decklists", list[Match]) is None
+
+  # The records of a written tournament are dropped
+  crawl_state.written("t1")
+  assert crawl_state.pending(TournamentListing) == [listing("t3")]
+  assert crawl_state.get("t1", "decklists", list[Player]) is None
+  crawl_state.close()
+
+
+def test_extract_standings_resumes_stages(tmp_path, monkeypatch):
+  monkeypatch.chdir(tmp_path)
+  crawl_state = CrawlState(str(tmp_path / "crawl.sqlite"))
+  crawl_state.complete("t1", "listed", listing("t1"))
+  crawl_state.complete("t1", "decklists", players)
+  crawl_state.complete("t1", "pairings", matches)
+
+  asyncio.run(extract_standings(crawl_state))
+  with open(f"{constants.TOURNAMENTS_OUTPUT_DIR}/t1.json") as f:
+    tournament = json.load(f)
+  assert [p["id"] for p in tournament["players"]] == ["ana"]
+  assert len(tournament["matches"]) == 1
+
+  assert crawl_state.pending(TournamentListing) == []
+  assert crawl_state.resumed["decklists"] == 1
+  assert crawl_state.resumed["pairings"] == 1
+  crawl_state.close()
+
+
+def test_extract_standings_resumes_skipped(tmp_path, monkeypatch):
+  monkeypatch.chdir(tmp_path)
+  crawl_state = CrawlState(str(tmp_path / "crawl.sqlite"))
+  crawl_state.complete("t1", "listed", listing("t1"))
+  crawl_state.complete("t1", "decklists", [])
+  crawl_state.complete("t1", "pairings", [])
+
+  # A tournament without decklist is recorded as such and not resumed again
+  asyncio.run(extract_standings(crawl_state))
+  assert extract.read_known_tournament_ids() == {"t1"}
+  assert crawl_state.pending(TournamentListing) == []
+  crawl_state.close()
@@ -0,0 +1,65 @@
+import asyncio
+import dataclasses
+import logging
+
+import pytest
+
+from pkmn_tcgp_metagame.assets import extract
+from pkmn_tcgp_metagame.assets.records import Player
+
+
+async def extract_standings(source: extract.TournamentSource):
+  return await extract.extract_standings(
+    logging.getLogger("test"),
+    None,
+    asyncio.Semaphore(1),
+    None,
+    source,
+    "t1",
+    "Weekly #1",
+    "2025-03-12T18:00:00.000Z",
+    "12",
+    "STANDARD",
+    2,
+  )
+
+
+def fail_to_create_directory(path: str):
+  raise OSError(f"can not create the directory of {path}")
+
+
+@pytest.mark.parametrize("players", [None, [Player("ana", "Ana", 1, "FR", [])]])
+def test_extract_standings_cancels_matches(monkeypatch, players):
+  monkeypatch.setattr(extract, "create_directory_for_file", fail_to_create_directory)
+  cancelled = []
+
+  async def extract_players(*args):
+    await asyncio.sleep(0)
+    return players
+
+  async def extract_matches(*args):
+    try:
+      await asyncio.Event().wait()
+    except asyncio.CancelledError:
+      cancelled.append(True)
+      raise
+
+  source = dataclasses.replace(
+    extract.tournament_sources["html"],
+    extract_players=extract_players,
+    extract_matches=extract_matches,
+  )
+
+  async def run():
+    try:
+      await extract_standings(source)
+    finally:
+      # No task is left behind, whether the tournament was skipped or failed
+      assert asyncio.all_tasks() == {asyncio.current_task()}
+
+  if players:
+    with pytest.raises(OSError):
+      asyncio.run(run())
+  else:
+    asyncio.run(run())
+  assert cancelled == [True]
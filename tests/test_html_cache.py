@@ -0,0 +1,152 @@
+import asyncio
+import os
+
+import pytest
+
+from pkmn_tcgp_metagame.assets import constants, extract
+from pkmn_tcgp_metagame.scraper.html_cache import (
+  DirectoryHtmlCache,
+  SqliteHtmlCache,
+  html_cache_key,
+  legacy_cache_key,
+  legacy_cache_url,
+  migrate_directory_cache,
+  normalize_cache_url,
+)
+
+TOURNAMENTS = constants.BASE_URL_TOURNAMENTS
+CARDS = constants.BASE_URL_CARDS
+TRANSLATIONS = constants.BASE_URL_TRANSLATIONS
+
+
+def test_cache_key_distinguishes_urls():
+  urls = [
+    f"{CARDS}/cards?q=name:Mr. Mime",
+    f"{CARDS}/cards?q=name:MrMime",
+    f"{CARDS}/cards?q=name:Mr.Mime",
+    f"{CARDS}/cards/P-A/1",
+    f"{CARDS}/cards/PA/1",
+    f"{TOURNAMENTS}/cards/P-A/1",
+    f"{TOURNAMENTS}/tournament/a-b/standings?players",
+    f"{TOURNAMENTS}/tournament/ab/standings?players",
+    f"{TOURNAMENTS}/tournament/ab/standings",
+  ]
+  assert len({html_cache_key(url) for url in urls}) == len(urls)
+
+
+def test_cache_key_normalizes_urls():
+  assert (
+    html_cache_key("https://Pocket.LimitlessTCG.com:443/cards?q=name:Flabébé#top")
+    == html_cache_key(f"{CARDS}/cards?q=name:Flab%c3%a9b%c3%a9")
+    == html_cache_key(f"{CARDS}/cards?q=name:Flab%C3%A9b%C3%A9")
+  )
+
+
+def test_cache_key_requires_absolute_url():
+  with pytest.raises(ValueError):
+    html_cache_key("/cards/A1/1")
+
+
+@pytest.mark.parametrize(
+  "url",
+  [
+    TOURNAMENTS + extract.construct_tournament_list_url(1),
+    TOURNAMENTS + extract.construct_tournament_list_url(12),
+    TOURNAMENTS + extract.construct_standings_url("67d1f0e0c3a5b20012ab34cd"),
+    TOURNAMENTS + extract.construct_pairings_url("67d1f0e0c3a5b20012ab34cd"),
+    TOURNAMENTS + "/tournament/67d1f0e0c3a5b20012ab34cd/pairings?round=3",
+    TOURNAMENTS + extract.construct_decklist_url("67d1f0e0c3a5b20012ab34cd", "zoe"),
+    TOURNAMENTS + extract.construct_api_tournament_list_url(3),
+    TOURNAMENTS + extract.construct_api_standings_url("67d1f0e0c3a5b20012ab34cd"),
+    TOURNAMENTS + extract.construct_api_pairings_url("67d1f0e0c3a5b20012ab34cd"),
+    CARDS + "/cards",
+    CARDS + "/cards/A1",
+    CARDS + "/cards/A1a/38",
+    CARDS + "/cards?q=name:Flabébé",
+    TRANSLATIONS + extract.translation_sources["fr"].index_url,
+    TRANSLATIONS + "/jeux/mobile/pocket/cartodex/extensions/promoa.html",
+  ],
+)
+def test_legacy_cache_url(url):
+  assert legacy_cache_url(legacy_cache_key(url)) == normalize_cache_url(url)
+
+
+def test_legacy_cache_url_unknown():
+  assert legacy_cache_url("/somewhere/else") is None
+
+
+def write_legacy_page(directory: str, url: str, html: str):
+  path = f"{directory}{legacy_cache_key(url)}.html"
+  os.makedirs(os.path.dirname(path), exist_ok=True)
+  with open(path, "w") as f:
+    f.write(html)
+
+
+def test_directory_cache(tmp_path):
+  cache = DirectoryHtmlCache(str(tmp_path / "cache"))
+  url = f"{CARDS}/cards?q=name:Mr. Mime"
+  key = html_cache_key(url)
+
+  asyncio.run(cache.put(key, url, "<html>mime</html>", etag='"1"'))
+  entry = asyncio.run(cache.get(key))
+  assert (entry.html, entry.etag, entry.url) == ("<html>mime</html>", '"1"', url)
+  assert cache.path(key) == f"{tmp_path}/cache/{key[:2]}/{key}.html"
+
+  legacy_url = f"{CARDS}/cards/A1/1"
+  write_legacy_page(cache.directory, legacy_url, "<html>legacy</html>")
+  entries = {info.key: info.url for info in cache.entries()}
+  assert entries == {key: url, legacy_cache_key(legacy_url): None}
+
+  cache.delete_many(list(entries))
+  cache.compact()
+  assert list(cache.keys()) == []
+
+
+def test_directory_cache_reads_legacy_tree(tmp_path):
+  cache = DirectoryHtmlCache(str(tmp_path / "cache"))
+  url = f"{CARDS}/cards?q=name:Flabébé"
+  key = html_cache_key(url)
+  write_legacy_page(cache.directory, url, "<html>legacy</html>")
+  with open(cache.meta_path(legacy_cache_key(url)), "w") as f:
+    f.write('{"etag": "\\"1\\"", "stored_at": 1.0}')
+
+  # Without the url the page can not be found under its legacy key
+  assert asyncio.run(cache.get(key)) is None
+
+  entry = asyncio.run(cache.get(key, normalize_cache_url(url)))
+  assert (entry.html, entry.etag, entry.stored_at) == (
+    "<html>legacy</html>",
+    '"1"',
+    1.0,
+  )
+  assert entry.url == normalize_cache_url(url)
+
+  # The page was moved to its key
+  assert list(cache.keys()) == [key]
+  assert asyncio.run(cache.get(key)).html == "<html>legacy</html>"
+
+
+def test_migrate_directory_cache(tmp_path):
+  source = DirectoryHtmlCache(str(tmp_path / "cache"))
+  target = SqliteHtmlCache(str(tmp_path / "cache.sqlite"))
+
+  standings_url = TOURNAMENTS + extract.construct_standings_url("t1")
+  search_url = f"{CARDS}/cards?q=name:Flabébé"
+  write_legacy_page(source.directory, standings_url, "<html>standings</html>")
+  write_legacy_page(source.directory, search_url, "<html>search</html>")
+  write_legacy_page(source.directory, f"{CARDS}/unknown/page", "<html>?</html>")
+
+  card_url = f"{CARDS}/cards/A1/1"
+  asyncio.run(source.put(html_cache_key(card_url), card_url, "<html>card</html>"))
+
+  nb_pages, _, nb_skipped = migrate_directory_cache(source, target)
+  assert (nb_pages, nb_skipped) == (3, 1)
+
+  for url, html in [
+    (standings_url, "<html>standings</html>"),
+    (search_url, "<html>search</html>"),
+    (card_url, "<html>card</html>"),
+  ]:
+    entry = asyncio.run(target.get(html_cache_key(url)))
+    assert (entry.html, entry.url) == (html, normalize_cache_url(url))
+  target.close()
@@ -0,0 +1,147 @@
+import asyncio
+import json
+import logging
+
+from yarl import URL
+
+from pkmn_tcgp_metagame.assets import constants, extract, load
+from pkmn_tcgp_metagame.scraper import html_cache
+from pkmn_tcgp_metagame.scraper.replay import FixtureArchive, ReplayServer
+from pkmn_tcgp_metagame.scraper.scraper_resource import ScraperResource
+
+
+def decklist(*numbers):
+  return {
+    "pokemon": [{"count": 2, "set": "A1", "number": n} for n in numbers],
+    "trainer": [{"count": 1, "set": "P-A", "number": 7}],
+  }
+
+
+tournaments = [
+  {
+    "id": "t1",
+    "game": "POCKET",
+    "format": "STANDARD",
+    "name": "Weekly #1",
+    "date": "2025-03-12T18:00:00.000Z",
+    "players": 5,
+    "organizerId": 12,
+  },
+  {
+    "id": "t2",
+    "game": "POCKET",
+    "format": None,
+    "name": "Custom Cup",
+    "date": "2025-03-11T12:30:00.000Z",
+    "players": 2,
+    "organizerId": 7,
+  },
+]
+
+# Api responses of the tournaments site, by url
+responses = {
+  extract.construct_api_standings_url("t1"): [
+    {"player": "ana", "name": "Ana", "placing": 1, "decklist": decklist(129)},
+    {"player": "bo", "name": "Bo", "country": "FR", "decklist": decklist(33, 4)},
+    {"player": "cy", "name": "Cy", "placing": 3, "decklist": decklist(96)},
+    {"player": "di", "name": "Di", "placing": 4, "decklist": decklist(1)},
+    {"player": "ed", "name": "Ed", "placing": 5, "decklist": None},
+  ],
+  extract.construct_api_pairings_url("t1"): [
+    {"round": 1, "table": 1, "winner": "ana", "player1": "ana", "player2": "bo"},
+    {"round": 1, "table": 2, "winner": "di", "player1": "cy", "player2": "di"},
+    {"round": 1, "table": 3, "winner": "ed", "player1": "ed"},
+    {"round": 2, "table": 1, "winner": 0, "player1": "ana", "player2": "di"},
+    {"round": 2, "table": 2, "winner": -1, "player1": "bo", "player2": "ed"},
+    {"round": 2, "table": 3, "player1": "cy", "player2": "ed"},
+  ],
+  extract.construct_api_standings_url("t2"): [
+    {"player": "fay", "name": "Fay", "placing": 1, "decklist": decklist(2)},
+    {"player": "gus", "name": "Gus", "placing": 2, "decklist": {}},
+  ],
+  extract.construct_api_pairings_url("t2"): [
+    {"round": 1, "table": 1, "winner": "fay", "player1": "gus", "player2": "fay"},
+  ],
+  extract.construct_api_tournament_list_url(1): tournaments,
+  **{
+    extract.construct_api_tournament_list_url(page): []
+    for page in range(2, 2 + constants.TOURNAMENT_PAGES_WINDOW)
+  },
+}
+
+
+def read_tournament(tournament_id: str):
+  with open(f"{constants.TOURNAMENTS_OUTPUT_DIR}/{tournament_id}.json") as f:
+    return json.load(f)
+
+
+def scores(tournament: dict):
+  return [
+    [(result["player_id"], result["score"]) for result in match["match_results"]]
+    for match in tournament["matches"]
+  ]
+
+
+def test_extract_api_tournaments(tmp_path, monkeypatch):
+  monkeypatch.chdir(tmp_path)
+  monkeypatch.setattr(constants, "METRICS_TEXTFILE_DIR", "")
+  monkeypatch.setattr(constants, "PARSE_WORKERS", 0)
+  monkeypatch.setattr(html_cache, "_html_cache", None)
+
+  archive = FixtureArchive(str(tmp_path / "archive.sqlite"))
+  for url, value in responses.items():
+    archive.put(URL(constants.BASE_URL_TOURNAMENTS).join(URL(url)), json.dumps(value))
+
+  async def run():
+    server = ReplayServer(archive)
+    monkeypatch.setattr(constants, "HTTP_REPLAY_URL", await server.start())
+    try:
+      return await extract.extract_all_tournaments(
+        logging.getLogger("test"), ScraperResource(), source="limitless-api"
+      )
+    finally:
+      await server.stop()
+      html_cache.get_html_cache().close()
+
+  nb_pages, _ = asyncio.run(run())
+  archive.close()
+  assert nb_pages == 1 + constants.TOURNAMENT_PAGES_WINDOW
+
+  t1 = read_tournament("t1")
+  assert (t1["format"], t1["organizer"], t1["nb_players"]) == ("STANDARD", "12", "5")
+  # Players without decklist are dropped, a missing placing is -1
+  assert [(p["id"], p["placing"]) for p in t1["players"]] == [
+    ("ana", "1"),
+    ("bo", -1),
+    ("cy", "3"),
+    ("di", "4"),
+  ]
+  assert t1["players"][1]["country"] == "FR"
+  assert [item["url"] for item in t1["players"][1]["decklist"]] == [
+    "/cards/A1/33",
+    "/cards/A1/4",
+    "/cards/P-A/7",
+  ]
+  # The winner scores 1 and the loser 0, both score 0 on a tie or a double loss,
+  # byes and unfinished matches are skipped
+  assert scores(t1) == [
+    [("ana", 1), ("bo", 0)],
+    [("cy", 0), ("di", 1)],
+    [("ana", 0), ("di", 0)],
+    [("bo", 0), ("ed", 0)],
+  ]
+
+  t2 = read_tournament("t2")
+  assert t2["format"] == ""
+  assert [p["id"] for p in t2["players"]] == ["fay"]
+  assert scores(t2) == [[("gus", 0), ("fay", 1)]]
+
+  # The files are read back by the load step
+  for tournament_id in ("t1", "t2"):
+    path = f"{constants.TOURNAMENTS_OUTPUT_DIR}/{tournament_id}.json"
+    _, decoded_id, rows = load.decode_tournament_file(
+      path, list(load.raw_tournament_tables)
+    )
+    assert decoded_id == tournament_id
+  assert len(rows["raw_tournaments"]) == 1
+  assert len(rows["raw_matches"]) == 1
@@ -0,0 +1,210 @@
+import contextlib
+import logging
+import os
+
+import pytest
+
+from pkmn_tcgp_metagame.assets import constants, load
+from pkmn_tcgp_metagame.assets.load import (
+  ManifestEntry,
+  RawTournamentTableLoad,
+  TournamentFiles,
+)
+
+log = logging.getLogger("test")
+
+
+class FakeCopy:
+  def __init__(self, cursor: "FakeCursor"):
+    self.cursor = cursor
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    pass
+
+  def set_types(self, types: list[str]):
+    pass
+
+  def write_row(self, row: tuple):
+    self.cursor.copied.append(row)
+
+
+class FakeCursor:
+  """Cursor answering the queries of a load from the state of a table and its
+  manifest, and recording the statements it is sent."""
+
+  def __init__(
+    self,
+    manifest: dict[str, ManifestEntry],
+    unlogged: bool = False,
+    exists: bool = True,
+    empty: bool = False,
+  ):
+    self.manifest = manifest
+    self.unlogged = unlogged
+    self.exists = exists
+    self.empty = empty
+    self.statements: list[str] = []
+    self.params: list = []
+    self.manifest_rows: list[tuple] = []
+    self.copied: list[tuple] = []
+    self.result: list[tuple] = []
+
+  def execute(self, sql: str, params=None):
+    self.statements.append(" ".join(sql.split()))
+    self.params.append(params)
+    if "from raw.load_manifest" in sql and sql.strip().startswith("select"):
+      self.result = [
+        (name, *entry.__dict__.values()) for name, entry in self.manifest.items()
+      ]
+    elif "relpersistence" in sql:
+      self.result = [(self.unlogged,)] if self.exists else []
+    elif "select not exists" in sql:
+      self.result = [(self.empty,)]
+    else:
+      self.result = []
+
+  def executemany(self, sql: str, rows: list[tuple]):
+    self.statements.append(" ".join(sql.split()))
+    self.manifest_rows.extend(rows)
+
+  def fetchone(self):
+    return self.result[0] if self.result else None
+
+  def fetchall(self):
+    return self.result
+
+  def copy(self, sql: str):
+    self.statements.append(sql)
+    return FakeCopy(self)
+
+
+def write_files(directory, names: list[str]) -> TournamentFiles:
+  os.makedirs(directory, exist_ok=True)
+  for name in names:
+    with open(f"{directory}/{name}", "w") as f:
+      f.write(f'{{"id": "{name}"}}')
+  return TournamentFiles(str(directory))
+
+
+def manifest_of(files: TournamentFiles, nb_rows=1) -> dict[str, ManifestEntry]:
+  return {
+    name: files.manifest_entry(name, name.removesuffix(".json"), nb_rows)
+    for name in files.stats
+  }
+
+
+def run_load(cur: FakeCursor, files: TournamentFiles, rows: dict[str, list]):
+  with RawTournamentTableLoad(
+    log, cur, load.raw_tournament_tables["raw_matches"], files, False, True
+  ) as table_load:
+    for name in sorted(table_load.loaded):
+      files.ids[name] = name.removesuffix(".json")
+      table_load.write(name, rows.get(name, []))
+  return table_load
+
+
+@pytest.mark.parametrize(
+  "unlogged, exists, empty, nb_rows, full_reload",
+  [
+    # An unlogged table emptied by a crash of the server
+    (True, True, True, 1, True),
+    # Manifests written before the rows were counted
+    (True, True, True, None, True),
+    # An unlogged table the files have no row for
+    (True, True, True, 0, False),
+    # A logged table is not emptied by a crash
+    (False, True, True, 1, False),
+    (True, True, False, 1, False),
+    (False, False, True, 1, True),
+  ],
+)
+def test_full_reload(tmp_path, unlogged, exists, empty, nb_rows, full_reload):
+  files = write_files(tmp_path / "tournaments", ["t1.json", "t2.json"])
+  cur = FakeCursor(manifest_of(files, nb_rows), unlogged, exists, empty)
+
+  table_load = run_load(cur, files, {"t1.json": [("t1", "ana", "bo")] * 2})
+  assert table_load.full_reload == full_reload
+  assert (table_load.target == "raw.matches_staging") == full_reload
+  if full_reload:
+    # The rows of each file are counted in the manifest
+    assert [(row[1], row[-1]) for row in cur.manifest_rows] == [
+      ("t1.json", 2),
+      ("t2.json", 0),
+    ]
+    assert len(cur.copied) == 2
+  else:
+    assert table_load.loaded == set()
+
+
+def test_manifest_diff(tmp_path):
+  files = write_files(tmp_path / "tournaments", ["t1.json", "t2.json", "t3.json"])
+  manifest = {
+    **manifest_of(files),
+    "t5.json": ManifestEntry(10, 1, "removed", "t5", 3),
+  }
+  # t2 is touched with the same content, t3 is rewritten and t4 is new
+  os.utime(f"{files.directory}/t2.json", ns=(1, 1))
+  with open(f"{files.directory}/t3.json", "w") as f:
+    f.write('{"id": "t3", "changed": true}')
+  write_files(files.directory, ["t4.json"])
+  files = TournamentFiles(files.directory)
+
+  cur = FakeCursor(manifest)
+  table_load = run_load(cur, files, {"t4.json": [("t4", "ana", "bo")]})
+  assert not table_load.full_reload
+  assert table_load.loaded == {"t3.json", "t4.json"}
+  assert table_load.touched == ["t2.json"]
+  assert table_load.removed == ["t5.json"]
+
+  # The rows of the removed and loaded tournaments are deleted before the copy
+  delete = cur.statements.index("delete from raw.matches where tournament_id = any(%s)")
+  assert sorted(cur.params[delete][0]) == ["t3", "t4", "t5"]
+  assert cur.copied == [("t4", "ana", "bo")]
+  assert any(
+    s.startswith("delete from raw.load_manifest") and "file_name" in s
+    for s in cur.statements
+  )
+
+  # Only the loaded and touched files are written to the manifest, the touched
+  # file keeps its rows
+  entries = {row[1]: ManifestEntry(*row[2:]) for row in cur.manifest_rows}
+  assert sorted(entries) == ["t2.json", "t3.json", "t4.json"]
+  assert entries["t2.json"].file_mtime_ns == 1
+  assert entries["t2.json"].nb_rows == 1
+  assert entries["t3.json"].content_hash != manifest["t3.json"].content_hash
+  assert (entries["t3.json"].nb_rows, entries["t4.json"].nb_rows) == (0, 1)
+
+
+class FakeDatabase:
+  def __init__(self, cur: FakeCursor):
+    self.cur = cur
+
+  @contextlib.contextmanager
+  def get_connection(self):
+    yield self
+
+  @contextlib.contextmanager
+  def transaction(self):
+    yield
+
+  @contextlib.contextmanager
+  def cursor(self):
+    yield self.cur
+
+
+def test_load_translation_files(tmp_path, monkeypatch):
+  monkeypatch.setattr(constants, "TRANSLATIONS_OUTPUT_DIR", str(tmp_path))
+  (tmp_path / "fr.csv").write_text("A1,1,Bulbizarre\nA1,2,Herbizarre\n")
+  (tmp_path / "notes.txt").write_text("skipped")
+
+  cur = FakeCursor({})
+  table_load = load.load_translation_files(log, FakeDatabase(cur), True)
+  assert cur.copied == [
+    ("A1", "1", "Bulbizarre", "fr"),
+    ("A1", "2", "Herbizarre", "fr"),
+  ]
+  assert table_load.writer.nb_rows == 2
+  assert "alter table raw.translations_staging rename to translations" in cur.statements
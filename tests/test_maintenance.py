@@ -0,0 +1,72 @@
+import asyncio
+import os
+
+import dagster
+import pytest
+
+from pkmn_tcgp_metagame.assets import constants
+from pkmn_tcgp_metagame.assets.maintenance import HtmlCacheGcConfig, html_cache_gc
+from pkmn_tcgp_metagame.scraper.crawl_state import CrawlState
+from pkmn_tcgp_metagame.scraper.html_cache import html_cache_key, open_html_cache
+
+
+def fill_cache(urls: list[str]):
+  cache = open_html_cache()
+  for url in urls:
+    asyncio.run(cache.put(html_cache_key(url), url, f"<html>{url}</html>"))
+  cache.close()
+
+
+def run_gc(config: HtmlCacheGcConfig):
+  result = html_cache_gc(dagster.build_asset_context(), config)
+  return {name: value.value for name, value in result.metadata.items()}
+
+
+def test_html_cache_gc_keeps_crawled_source(tmp_path, monkeypatch):
+  monkeypatch.chdir(tmp_path)
+  monkeypatch.setattr(constants, "TOURNAMENT_SOURCE", "html")
+
+  html_url = f"{constants.BASE_URL_TOURNAMENTS}/tournament/t1/standings?players"
+  api_url = f"{constants.BASE_URL_TOURNAMENTS}/api/tournaments/t1/standings"
+  fill_cache([html_url, api_url])
+
+  # Without a crawl the pages of the other sources than TOURNAMENT_SOURCE go
+  crawl_state = CrawlState(constants.CRAWL_STATE_DATABASE)
+  crawl_state.close()
+  assert run_gc(HtmlCacheGcConfig())["Number of purged pages"] == 1
+
+  # The source set in the config of the tournament assets is kept
+  fill_cache([html_url, api_url])
+  crawl_state = CrawlState(constants.CRAWL_STATE_DATABASE)
+  crawl_state.record_source("html")
+  crawl_state.record_source("limitless-api")
+  crawl_state.close()
+  assert run_gc(HtmlCacheGcConfig())["Number of purged pages"] == 1
+
+  cache = open_html_cache()
+  assert [info.url for info in cache.entries()] == [api_url]
+  cache.close()
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "directory"])
+def test_html_cache_gc_reclaims_disk_space(tmp_path, monkeypatch, backend):
+  monkeypatch.chdir(tmp_path)
+  monkeypatch.setattr(constants, "HTML_CACHE_BACKEND", backend)
+
+  cache = open_html_cache()
+  for i in range(50):
+    url = f"{constants.BASE_URL_CARDS}/cards/A1/{i}"
+    html = "".join(f"<p>{i} {j}</p>" for j in range(i, i + 400))
+    asyncio.run(cache.put(html_cache_key(url), url, html))
+  cache.close()
+
+  metadata = run_gc(HtmlCacheGcConfig(max_size_mb=0, purge_patterns=[]))
+
+  assert metadata["Number of evicted pages"] == 50
+  assert metadata["Reclaimed bytes"] > 0
+  assert (
+    metadata["Reclaimed bytes"]
+    == metadata["Store size before (bytes)"] - metadata["Store size after (bytes)"]
+  )
+  if backend == "directory":
+    assert os.listdir(constants.BEAUTIFULSOUP_CACHE) == []
@@ -0,0 +1,63 @@
+from pathlib import Path
+
+import pytest
+
+from pkmn_tcgp_metagame.assets import constants, extract
+
+PAGES_DIR = Path(__file__).parent / "fixtures" / "pages"
+
+
+def card_search_urls(soup):
+  grid = soup.find("div", class_="card-search-grid")
+  return [a.attrs["href"] for a in grid.find_all("a") if "href" in a.attrs]
+
+
+def tournament_list(soup):
+  max_page = int(soup.find("ul", class_="pagination").attrs["data-max"])
+  return max_page, [
+    (tr.find("a", {"href": extract.regex_standings_url}).attrs["href"], tr.attrs)
+    for tr in extract.extract_trs(soup, "completed-tournaments")
+  ]
+
+
+# Fixture page, page type of its strainer, extractor and number of records
+pages = [
+  ("standings.html", "standings", extract.extract_player_rows, 6),
+  ("decklist.html", "decklist", extract.extract_decklist, 12),
+  ("pairings.html", "pairings", extract.extract_matches_from_pairings, 3),
+  ("pairings.html", "pairings-nav", extract.extract_previous_pairings_urls, 3),
+  ("pairings_bracket.html", "pairings", extract.extract_matches_from_pairings, 3),
+  ("card_search.html", "card-search", card_search_urls, 3),
+  ("tournament_list.html", "tournament-list", tournament_list, 2),
+]
+
+configurations = [
+  (parser, partial) for parser in ("html.parser", "lxml") for partial in (False, True)
+]
+
+
+def extract_records(monkeypatch, name, page_type, extractor, parser, partial):
+  monkeypatch.setattr(constants, "HTML_PARSER", parser)
+  html = (PAGES_DIR / name).read_text(encoding="utf-8")
+  return extractor(extract.make_soup(html, page_type, partial))
+
+
+@pytest.mark.parametrize("parser, partial", configurations)
+@pytest.mark.parametrize("name, page_type, extractor, nb_records", pages)
+def test_parser_parity(
+  monkeypatch, name, page_type, extractor, nb_records, parser, partial
+):
+  if parser == "lxml":
+    pytest.importorskip("lxml")
+
+  # html.parser on the full document is the reference every backend must match
+  reference = extract_records(
+    monkeypatch, name, page_type, extractor, "html.parser", False
+  )
+  records = extract_records(monkeypatch, name, page_type, extractor, parser, partial)
+
+  if page_type == "tournament-list":
+    assert len(reference[1]) == nb_records
+  else:
+    assert len(reference) == nb_records
+  assert records == reference
@@ -0,0 +1,86 @@
+import logging
+
+import pytest
+
+from pkmn_tcgp_metagame.postgres.helpers import CopyWriter
+
+log = logging.getLogger("test")
+
+
+class FakeCopy:
+  def __init__(self, cursor: "FakeCursor"):
+    self.cursor = cursor
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    # A copy left with an error is not committed by psycopg
+    self.cursor.exit_error = exc_value
+
+  def set_types(self, types: list[str]):
+    pass
+
+  def write_row(self, row: tuple):
+    if self.cursor.fail_at is not None and len(self.cursor.rows) == self.cursor.fail_at:
+      raise OSError("connection lost")
+    self.cursor.rows.append(row)
+
+
+class FakeCursor:
+  """Cursor copying rows into a list, failing after fail_at rows when set."""
+
+  def __init__(self, fail_at=None):
+    self.fail_at = fail_at
+    self.rows: list[tuple] = []
+    self.exit_error = None
+
+  def copy(self, sql: str):
+    return FakeCopy(self)
+
+
+def rows(n: int):
+  return [(i, f"row {i}") for i in range(n)]
+
+
+def test_copy_writer():
+  cur = FakeCursor()
+  with CopyWriter(log, cur, "raw.t", batch_size=3, batches_in_flight=1) as writer:
+    writer.write_rows(rows(10))
+  assert cur.rows == rows(10)
+  assert writer.nb_rows == 10
+  assert cur.exit_error is None
+
+
+def test_copy_writer_aborted_by_caller():
+  cur = FakeCursor()
+  with pytest.raises(ValueError):
+    with CopyWriter(log, cur, "raw.t", batch_size=3, batches_in_flight=1) as writer:
+      writer.write_rows(rows(5))
+      raise ValueError("bad file")
+
+  # The copy is left with an error so that it is not committed, and the writer
+  # thread is done
+  assert isinstance(cur.exit_error, RuntimeError)
+  assert not writer.thread.is_alive()
+
+
+def test_copy_writer_copy_failure():
+  cur = FakeCursor(fail_at=4)
+  writer = CopyWriter(log, cur, "raw.t", batch_size=2, batches_in_flight=1)
+  # The caller never blocks on the queue once the copy failed, and gets its error
+  with pytest.raises(OSError, match="connection lost"):
+    with writer:
+      for _ in range(100):
+        writer.write_rows(rows(2))
+  assert cur.rows == rows(2) + rows(2)
+  assert not writer.thread.is_alive()
+
+
+def test_copy_writer_copy_failure_on_exit():
+  cur = FakeCursor(fail_at=0)
+  with pytest.raises(OSError, match="connection lost"):
+    with CopyWriter(log, cur, "raw.t", batch_size=100) as writer:
+      writer.write_rows(rows(5))
+  assert cur.rows == []
+  assert writer.nb_rows == 5
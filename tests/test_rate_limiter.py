@@ -0,0 +1,56 @@
+import asyncio
+
+from pkmn_tcgp_metagame.scraper.rate_limiter import HostLimiter, parse_retry_after
+
+
+def test_limit_halved_once_per_window():
+  async def run():
+    limiter = HostLimiter(8, 1, 32)
+
+    # Every request of the window is throttled, the window is halved once
+    started = [await limiter.acquire() for _ in range(8)]
+    for started_at in started:
+      await limiter.release(started_at, "throttled")
+    assert limiter.limit == 4
+
+    # A request sent with the new window halves it again
+    await asyncio.sleep(0.01)
+    started_at = await limiter.acquire()
+    await limiter.release(started_at, "throttled")
+    assert limiter.limit == 2
+
+    # Throttles keep halving the window down to the minimum
+    for _ in range(4):
+      await asyncio.sleep(0.01)
+      await limiter.release(await limiter.acquire(), "throttled")
+    assert limiter.limit == 1
+    assert limiter.in_flight == 0
+
+  asyncio.run(run())
+
+
+def test_limit_grows_by_one_per_window():
+  async def run():
+    limiter = HostLimiter(4, 1, 32)
+    for _ in range(4):
+      await limiter.release(await limiter.acquire(), "success")
+    assert limiter.limit > 4.9
+
+  asyncio.run(run())
+
+
+def test_limit_kept_on_failure():
+  async def run():
+    limiter = HostLimiter(4, 1, 32)
+    await limiter.release(await limiter.acquire(), "failed")
+    assert (limiter.limit, limiter.in_flight) == (4, 0)
+
+  asyncio.run(run())
+
+
+def test_parse_retry_after():
+  assert parse_retry_after("3") == 3.0
+  assert parse_retry_after("-1") == 0.0
+  assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+  assert parse_retry_after("soon") is None
+  assert parse_retry_after(None) is None
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from pkmn_tcgp_metagame.assets import constants
+from pkmn_tcgp_metagame.scraper.replay import FixtureArchive, ReplayServer
+from pkmn_tcgp_metagame.scraper.scraper_session import ScraperSession
+
+BASE_URL = "https://pocket.limitlesstcg.com"
+
+
+@pytest.mark.parametrize(
+  "url",
+  [
+    "/cards?q=name:Flabébé",
+    "/cards?q=name:Mr. Mime",
+    "/cards?q=name:%22Farfetch'd%22",
+    "/cards/A1/1",
+  ],
+)
+def test_replay_recorded_page(tmp_path, monkeypatch, url):
+  archive_path = str(tmp_path / "archive.sqlite")
+  html = f"<html><body>{url}</body></html>"
+
+  async def run():
+    # Record the page the way a crawl does, then read it back through the server
+    monkeypatch.setattr(constants, "HTTP_RECORD_ARCHIVE", archive_path)
+    monkeypatch.setattr(constants, "HTTP_REPLAY_URL", "")
+    async with ScraperSession(BASE_URL) as session:
+      session.record(url, html)
+
+    archive = FixtureArchive(archive_path)
+    server = ReplayServer(archive)
+    monkeypatch.setattr(constants, "HTTP_RECORD_ARCHIVE", "")
+    monkeypatch.setattr(constants, "HTTP_REPLAY_URL", await server.start())
+    try:
+      async with ScraperSession(BASE_URL) as session:
+        response = await session.fetch(url)
+    finally:
+      await server.stop()
+      archive.close()
+
+    assert response.text == html
+    assert server.stats["missing"] == 0
+
+  asyncio.run(run())
@@ -0,0 +1,57 @@
+import asyncio
+import threading
+
+import aiohttp
+import pytest
+
+from pkmn_tcgp_metagame.assets import constants
+from pkmn_tcgp_metagame.scraper.replay import FixtureArchive, ReplayServer
+from pkmn_tcgp_metagame.scraper.scraper_resource import ScraperResource
+from pkmn_tcgp_metagame.scraper.scraper_session import ScraperSession
+
+
+def test_fetch_error_status_is_a_failure(tmp_path, monkeypatch):
+  archive = FixtureArchive(str(tmp_path / "archive.sqlite"))
+
+  async def run():
+    server = ReplayServer(archive)
+    monkeypatch.setattr(constants, "HTTP_RECORD_ARCHIVE", "")
+    monkeypatch.setattr(constants, "HTTP_REPLAY_URL", await server.start())
+    try:
+      async with ScraperSession(constants.BASE_URL_CARDS) as session:
+        with pytest.raises(aiohttp.ClientResponseError) as error:
+          await session.fetch("/cards/A1/404")
+        _, limiter = session.limiter("/cards/A1/404")
+        return error.value.status, session.stats, limiter
+    finally:
+      await server.stop()
+      archive.close()
+
+  status, stats, limiter = asyncio.run(run())
+  assert status == 404
+  assert (stats.requests, stats.retries, stats.failures) == (1, 0, 1)
+  # The window neither grows nor shrinks on a missing page
+  assert limiter.limit == constants.HTTP_HOST_CONCURRENCY_INITIAL
+  assert limiter.in_flight == 0
+
+
+def test_limiter_bounded_by_resource():
+  async def run():
+    scraper = ScraperResource(max_connections_per_host=4)
+    async with scraper.get_session(constants.BASE_URL_CARDS) as session:
+      _, limiter = session.limiter("/cards")
+      for _ in range(50):
+        await limiter.release(await limiter.acquire(), "success")
+      return limiter
+
+  limiter = asyncio.run(run())
+  assert limiter.maximum == 4
+  assert limiter.limit == 4
+
+
+def test_parse_off_the_event_loop():
+  async def run():
+    async with ScraperSession(constants.BASE_URL_CARDS) as session:
+      return await session.parse("card-search", threading.get_ident)
+
+  assert asyncio.run(run()) != threading.get_ident()